@@ -1,3 +1,12 @@
+import os
+
+# Deploy serverless: subsistemas (banco, Celery, agentes) sobem no primeiro
+# uso, não no cold start; o Sentry sobe no import, só com as integrações da API
+os.environ.setdefault("INICIALIZACAO_PREGUICOSA", "true")
+
+# Importado primeiro para medir os imports seguintes quando PERFIL_INICIALIZACAO=1
+import src.utils.preguicoso  # noqa: F401
+
 from src.api.main_production import app
 
 # Este arquivo é necessário para o deploy na Vercel
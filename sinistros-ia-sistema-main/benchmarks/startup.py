@@ -0,0 +1,172 @@
+"""
+Benchmark de inicialização: tempo de import e memória de cada ponto de entrada
+
+Cada entrada (API, worker Celery, beat) é importada num processo novo com
+-X importtime; o benchmark registra o tempo total, a memória residente
+após o import e os módulos que mais pesam. Compara com a baseline
+gravada em benchmarks/baseline_startup.json e termina com código 1 se
+alguma entrada regrediu além do limite.
+
+Uso:
+    python benchmarks/startup.py                     # compara com a baseline
+    python benchmarks/startup.py --atualizar-baseline
+    python benchmarks/startup.py --entradas api --repeticoes 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+RAIZ = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline_startup.json"
+
+# Módulos importados por cada processo ao subir
+ENTRADAS = {
+    "api": ["src.api.main_production"],
+    "worker": ["src.workers.celery_app", "src.workers.tasks", "src.agents.claims_agent_system"],
+    "beat": ["src.workers.celery_app"],
+}
+
+LIMITE_REGRESSAO_TEMPO = 0.20  # 20% acima da baseline
+LIMITE_REGRESSAO_MEMORIA = 0.15
+MODULOS_NO_RELATORIO = 15
+
+# Executado no processo filho: importa os módulos e reporta tempo e RSS
+CODIGO_FILHO = """
+import json, resource, sys, time
+inicio = time.perf_counter()
+for modulo in sys.argv[1:]:
+    __import__(modulo)
+tempo_ms = (time.perf_counter() - inicio) * 1000
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_kb = rss / 1024 if sys.platform == "darwin" else rss
+sys.stdout.write("\\n@@BENCH@@" + json.dumps({"tempo_ms": tempo_ms, "rss_kb": rss_kb}) + "\\n")
+"""
+
+
+def _ambiente() -> Dict[str, str]:
+    ambiente = dict(os.environ)
+    # Settings exige a chave; o import nunca chama a OpenAI
+    ambiente.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    ambiente.setdefault("ENVIRONMENT", "test")
+    ambiente["PYTHONDONTWRITEBYTECODE"] = "1"
+    return ambiente
+
+
+def parse_importtime(saida_erro: str) -> Dict[str, Dict[str, int]]:
+    """Linhas 'import time: self | cumulative | modulo' → {modulo: {proprio_us, acumulado_us}}"""
+    modulos = {}
+    for linha in saida_erro.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        partes = linha[len("import time:"):].split("|")
+        if len(partes) != 3:
+            continue
+        nome = partes[2].strip()
+        modulos[nome] = {"proprio_us": int(partes[0]), "acumulado_us": int(partes[1])}
+    return modulos
+
+
+def medir_uma_vez(modulos: List[str]) -> Dict[str, Any]:
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODIGO_FILHO, *modulos],
+        cwd=RAIZ, env=_ambiente(), capture_output=True, text=True
+    )
+    if processo.returncode != 0:
+        ultima_linha = (processo.stderr.strip().splitlines() or ["erro desconhecido"])[-1]
+        raise RuntimeError(ultima_linha)
+
+    marcador = [linha for linha in processo.stdout.splitlines() if linha.startswith("@@BENCH@@")][-1]
+    return {**json.loads(marcador[len("@@BENCH@@"):]), "modulos": parse_importtime(processo.stderr)}
+
+
+def medir_entrada(modulos: List[str], repeticoes: int) -> Dict[str, Any]:
+    """Mediana de tempo e memória; módulos mais pesados da execução mediana"""
+    execucoes = sorted((medir_uma_vez(modulos) for _ in range(repeticoes)), key=lambda e: e["tempo_ms"])
+    mediana = execucoes[len(execucoes) // 2]
+    mais_pesados = sorted(mediana["modulos"].items(), key=lambda item: item[1]["proprio_us"], reverse=True)
+    return {
+        "tempo_ms": round(statistics.median(e["tempo_ms"] for e in execucoes), 1),
+        "rss_kb": int(statistics.median(e["rss_kb"] for e in execucoes)),
+        "qtd_modulos": len(mediana["modulos"]),
+        "modulos": [
+            {"modulo": nome, "proprio_ms": round(t["proprio_us"] / 1000, 2), "acumulado_ms": round(t["acumulado_us"] / 1000, 2)}
+            for nome, t in mais_pesados[:MODULOS_NO_RELATORIO]
+        ],
+    }
+
+
+def comparar(atual: Dict[str, Any], baseline: Optional[Dict[str, Any]],
+             limite_tempo: float, limite_memoria: float) -> List[str]:
+    """Regressões da entrada em relação à baseline (lista vazia se nenhuma)"""
+    if not baseline or "erro" in baseline or "erro" in atual:
+        return []
+    regressoes = []
+    if atual["tempo_ms"] > baseline["tempo_ms"] * (1 + limite_tempo):
+        regressoes.append(f"tempo {baseline['tempo_ms']:.0f} → {atual['tempo_ms']:.0f} ms (limite +{limite_tempo:.0%})")
+    if atual["rss_kb"] > baseline["rss_kb"] * (1 + limite_memoria):
+        regressoes.append(f"memória {baseline['rss_kb'] / 1024:.1f} → {atual['rss_kb'] / 1024:.1f} MB (limite +{limite_memoria:.0%})")
+    novos = {m["modulo"] for m in atual["modulos"]} - {m["modulo"] for m in baseline.get("modulos", [])}
+    if regressoes and novos:
+        regressoes.append(f"módulos novos entre os mais pesados: {', '.join(sorted(novos))}")
+    return regressoes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entradas", nargs="+", choices=sorted(ENTRADAS), default=sorted(ENTRADAS))
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite-tempo", type=float, default=LIMITE_REGRESSAO_TEMPO)
+    parser.add_argument("--limite-memoria", type=float, default=LIMITE_REGRESSAO_MEMORIA)
+    parser.add_argument("--atualizar-baseline", action="store_true")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"entradas": {}}
+    resultados, falhou = {}, False
+
+    for entrada in args.entradas:
+        try:
+            resultado = medir_entrada(ENTRADAS[entrada], args.repeticoes)
+        except RuntimeError as e:
+            resultados[entrada] = {"erro": str(e)}
+            print(f"{entrada:8s} não importou: {e}")
+            # Entrada que importava na baseline e deixou de importar é regressão
+            falhou = falhou or entrada in baseline["entradas"]
+            continue
+
+        resultados[entrada] = resultado
+        anterior = baseline["entradas"].get(entrada)
+        print(f"{entrada:8s} {resultado['tempo_ms']:8.1f} ms  {resultado['rss_kb'] / 1024:7.1f} MB  "
+              f"{resultado['qtd_modulos']} módulos" + ("" if anterior else "  (sem baseline)"))
+        for modulo in resultado["modulos"][:5]:
+            print(f"           {modulo['proprio_ms']:7.1f} ms  {modulo['modulo']}")
+
+        regressoes = comparar(resultado, anterior, args.limite_tempo, args.limite_memoria)
+        for regressao in regressoes:
+            print(f"  REGRESSÃO {entrada}: {regressao}")
+        falhou = falhou or bool(regressoes)
+
+    if args.atualizar_baseline:
+        baseline["entradas"].update({nome: r for nome, r in resultados.items() if "erro" not in r})
+        baseline["ambiente"] = {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        }
+        args.baseline.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n")
+        print(f"Baseline gravada em {args.baseline}")
+        return 0
+
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
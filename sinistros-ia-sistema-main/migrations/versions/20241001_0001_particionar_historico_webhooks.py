@@ -0,0 +1,113 @@
+"""particionar historico_sinistros e webhook_logs por mês
+
+No PostgreSQL converte as duas tabelas (criadas por init_db como tabelas
+simples) em tabelas particionadas por faixa mensal na coluna de data,
+copiando os dados existentes. Em outros bancos apenas cria os índices
+(sinistro_id, data).
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-10-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.particoes import TABELAS_PARTICIONADAS, criar_particoes, inicio_mes, particionada
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _indice_sinistro_data(tabela: str) -> str:
+    return f"ix_{tabela}_sinistro_data"
+
+
+def _renomear_para_legado(conexao, tabela: str) -> str:
+    """Renomeia a tabela, seus índices e constraints com sufixo _legado"""
+    legado = f"{tabela}_legado"
+    indices = conexao.execute(sa.text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :tabela"
+    ), {"tabela": tabela}).scalars().all()
+
+    op.execute(f'ALTER TABLE "{tabela}" RENAME TO "{legado}"')
+    for indice in indices:
+        # Renomear o índice de uma PK/UNIQUE também renomeia a constraint
+        op.execute(f'ALTER INDEX "{indice}" RENAME TO "{indice}_legado"')
+    # A sequência do id passa para a tabela nova
+    op.execute(f"ALTER SEQUENCE \"{tabela}_id_seq\" OWNED BY NONE")
+    return legado
+
+
+def _particionar(conexao, tabela: str, coluna: str):
+    legado = _renomear_para_legado(conexao, tabela)
+
+    # Linhas sem data não teriam partição
+    op.execute(f'UPDATE "{legado}" SET "{coluna}" = now() WHERE "{coluna}" IS NULL')
+
+    op.execute(
+        f'CREATE TABLE "{tabela}" (LIKE "{legado}" INCLUDING DEFAULTS) '
+        f'PARTITION BY RANGE ("{coluna}")'
+    )
+    op.execute(f'ALTER TABLE "{tabela}" ALTER COLUMN "{coluna}" SET NOT NULL')
+    # PK de tabela particionada precisa incluir a coluna de partição
+    op.execute(f'ALTER TABLE "{tabela}" ADD PRIMARY KEY (id, "{coluna}")')
+    op.execute(
+        f'ALTER TABLE "{tabela}" ADD CONSTRAINT "{tabela}_sinistro_id_fkey" '
+        f'FOREIGN KEY (sinistro_id) REFERENCES sinistros (id)'
+    )
+    op.execute(f'CREATE INDEX "{_indice_sinistro_data(tabela)}" ON "{tabela}" (sinistro_id, "{coluna}")')
+    op.execute(f"ALTER SEQUENCE \"{tabela}_id_seq\" OWNED BY \"{tabela}\".id")
+
+    mais_antiga = conexao.execute(sa.text(f'SELECT min("{coluna}") FROM "{legado}"')).scalar()
+    criar_particoes(conexao, desde=inicio_mes(mais_antiga) if mais_antiga else None)
+
+    op.execute(f'INSERT INTO "{tabela}" SELECT * FROM "{legado}"')
+    op.execute(f'DROP TABLE "{legado}"')
+
+
+def _desparticionar(conexao, tabela: str, coluna: str):
+    legado = f"{tabela}_particionada"
+    op.execute(f'ALTER TABLE "{tabela}" RENAME TO "{legado}"')
+    op.execute(f'ALTER INDEX "{tabela}_pkey" RENAME TO "{legado}_pkey"')
+    op.execute(f'ALTER INDEX "{_indice_sinistro_data(tabela)}" RENAME TO "{_indice_sinistro_data(legado)}"')
+    op.execute(f"ALTER SEQUENCE \"{tabela}_id_seq\" OWNED BY NONE")
+
+    op.execute(f'CREATE TABLE "{tabela}" (LIKE "{legado}" INCLUDING DEFAULTS)')
+    op.execute(f'ALTER TABLE "{tabela}" ADD PRIMARY KEY (id)')
+    op.execute(
+        f'ALTER TABLE "{tabela}" ADD CONSTRAINT "{tabela}_sinistro_id_fkey" '
+        f'FOREIGN KEY (sinistro_id) REFERENCES sinistros (id)'
+    )
+    op.execute(f'CREATE INDEX "ix_{tabela}_id" ON "{tabela}" (id)')
+    op.execute(f'CREATE INDEX "{_indice_sinistro_data(tabela)}" ON "{tabela}" (sinistro_id, "{coluna}")')
+    op.execute(f"ALTER SEQUENCE \"{tabela}_id_seq\" OWNED BY \"{tabela}\".id")
+
+    op.execute(f'INSERT INTO "{tabela}" SELECT * FROM "{legado}"')
+    # Remove também as partições
+    op.execute(f'DROP TABLE "{legado}"')
+
+
+def upgrade() -> None:
+    conexao = op.get_bind()
+    for tabela, coluna in TABELAS_PARTICIONADAS.items():
+        if conexao.dialect.name == "postgresql":
+            if not particionada(conexao, tabela):
+                _particionar(conexao, tabela, coluna)
+        elif _indice_sinistro_data(tabela) not in {i["name"] for i in sa.inspect(conexao).get_indexes(tabela)}:
+            op.create_index(_indice_sinistro_data(tabela), tabela, ["sinistro_id", coluna])
+
+
+def downgrade() -> None:
+    conexao = op.get_bind()
+    for tabela, coluna in TABELAS_PARTICIONADAS.items():
+        if conexao.dialect.name == "postgresql":
+            if particionada(conexao, tabela):
+                _desparticionar(conexao, tabela, coluna)
+        else:
+            op.drop_index(_indice_sinistro_data(tabela), table_name=tabela)
@@ -0,0 +1,96 @@
+"""payloads_sinistro: payloads volumosos fora de sinistros.metadata
+
+Cria a tabela de payloads comprimidos e move para ela as chaves
+volumosas (raw_data, apolice_dados, historico_sinistros) que já estão
+em sinistros.metadata, em lotes.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-10-15 00:00:00
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from src.database.payloads import salvar_payload
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHAVES_VOLUMOSAS = ("raw_data", "apolice_dados", "historico_sinistros")
+LOTE = 500
+
+
+def upgrade() -> None:
+    conexao = op.get_bind()
+    # init_db (create_all) roda antes do alembic no start.sh e já cria a
+    # tabela a partir do modelo; a migração dos dados roda de qualquer forma
+    if not sa.inspect(conexao).has_table("payloads_sinistro"):
+        _criar_tabela()
+    _mover_payloads(conexao)
+
+
+def _criar_tabela():
+    op.create_table(
+        "payloads_sinistro",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("sinistro_id", sa.Integer(), sa.ForeignKey("sinistros.id"), nullable=False),
+        sa.Column("tipo", sa.String(50), nullable=False),
+        sa.Column("hash_conteudo", sa.String(64), nullable=False),
+        sa.Column("compressao", sa.String(10), nullable=False),
+        sa.Column("tamanho_original", sa.Integer()),
+        sa.Column("tamanho_comprimido", sa.Integer()),
+        sa.Column("conteudo", sa.LargeBinary(), nullable=False),
+        sa.Column("data_criacao", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("data_atualizacao", sa.DateTime(), server_default=sa.func.now()),
+        sa.UniqueConstraint("sinistro_id", "tipo", name="uq_payloads_sinistro_tipo"),
+    )
+    op.create_index("ix_payloads_sinistro_id", "payloads_sinistro", ["id"])
+    op.create_index("ix_payloads_sinistro_hash_conteudo", "payloads_sinistro", ["hash_conteudo"])
+
+
+def _mover_payloads(conexao):
+    sessao = Session(bind=conexao)
+    sinistros = sa.table("sinistros", sa.column("id", sa.Integer), sa.column("metadata", sa.JSON))
+
+    consulta = sa.select(sinistros.c.id, sinistros.c.metadata).order_by(sinistros.c.id).limit(LOTE)
+    if conexao.dialect.name == "postgresql":
+        consulta = consulta.where(sa.text(
+            "(metadata::jsonb) ?| array['" + "','".join(CHAVES_VOLUMOSAS) + "']"
+        ))
+
+    ultimo_id = 0
+    while True:
+        linhas = conexao.execute(consulta.where(sinistros.c.id > ultimo_id)).all()
+        if not linhas:
+            break
+
+        for sinistro_id, metadados in linhas:
+            if isinstance(metadados, str):
+                metadados = json.loads(metadados)
+            metadados = dict(metadados or {})
+            volumosos = {chave: metadados.pop(chave) for chave in CHAVES_VOLUMOSAS if chave in metadados}
+            if not volumosos:
+                continue
+            for tipo, dados in volumosos.items():
+                salvar_payload(sessao, sinistro_id, tipo, dados)
+            conexao.execute(
+                sinistros.update().where(sinistros.c.id == sinistro_id).values(metadata=metadados)
+            )
+
+        sessao.flush()
+        ultimo_id = linhas[-1][0]
+
+
+def downgrade() -> None:
+    # Os payloads não voltam para metadata; a tabela é apenas removida
+    op.drop_index("ix_payloads_sinistro_hash_conteudo", table_name="payloads_sinistro")
+    op.drop_index("ix_payloads_sinistro_id", table_name="payloads_sinistro")
+    op.drop_table("payloads_sinistro")
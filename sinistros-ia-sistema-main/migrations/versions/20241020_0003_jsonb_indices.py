@@ -0,0 +1,66 @@
+"""JSONB e índices para consultas em metadata e alertas
+
+No PostgreSQL converte sinistros.metadata, analises.resultado e
+analises.alertas para JSONB e cria:
+- GIN (jsonb_path_ops) em sinistros.metadata e analises.alertas
+- índices de expressão em metadata->>'chave' para as chaves filtradas pela API
+
+Os índices são criados com CONCURRENTLY para não bloquear escritas.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-10-20 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.filtros import CHAVES_INDEXADAS
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUNAS_JSONB = [
+    ("sinistros", "metadata"),
+    ("analises", "resultado"),
+    ("analises", "alertas"),
+]
+
+
+def _indices():
+    indices = [
+        ("ix_sinistros_metadata_gin", "sinistros USING GIN (metadata jsonb_path_ops)"),
+        ("ix_analises_alertas_gin", "analises USING GIN (alertas jsonb_path_ops)"),
+    ]
+    for chave in CHAVES_INDEXADAS:
+        indices.append((f"ix_sinistros_metadata_{chave}", f"sinistros ((metadata ->> '{chave}'))"))
+    return indices
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for tabela, coluna in COLUNAS_JSONB:
+        op.execute(f'ALTER TABLE {tabela} ALTER COLUMN "{coluna}" TYPE JSONB USING "{coluna}"::jsonb')
+
+    with op.get_context().autocommit_block():
+        for nome, definicao in _indices():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {definicao}")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        for nome, _ in _indices():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}")
+
+    for tabela, coluna in COLUNAS_JSONB:
+        op.execute(f'ALTER TABLE {tabela} ALTER COLUMN "{coluna}" TYPE JSON USING "{coluna}"::json')
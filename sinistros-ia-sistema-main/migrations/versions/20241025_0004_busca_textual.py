@@ -0,0 +1,52 @@
+"""busca textual em descricao e nas saídas dos agentes
+
+Adiciona sinistros.texto_analises e a estrutura de busca: no PostgreSQL,
+coluna gerada busca_vetor (tsvector portuguese) com índice GIN criado
+com CONCURRENTLY; no SQLite, tabela FTS5 com triggers.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-10-25 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.busca import DDL_POSTGRES, INDICE_POSTGRES, configurar_busca
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conexao = op.get_bind()
+    if "texto_analises" not in {c["name"] for c in sa.inspect(conexao).get_columns("sinistros")}:
+        op.add_column("sinistros", sa.Column("texto_analises", sa.Text(), nullable=True))
+
+    if conexao.dialect.name == "postgresql":
+        # Coluna gerada reescreve a tabela uma vez; o índice não bloqueia escritas
+        for ddl in DDL_POSTGRES:
+            op.execute(ddl)
+        with op.get_context().autocommit_block():
+            op.execute(INDICE_POSTGRES.format(concorrente="CONCURRENTLY"))
+    else:
+        configurar_busca(conexao)
+        if conexao.dialect.name == "sqlite":
+            op.execute("INSERT INTO sinistros_fts(sinistros_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    conexao = op.get_bind()
+    if conexao.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_sinistros_busca_vetor")
+        op.execute("ALTER TABLE sinistros DROP COLUMN IF EXISTS busca_vetor")
+    elif conexao.dialect.name == "sqlite":
+        for trigger in ("sinistros_fts_ai", "sinistros_fts_ad", "sinistros_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS sinistros_fts")
+    op.drop_column("sinistros", "texto_analises")
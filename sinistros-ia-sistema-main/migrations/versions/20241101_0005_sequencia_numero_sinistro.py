@@ -0,0 +1,37 @@
+"""sequência para os números de sinistro
+
+Cria sinistros_numero_seq (incremento = tamanho do bloco reservado por
+processo). Bancos sem sequências continuam com números aleatórios.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-11-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.models import SEQUENCIA_NUMERO_SINISTRO, TAMANHO_BLOCO_NUMERO
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not op.get_bind().dialect.supports_sequences:
+        return
+    op.execute(
+        f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCIA_NUMERO_SINISTRO.name} "
+        f"INCREMENT BY {TAMANHO_BLOCO_NUMERO} START WITH 1"
+    )
+
+
+def downgrade() -> None:
+    if not op.get_bind().dialect.supports_sequences:
+        return
+    op.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCIA_NUMERO_SINISTRO.name}")
@@ -0,0 +1,46 @@
+"""hash de entrada e consumo de tokens das análises
+
+Adiciona em analises: hash_entrada (com índice), usado para reaproveitar
+o resultado de uma etapa quando os campos de entrada não mudaram, e o
+consumo do LLM (tokens_prompt, tokens_completion, custo_estimado).
+Bancos criados pelo init_db já têm as colunas.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-11-05 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUNAS = [
+    sa.Column("hash_entrada", sa.String(length=64), nullable=True),
+    sa.Column("tokens_prompt", sa.Integer(), nullable=True, server_default="0"),
+    sa.Column("tokens_completion", sa.Integer(), nullable=True, server_default="0"),
+    sa.Column("custo_estimado", sa.Float(), nullable=True, server_default="0"),
+]
+
+
+def upgrade() -> None:
+    inspetor = sa.inspect(op.get_bind())
+    existentes = {c["name"] for c in inspetor.get_columns("analises")}
+    for coluna in COLUNAS:
+        if coluna.name not in existentes:
+            op.add_column("analises", coluna)
+    if "ix_analises_hash_entrada" not in {i["name"] for i in inspetor.get_indexes("analises")}:
+        op.create_index("ix_analises_hash_entrada", "analises", ["hash_entrada"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_analises_hash_entrada", table_name="analises")
+    with op.batch_alter_table("analises") as tabela:
+        for coluna in reversed(COLUNAS):
+            tabela.drop_column(coluna.name)
@@ -1,19 +1,32 @@
 # Sistema Multi-Agente para Análise de Sinistros de Seguros
 # Desenvolvido com OpenAI Agents SDK
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime
 from enum import Enum
+from contextvars import ContextVar
+import hashlib
 import json
 import os
+import httpx
 from openai import OpenAI
 from pydantic import BaseModel
 from swarm import Agent, Swarm
 from dotenv import load_dotenv
 
+from ..config.settings import get_settings
+from ..monitoring import rastreamento
+from ..monitoring.metrics import track_time
+from ..monitoring.rastreamento import rastrear
+from ..utils.compactacao import (
+    contar_tokens, limitar_tokens, normalizar_espacos, resumir_saida_agente
+)
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
+settings = get_settings()
+
 # ===== MODELOS DE DADOS =====
 
 class TipoSinistro(str, Enum):
@@ -52,6 +65,7 @@ class Sinistro(BaseModel):
 
 # ===== FERRAMENTAS CUSTOMIZADAS =====
 
+@rastrear("ferramenta.classificar_sinistro")
 def classificar_sinistro(descricao: str, documentos: List[str]) -> Dict[str, Any]:
     """Classifica o tipo de sinistro baseado na descrição e documentos"""
     return {
@@ -61,6 +75,7 @@ def classificar_sinistro(descricao: str, documentos: List[str]) -> Dict[str, Any
         "documentos_necessarios": []
     }
 
+@rastrear("ferramenta.analisar_documentacao")
 def analisar_documentacao(sinistro: Dict[str, Any]) -> Dict[str, Any]:
     """Analisa a documentação fornecida"""
     return {
@@ -71,6 +86,7 @@ def analisar_documentacao(sinistro: Dict[str, Any]) -> Dict[str, Any]:
         "score_completude": 0.0
     }
 
+@rastrear("ferramenta.consultar_apolice")
 def consultar_apolice(numero_apolice: str) -> Dict[str, Any]:
     """Consulta informações da apólice no sistema"""
     # Simulação de consulta ao banco de dados
@@ -83,6 +99,7 @@ def consultar_apolice(numero_apolice: str) -> Dict[str, Any]:
         "carencia": False
     }
 
+@rastrear("ferramenta.calcular_indenizacao")
 def calcular_indenizacao(sinistro: Dict[str, Any], apolice: Dict[str, Any]) -> Dict[str, Any]:
     """Calcula o valor da indenização"""
     return {
@@ -94,6 +111,7 @@ def calcular_indenizacao(sinistro: Dict[str, Any], apolice: Dict[str, Any]) -> D
         "observacoes": []
     }
 
+@rastrear("ferramenta.verificar_compliance")
 def verificar_compliance(sinistro: Dict[str, Any]) -> Dict[str, Any]:
     """Verifica conformidade com regulamentações"""
     return {
@@ -105,6 +123,7 @@ def verificar_compliance(sinistro: Dict[str, Any]) -> Dict[str, Any]:
         "recomendacoes": []
     }
 
+@rastrear("ferramenta.consultar_historico_segurado")
 def consultar_historico_segurado(cpf_cnpj: str) -> Dict[str, Any]:
     """Consulta histórico do segurado"""
     return {
@@ -114,6 +133,7 @@ def consultar_historico_segurado(cpf_cnpj: str) -> Dict[str, Any]:
         "observacoes": []
     }
 
+@rastrear("ferramenta.gerar_relatorio_final")
 def gerar_relatorio_final(sinistro: Dict[str, Any]) -> Dict[str, Any]:
     """Gera relatório consolidado da análise"""
     return {
@@ -126,6 +146,99 @@ def gerar_relatorio_final(sinistro: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 # ===== SISTEMA SWARM =====
+# Limite de turnos por execução do Swarm (evita loops de ferramentas do gerente)
+MAX_TURNS_POR_ETAPA = settings.SWARM_MAX_TURNS
+# Conexões keep-alive com a OpenAI por processo (pool gevent roda centenas de etapas)
+HTTP_POOL_MAXSIZE = settings.HTTP_POOL_MAXSIZE
+
+# Uso de tokens da etapa em execução (preenchido pelo cliente instrumentado)
+_uso_tokens: ContextVar[Optional[Dict[str, int]]] = ContextVar("uso_tokens", default=None)
+
+# Orçamento de tokens do sinistro em processamento: {"limite": int, "consumido": int}
+_orcamento_tokens: ContextVar[Optional[Dict[str, int]]] = ContextVar("orcamento_tokens", default=None)
+
+class OrcamentoTokensExcedido(Exception):
+    """O sinistro consumiu todo o orçamento de tokens configurado"""
+    pass
+
+# Resposta mínima que vale uma chamada; abaixo disso o orçamento é dado como esgotado
+MIN_TOKENS_RESPOSTA = 64
+
+def _reservar_tokens(orcamento: Dict[str, int], kwargs: Dict[str, Any]) -> int:
+    """
+    max_tokens da próxima completion: o que sobra do orçamento depois do
+    prompt (estimado pelas mensagens e ferramentas enviadas)
+    
+    A resposta nunca passa do que resta, então uma completion grande não
+    estoura o limite; o excedente possível é só o erro da estimativa do prompt.
+    """
+    prompt = contar_tokens(json.dumps(
+        [kwargs.get("messages") or [], kwargs.get("tools") or []], ensure_ascii=False, default=str
+    ))
+    restante = orcamento["limite"] - orcamento["consumido"] - prompt
+    if restante < MIN_TOKENS_RESPOSTA:
+        raise OrcamentoTokensExcedido(
+            f"Orçamento de {orcamento['limite']} tokens esgotado "
+            f"({orcamento['consumido']} consumidos, ~{prompt} no próximo prompt)"
+        )
+    return min(kwargs.get("max_tokens") or restante, restante)
+
+class _CompletionsComUso:
+    """Repassa chamadas de chat.completions registrando o uso de tokens"""
+    
+    def __init__(self, completions):
+        self._completions = completions
+    
+    def create(self, **kwargs):
+        orcamento = _orcamento_tokens.get()
+        if orcamento is not None:
+            kwargs["max_tokens"] = _reservar_tokens(orcamento, kwargs)
+        
+        with rastreamento.iniciar_span("openai.chat.completions", rastreamento.TIPO_CLIENTE, {
+            "llm.modelo": kwargs.get("model"),
+            "llm.mensagens": len(kwargs.get("messages") or []),
+        }) as span:
+            resposta = self._completions.create(**kwargs)
+            if not getattr(resposta, "usage", None):
+                return resposta
+            
+            prompt_tokens = resposta.usage.prompt_tokens or 0
+            completion_tokens = resposta.usage.completion_tokens or 0
+            span.definir_atributo("llm.tokens_prompt", prompt_tokens)
+            span.definir_atributo("llm.tokens_completion", completion_tokens)
+        
+        uso = _uso_tokens.get()
+        if uso is not None:
+            uso["prompt_tokens"] += prompt_tokens
+            uso["completion_tokens"] += completion_tokens
+            uso["chamadas"] += 1
+        
+        if orcamento is not None:
+            orcamento["consumido"] += prompt_tokens + completion_tokens
+        
+        return resposta
+    
+    def __getattr__(self, nome):
+        return getattr(self._completions, nome)
+
+class _ChatComUso:
+    def __init__(self, chat):
+        self._chat = chat
+        self.completions = _CompletionsComUso(chat.completions)
+    
+    def __getattr__(self, nome):
+        return getattr(self._chat, nome)
+
+class ClienteOpenAIComUso:
+    """Cliente OpenAI que contabiliza os tokens de cada completion"""
+    
+    def __init__(self, client: OpenAI):
+        self._client = client
+        self.chat = _ChatComUso(client.chat)
+    
+    def __getattr__(self, nome):
+        return getattr(self._client, nome)
+
 # Cliente Swarm será inicializado sob demanda
 swarm_client = None
 
@@ -133,9 +246,23 @@ def get_swarm_client():
     """Retorna o cliente Swarm, inicializando se necessário"""
     global swarm_client
     if swarm_client is None:
-        swarm_client = Swarm()
+        swarm_client = Swarm(client=ClienteOpenAIComUso(OpenAI(
+            max_retries=2,
+            http_client=httpx.Client(limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE
+            ))
+        )))
     return swarm_client
 
+def _resetar_swarm_client():
+    """Processo filho não reutiliza as conexões HTTP do processo pai"""
+    global swarm_client
+    swarm_client = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_resetar_swarm_client)
+
 # ===== AGENTES ESPECIALIZADOS =====
 
 # 1. AGENTE DE TRIAGEM
@@ -252,51 +379,341 @@ claims_manager = Agent(
     ]
 )
 
-# ===== FUNÇÕES DE EXECUÇÃO =====
+# ===== PIPELINE DE ETAPAS =====
 
-def processar_sinistro(sinistro_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Processa um sinistro completo através do sistema multi-agente"""
+# Limites de tokens dos prompts (compactação de contexto)
+LIMITE_TOKENS_DESCRICAO = settings.PROMPT_MAX_TOKENS_DESCRICAO
+LIMITE_TOKENS_SAIDA_AGENTE = settings.PROMPT_MAX_TOKENS_SAIDA_AGENTE
+LIMITE_TOKENS_POR_ETAPA = {
+    "triagem": 1500,
+    "analise": 800,
+    "calculo": 600,
+    "compliance": 800,
+    "decisao": 2500,
+}
+
+def _mensagem_triagem(sinistro_data: Dict[str, Any]) -> str:
+    # Só espaços e tamanho: o boilerplate de email já sai no EmailReceiver e
+    # as regras dele cortariam descrições legítimas dos demais canais
+    descricao = limitar_tokens(normalizar_espacos(sinistro_data['descricao']), LIMITE_TOKENS_DESCRICAO)
+    return f"""
+    Classifique o sinistro {sinistro_data['numero_sinistro']}.
+    Tipo informado: {sinistro_data.get('tipo') or 'não informado'}
+    CPF/CNPJ do segurado: {sinistro_data['segurado']['documento']}
+    
+    Descrição do Sinistro:
+    {descricao}
     
-    # Preparar mensagem inicial com dados do sinistro
-    mensagem_inicial = f"""
-    Novo sinistro recebido para análise:
+    Documentos Apresentados:
+    {', '.join(sinistro_data.get('documentos', []))}
+    """
+
+def _mensagem_analise(sinistro_data: Dict[str, Any]) -> str:
+    return f"""
+    Analise a documentação do sinistro {sinistro_data['numero_sinistro']}.
+    Apólice: {sinistro_data['apolice']['numero']} ({sinistro_data['apolice'].get('produto')})
     
-    Número: {sinistro_data['numero_sinistro']}
+    Documentos Apresentados:
+    {', '.join(sinistro_data.get('documentos', []))}
+    """
+
+def _mensagem_calculo(sinistro_data: Dict[str, Any]) -> str:
+    return f"""
+    Calcule a indenização do sinistro {sinistro_data['numero_sinistro']}.
+    Tipo: {sinistro_data.get('tipo') or 'não informado'}
+    Apólice: {sinistro_data['apolice']['numero']} ({sinistro_data['apolice'].get('produto')})
+    Valor estimado: R$ {sinistro_data.get('valor_estimado') or 0}
+    """
+
+def _mensagem_compliance(sinistro_data: Dict[str, Any]) -> str:
+    return f"""
+    Verifique o compliance do sinistro {sinistro_data['numero_sinistro']}.
+    Tipo: {sinistro_data.get('tipo') or 'não informado'}
     Data Ocorrência: {sinistro_data['data_ocorrencia']}
-    Data Aviso: {sinistro_data['data_aviso']}
+    Data Aviso: {sinistro_data.get('data_aviso') or 'não informada'}
     
-    Segurado:
-    - Nome: {sinistro_data['segurado']['nome']}
-    - CPF/CNPJ: {sinistro_data['segurado']['documento']}
+    Documentos Apresentados:
+    {', '.join(sinistro_data.get('documentos', []))}
+    """
+
+def _mensagem_decisao(sinistro_data: Dict[str, Any], saidas: Dict[str, str]) -> str:
+    return f"""
+    Com base nas análises dos 4 agentes especializados:
+    - Triagem: {resumir_saida_agente(saidas.get('triagem'), LIMITE_TOKENS_SAIDA_AGENTE)}
+    - Análise: {resumir_saida_agente(saidas.get('analise'), LIMITE_TOKENS_SAIDA_AGENTE)}
+    - Cálculo: {resumir_saida_agente(saidas.get('calculo'), LIMITE_TOKENS_SAIDA_AGENTE)}
+    - Compliance: {resumir_saida_agente(saidas.get('compliance'), LIMITE_TOKENS_SAIDA_AGENTE)}
+    
+    Tome a decisão final para o sinistro {sinistro_data['numero_sinistro']}.
+    """
+
+# Grafo de dependências: campos do sinistro lidos por cada etapa.
+# Uma etapa só precisa ser reexecutada quando algum desses campos muda;
+# as mensagens acima usam apenas estes campos (além do número do sinistro).
+CAMPOS_POR_ETAPA = {
+    "triagem": ["tipo", "descricao", "documentos", "segurado.documento"],
+    "analise": ["documentos", "apolice.numero", "apolice.produto"],
+    "calculo": ["tipo", "valor_estimado", "apolice.numero", "apolice.produto"],
+    "compliance": ["tipo", "data_ocorrencia", "data_aviso", "documentos"],
+}
+
+# Etapas especializadas, na ordem de execução.
+# "status" é o status do sinistro durante a etapa (None = não altera)
+ETAPAS = [
+    {"nome": "triagem", "agente": triage_agent, "status": "em_analise", "mensagem": _mensagem_triagem},
+    {"nome": "analise", "agente": analysis_agent, "status": "em_analise", "mensagem": _mensagem_analise},
+    {"nome": "calculo", "agente": calculation_agent, "status": "em_calculo", "mensagem": _mensagem_calculo},
+    {"nome": "compliance", "agente": compliance_agent, "status": "em_compliance", "mensagem": _mensagem_compliance},
+]
+
+ETAPA_DECISAO = {"nome": "decisao", "agente": claims_manager, "status": None}
+
+def _valor_campo(sinistro_data: Dict[str, Any], caminho: str) -> Any:
+    valor = sinistro_data
+    for parte in caminho.split("."):
+        valor = valor.get(parte) if isinstance(valor, dict) else None
+    return valor
+
+def hash_entrada_etapa(nome_etapa: str, sinistro_data: Dict[str, Any]) -> str:
+    """Hash SHA-256 dos campos de que a etapa depende"""
+    entrada = {campo: _valor_campo(sinistro_data, campo) for campo in CAMPOS_POR_ETAPA[nome_etapa]}
+    if isinstance(entrada.get("documentos"), list):
+        entrada["documentos"] = sorted(entrada["documentos"])
+    conteudo = json.dumps(entrada, sort_keys=True, default=str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+def _executar_etapa(etapa: Dict[str, Any], mensagem: str, sinistro_numero: str,
+                    on_evento: Optional[Callable[[Dict[str, Any]], None]],
+                    hash_entrada: Optional[str] = None) -> Dict[str, Any]:
+    """Executa um agente emitindo eventos de início/fim com latência e tokens"""
+    agente = etapa["agente"]
+    emitir = on_evento or (lambda evento: None)
+    mensagem = limitar_tokens(normalizar_espacos(mensagem), LIMITE_TOKENS_POR_ETAPA[etapa["nome"]])
     
-    Apólice:
-    - Número: {sinistro_data['apolice']['numero']}
-    - Produto: {sinistro_data['apolice']['produto']}
+    emitir({
+        "tipo": "etapa.iniciada",
+        "sinistro_numero": sinistro_numero,
+        "etapa": etapa["nome"],
+        "agente": agente.name,
+        "status": etapa["status"],
+        "inicio": datetime.now().isoformat()
+    })
     
-    Descrição do Sinistro:
-    {sinistro_data['descricao']}
+    uso = {"prompt_tokens": 0, "completion_tokens": 0, "chamadas": 0}
+    token = _uso_tokens.set(uso)
+    saida = None
+    erro = None
     
-    Documentos Apresentados:
-    {', '.join(sinistro_data['documentos'])}
+    with track_time("tempo_etapa_agente", {"etapa": etapa["nome"], "agente": agente.name},
+                    nome=f"etapa_{etapa['nome']}") as cronometro, \
+            rastreamento.iniciar_span(f"agente.etapa {etapa['nome']}", atributos={
+                "sinistro.numero": sinistro_numero,
+                "agente.etapa": etapa["nome"],
+                "agente.nome": agente.name,
+            }) as span:
+        try:
+            with rastreamento.iniciar_span("swarm.run", atributos={
+                "agente.nome": agente.name,
+                "swarm.max_turns": MAX_TURNS_POR_ETAPA,
+            }):
+                response = get_swarm_client().run(
+                    agent=agente,
+                    messages=[{"role": "user", "content": mensagem}],
+                    max_turns=MAX_TURNS_POR_ETAPA
+                )
+            saida = response.messages[-1]["content"]
+            return {
+                "etapa": etapa["nome"],
+                "agente": agente.name,
+                "saida": saida,
+                "agent_usado": response.agent.name if response.agent else agente.name,
+                "duracao_ms": cronometro.decorrido_ms(),
+                "tokens": dict(uso),
+                "hash_entrada": hash_entrada
+            }
+        except OrcamentoTokensExcedido as e:
+            # Não é falha da etapa: interrompe o pipeline com decisão parcial
+            erro = str(e)
+            span.definir_atributo("agente.parcial", True)
+            return {
+                "etapa": etapa["nome"],
+                "agente": agente.name,
+                "saida": None,
+                "agent_usado": agente.name,
+                "duracao_ms": cronometro.decorrido_ms(),
+                "tokens": dict(uso),
+                "hash_entrada": hash_entrada,
+                "parcial": True,
+                "erro": erro
+            }
+        except Exception as e:
+            erro = str(e)
+            raise
+        finally:
+            _uso_tokens.reset(token)
+            span.definir_atributo("llm.tokens_prompt", uso["prompt_tokens"])
+            span.definir_atributo("llm.tokens_completion", uso["completion_tokens"])
+            emitir({
+                "tipo": "etapa.concluida",
+                "sinistro_numero": sinistro_numero,
+                "etapa": etapa["nome"],
+                "agente": agente.name,
+                "sucesso": erro is None,
+                "erro": erro,
+                "saida": saida,
+                "duracao_ms": cronometro.decorrido_ms(),
+                "tokens": dict(uso),
+                "hash_entrada": hash_entrada,
+                "fim": datetime.now().isoformat()
+            })
+
+# ===== FUNÇÕES DE EXECUÇÃO =====
+
+ETAPAS_POR_NOME = {etapa["nome"]: etapa for etapa in ETAPAS}
+
+def _tokens_zerados() -> Dict[str, int]:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "chamadas": 0}
+
+def executar_etapa(nome_etapa: str, sinistro_data: Dict[str, Any],
+                   on_evento: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   resultado_anterior: Optional[Dict[str, Any]] = None,
+                   orcamento_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Executa uma etapa especializada de forma independente
+    
+    Reaproveita resultado_anterior ({"hash_entrada", "saida"}) quando os
+    campos de entrada da etapa não mudaram. orcamento_tokens limita apenas
+    esta etapa; se acabar, a etapa volta marcada como parcial e sem saída.
+    """
+    etapa = ETAPAS_POR_NOME[nome_etapa]
+    sinistro_numero = sinistro_data['numero_sinistro']
+    hash_entrada = hash_entrada_etapa(nome_etapa, sinistro_data)
     
-    Por favor, realize a análise completa deste sinistro.
+    if resultado_anterior and resultado_anterior.get("hash_entrada") == hash_entrada:
+        if on_evento:
+            on_evento({
+                "tipo": "etapa.reaproveitada",
+                "sinistro_numero": sinistro_numero,
+                "etapa": nome_etapa,
+                "agente": etapa["agente"].name,
+                "hash_entrada": hash_entrada
+            })
+        return {
+            "etapa": nome_etapa,
+            "agente": etapa["agente"].name,
+            "saida": resultado_anterior["saida"],
+            "duracao_ms": 0,
+            "tokens": _tokens_zerados(),
+            "hash_entrada": hash_entrada,
+            "reaproveitada": True
+        }
+    
+    # Sem orçamento próprio, vale o orçamento do sinistro já em vigor (se houver)
+    token_orcamento = _orcamento_tokens.set({"limite": orcamento_tokens, "consumido": 0}) if orcamento_tokens else None
+    try:
+        return _executar_etapa(etapa, etapa["mensagem"](sinistro_data), sinistro_numero, on_evento, hash_entrada)
+    finally:
+        if token_orcamento is not None:
+            _orcamento_tokens.reset(token_orcamento)
+
+def consolidar_decisao(sinistro_data: Dict[str, Any], resultados_etapas: List[Dict[str, Any]],
+                       on_evento: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       orcamento_tokens: Optional[int] = None) -> Dict[str, Any]:
     """
+    Executa o gerente sobre as saídas das etapas e monta o resultado final
     
-    # Executar o gerente de sinistros usando Swarm
-    client = get_swarm_client()
-    response = client.run(
-        agent=claims_manager,
-        messages=[{"role": "user", "content": mensagem_inicial}]
-    )
-    
-    # Extrair resultado
-    resultado = {
-        "mensagem": response.messages[-1]["content"],
-        "agent_usado": response.agent.name if response.agent else "Desconhecido",
-        "sinistro_numero": sinistro_data['numero_sinistro']
+    Se alguma etapa foi interrompida pelo orçamento de tokens (ou o próprio
+    gerente for), devolve uma decisão parcial pendente de revisão manual.
+    """
+    sinistro_numero = sinistro_data['numero_sinistro']
+    etapas = list(resultados_etapas)
+    
+    if not any(etapa.get("parcial") for etapa in etapas):
+        saidas = {etapa["etapa"]: etapa["saida"] for etapa in etapas}
+        token_orcamento = _orcamento_tokens.set({"limite": orcamento_tokens, "consumido": 0}) if orcamento_tokens else None
+        try:
+            decisao = _executar_etapa(
+                ETAPA_DECISAO,
+                _mensagem_decisao(sinistro_data, saidas),
+                sinistro_numero,
+                on_evento
+            )
+        finally:
+            if token_orcamento is not None:
+                _orcamento_tokens.reset(token_orcamento)
+        etapas.append(decisao)
+        
+        if not decisao.get("parcial"):
+            return {
+                "mensagem": decisao["saida"],
+                "agent_usado": decisao["agent_usado"],
+                "sinistro_numero": sinistro_numero,
+                "etapas": _resumo_etapas(etapas),
+                "tokens": _total_tokens(etapas)
+            }
+    
+    interrompida = next(etapa for etapa in etapas if etapa.get("parcial"))
+    return {
+        "mensagem": f"Análise interrompida: {interrompida['erro']}. Decisão pendente de revisão manual.",
+        "agent_usado": ETAPA_DECISAO["agente"].name,
+        "sinistro_numero": sinistro_numero,
+        "decisao": "pendente",
+        "parcial": True,
+        "alertas": [interrompida["erro"]],
+        "saidas_parciais": {etapa["etapa"]: etapa["saida"] for etapa in etapas if etapa.get("saida")},
+        "etapas": _resumo_etapas(etapas),
+        "tokens": _total_tokens(etapas)
     }
+
+def processar_sinistro(sinistro_data: Dict[str, Any],
+                       on_evento: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       resultados_anteriores: Optional[Dict[str, Dict[str, Any]]] = None,
+                       orcamento_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Processa um sinistro completo através do sistema multi-agente
+    
+    Cada agente especializado roda como uma etapa; o gerente consolida
+    as saídas na decisão final. on_evento recebe os eventos
+    etapa.iniciada/etapa.concluida/etapa.reaproveitada de cada etapa.
     
-    return resultado
+    resultados_anteriores ({etapa: {"hash_entrada", "saida"}}) permite
+    reprocessamento incremental: etapas cujos campos de entrada não mudaram
+    reaproveitam a saída anterior. O gerente sempre é executado.
+    
+    orcamento_tokens limita o total de tokens do sinistro; ao excedê-lo a
+    execução termina com uma decisão parcial (pendente) em vez de erro.
+    """
+    resultados_anteriores = resultados_anteriores or {}
+    orcamento = {"limite": orcamento_tokens, "consumido": 0} if orcamento_tokens else None
+    token_orcamento = _orcamento_tokens.set(orcamento)
+    
+    try:
+        resultados_etapas = []
+        for etapa in ETAPAS:
+            resultado_etapa = executar_etapa(
+                etapa["nome"],
+                sinistro_data,
+                on_evento,
+                resultados_anteriores.get(etapa["nome"])
+            )
+            resultados_etapas.append(resultado_etapa)
+            if resultado_etapa.get("parcial"):
+                break
+        
+        return consolidar_decisao(sinistro_data, resultados_etapas, on_evento)
+    
+    finally:
+        _orcamento_tokens.reset(token_orcamento)
+
+def _resumo_etapas(etapas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: v for k, v in etapa.items() if k != "saida"} for etapa in etapas]
+
+def _total_tokens(etapas: List[Dict[str, Any]]) -> Dict[str, int]:
+    total = _tokens_zerados()
+    for etapa in etapas:
+        for chave in total:
+            total[chave] += etapa["tokens"].get(chave, 0)
+    return total
 
 # ===== EXEMPLO DE USO =====
 
@@ -0,0 +1,46 @@
+"""
+Busca textual de sinistros (descrição e saídas dos agentes)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Optional
+from datetime import datetime
+import logging
+
+from ..database.connection import get_db_leitura
+from ..database.models import StatusSinistro, TipoSinistro
+from ..database.busca import buscar_sinistros
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["busca"])
+
+
+@router.get("/busca/sinistros")
+async def buscar(
+    q: str = Query(..., min_length=2, description="Palavras-chave"),
+    status: Optional[str] = None,
+    tipo: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    ate: Optional[datetime] = None,
+    limite: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db_leitura)
+) -> Dict[str, Any]:
+    """
+    Busca por palavras-chave, ordenada por relevância
+    Para a próxima página, repassar proximo_cursor da resposta
+    """
+    try:
+        return buscar_sinistros(
+            db,
+            q,
+            status=StatusSinistro(status) if status else None,
+            tipo=TipoSinistro(tipo) if tipo else None,
+            desde=desde,
+            ate=ate,
+            limite=limite,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,61 @@
+"""
+Leitura após escrita com réplicas de leitura
+
+Quando um cliente escreve (POST/PUT/PATCH/DELETE com sucesso), a
+resposta leva um cookie com o instante até o qual esse cliente deve ler
+do primário. Enquanto o cookie vale, get_db_leitura usa o primário e o
+cliente vê a própria escrita mesmo que as réplicas estejam atrasadas.
+"""
+
+import time
+from http.cookies import SimpleCookie
+
+from ..config.settings import get_settings
+from ..database.connection import usar_primario, restaurar_intencao
+
+settings = get_settings()
+
+COOKIE_ESCRITA = "sinistros_primario_ate"
+METODOS_LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+
+def _primario_ate(scope) -> float:
+    """Instante (epoch) gravado no cookie da requisição, ou 0"""
+    for nome, valor in scope.get("headers", []):
+        if nome == b"cookie":
+            cookie = SimpleCookie()
+            cookie.load(valor.decode("latin-1"))
+            if COOKIE_ESCRITA in cookie:
+                try:
+                    return float(cookie[COOKIE_ESCRITA].value)
+                except ValueError:
+                    return 0
+    return 0
+
+
+class LeituraAposEscritaMiddleware:
+    """Middleware ASGI que define a intenção de leitura de cada requisição"""
+
+    def __init__(self, app, janela_segundos: int = None):
+        self.app = app
+        self.janela_segundos = janela_segundos if janela_segundos is not None else settings.LEITURA_APOS_ESCRITA_SEGUNDOS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        escrita = scope["method"] not in METODOS_LEITURA
+        token = usar_primario(escrita or _primario_ate(scope) > time.time())
+
+        async def send_wrapper(message):
+            if escrita and message["type"] == "http.response.start" and message["status"] < 400:
+                ate = time.time() + self.janela_segundos
+                cookie = f"{COOKIE_ESCRITA}={ate:.3f}; Max-Age={self.janela_segundos}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            restaurar_intencao(token)
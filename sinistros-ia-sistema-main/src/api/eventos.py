@@ -0,0 +1,143 @@
+"""
+Canais de push (SSE e WebSocket) para acompanhar sinistros sem polling
+"""
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any, Optional
+import logging
+
+from ..database.connection import get_db_leitura_session
+from ..database.models import Sinistro
+from ..events.bus import AssinaturaEventos, formatar_sse, evento_final, STATUS_FINAIS
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["eventos"])
+
+# Cabeçalhos para que proxies (nginx) não façam buffer do stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+
+def _snapshot_status(numero_sinistro: str) -> Optional[Dict[str, Any]]:
+    """Estado atual do sinistro, enviado como primeiro evento da conexão"""
+    with get_db_leitura_session() as db:
+        sinistro = db.query(Sinistro.status).filter_by(numero_sinistro=numero_sinistro).first()
+        if not sinistro:
+            return None
+
+        return {
+            "tipo": "status.atual",
+            "numero_sinistro": numero_sinistro,
+            "dados": {"status_novo": sinistro.status.value}
+        }
+
+
+async def _abrir_assinatura(numero_sinistro: Optional[str] = None) -> AssinaturaEventos:
+    """Assina o canal antes de responder: sem Redis o cliente recebe 503, não um stream quebrado"""
+    try:
+        return await AssinaturaEventos(numero_sinistro).abrir()
+    except Exception as e:
+        logger.warning(f"Canal de eventos indisponível: {e}")
+        raise HTTPException(status_code=503, detail="Canal de eventos indisponível")
+
+
+def _stream(snapshot: Optional[Dict[str, Any]], assinatura: Optional[AssinaturaEventos]) -> StreamingResponse:
+    """Resposta SSE; a assinatura é fechada ao fim, inclusive se o cliente desconectar"""
+    async def gerar():
+        if snapshot:
+            yield formatar_sse(snapshot)
+        if assinatura is None:
+            return
+
+        async for evento in assinatura:
+            yield formatar_sse(evento)
+            if evento and evento_final(evento):
+                break
+
+    return StreamingResponse(
+        gerar(), media_type="text/event-stream", headers=SSE_HEADERS,
+        background=BackgroundTask(assinatura.fechar) if assinatura else None
+    )
+
+
+@router.get("/sinistros/{numero_sinistro}/eventos")
+async def stream_eventos_sinistro(numero_sinistro: str):
+    """
+    Stream SSE com as transições de status e o andamento da análise
+    A conexão é encerrada quando o sinistro atinge um status final
+    """
+    # Assinar antes do snapshot: uma transição publicada entre os dois
+    # passos chega pela assinatura em vez de se perder
+    assinatura = await _abrir_assinatura(numero_sinistro)
+    try:
+        snapshot = await run_in_threadpool(_snapshot_status, numero_sinistro)
+    except Exception:
+        await assinatura.fechar()
+        raise
+
+    if not snapshot:
+        await assinatura.fechar()
+        raise HTTPException(status_code=404, detail="Sinistro não encontrado")
+
+    if snapshot["dados"]["status_novo"] in STATUS_FINAIS:
+        await assinatura.fechar()
+        return _stream(snapshot, None)
+    return _stream(snapshot, assinatura)
+
+
+@router.get("/eventos")
+async def stream_eventos_globais():
+    """Stream SSE com os eventos de todos os sinistros (dashboard)"""
+    return _stream(None, await _abrir_assinatura())
+
+
+@router.websocket("/ws/sinistros/{numero_sinistro}")
+async def websocket_eventos_sinistro(websocket: WebSocket, numero_sinistro: str):
+    """Mesmo conteúdo do stream SSE, via WebSocket"""
+    await websocket.accept()
+
+    # Assinar antes do snapshot, como no SSE; sem Redis o snapshot ainda é entregue
+    assinatura = None
+    try:
+        try:
+            assinatura = await AssinaturaEventos(numero_sinistro).abrir()
+        except Exception as e:
+            logger.warning(f"Canal de eventos indisponível: {e}")
+
+        snapshot = await run_in_threadpool(_snapshot_status, numero_sinistro)
+        if not snapshot:
+            await websocket.close(code=4404, reason="Sinistro não encontrado")
+            return
+
+        await websocket.send_json(snapshot)
+        if snapshot["dados"]["status_novo"] in STATUS_FINAIS:
+            await websocket.close()
+            return
+
+        if assinatura is None:
+            await websocket.close(code=1013, reason="Canal de eventos indisponível")
+            return
+
+        async for evento in assinatura:
+            if evento is None:
+                # Heartbeat: falha aqui indica cliente desconectado
+                await websocket.send_json({"tipo": "keep-alive"})
+                continue
+
+            await websocket.send_json(evento)
+            if evento_final(evento):
+                break
+
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        logger.debug(f"Cliente desconectado do stream do sinistro {numero_sinistro}")
+    finally:
+        if assinatura is not None:
+            await assinatura.fechar()
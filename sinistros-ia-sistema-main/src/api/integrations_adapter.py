@@ -7,12 +7,16 @@ from typing import Dict, Any, Optional
 import logging
 from datetime import datetime
 
-from ..connectors.claims_receiver import receive_claim_from_channel
-from ..database.connection import get_db_session
+from ..utils.preguicoso import importar_preguicoso
+from ..database.connection import get_db_session, get_db_leitura_session
 from ..database.models import Sinistro
+from ..database.carregamento import sinistro_com_ultima_analise
 from ..monitoring.metrics import track_metric
 
 logger = logging.getLogger(__name__)
+
+# Conectores (e as tarefas Celery que eles enfileiram) carregam no primeiro sinistro recebido
+conectores = importar_preguicoso("..connectors.claims_receiver", __package__)
 router = APIRouter(prefix="/integrations", tags=["integrations"])
 
 
@@ -38,7 +42,7 @@ async def receive_legacy_claim(
     }
     """
     try:
-        numero_sinistro = receive_claim_from_channel('legacy', data)
+        numero_sinistro = conectores.receive_claim_from_channel('legacy', data)
         
         track_metric("integration_legacy_claim", 1)
         
@@ -86,7 +90,7 @@ async def receive_mobile_claim(
     }
     """
     try:
-        numero_sinistro = receive_claim_from_channel('mobile', data)
+        numero_sinistro = conectores.receive_claim_from_channel('mobile', data)
         
         track_metric("integration_mobile_claim", 1)
         
@@ -127,7 +131,7 @@ async def receive_email_claim(
     }
     """
     try:
-        numero_sinistro = receive_claim_from_channel('email', data)
+        numero_sinistro = conectores.receive_claim_from_channel('email', data)
         
         track_metric("integration_email_claim", 1)
         
@@ -174,7 +178,7 @@ async def process_batch_file(
                 data['linha_numero'] = idx + 1
                 data['arquivo_origem'] = file_url
                 
-                receive_claim_from_channel('batch', data)
+                conectores.receive_claim_from_channel('batch', data)
                 processed += 1
                 
             except Exception as e:
@@ -203,30 +207,25 @@ async def get_claim_status(claim_number: str):
     Retorna status do sinistro para sistemas externos
     """
     try:
-        with get_db_session() as db:
-            sinistro = db.query(Sinistro).filter_by(
-                numero_sinistro=claim_number
-            ).first()
+        with get_db_leitura_session() as db:
+            # Última análise consolidada vem na mesma consulta do sinistro
+            sinistro, analise = sinistro_com_ultima_analise(db, claim_number)
             
             if not sinistro:
                 raise HTTPException(status_code=404, detail="Sinistro não encontrado")
             
-            # Buscar última análise se houver
-            analise = None
-            if sinistro.analises:
-                analise = max(sinistro.analises, key=lambda a: a.criado_em)
-            
             return {
                 "claim_number": sinistro.numero_sinistro,
                 "status": sinistro.status.value,
-                "created_at": sinistro.criado_em.isoformat(),
+                "created_at": sinistro.data_criacao.isoformat(),
                 "insured_name": sinistro.segurado_nome,
                 "policy_number": sinistro.apolice_numero,
                 "analysis": {
-                    "status": analise.status if analise else None,
-                    "decision": analise.decisao if analise else None,
-                    "risk_score": analise.score_risco if analise else None,
-                    "completed_at": analise.finalizado_em.isoformat() if analise and analise.finalizado_em else None
+                    "status": ("concluida" if analise.sucesso else "erro") if analise.data_fim else "em_andamento",
+                    "decision": analise.decisao,
+                    "risk_score": (analise.resultado or {}).get("score_risco"),
+                    "confidence": analise.confianca,
+                    "completed_at": analise.data_fim.isoformat() if analise.data_fim else None
                 } if analise else None
             }
     
@@ -9,21 +9,32 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
-import uuid
 
 # Configurações e banco
 from ..config.settings import get_settings
-from ..database.connection import get_db, init_db
-from ..database.models import Sinistro, StatusSinistro, TipoSinistro, HistoricoSinistro
+from ..database.connection import get_db, get_db_leitura, commit_sem_expirar, init_db
+from ..database.models import Sinistro, StatusSinistro, TipoSinistro, HistoricoSinistro, Analise
+from ..database.filtros import filtro_metadados, filtro_alerta
+from ..database.carregamento import sinistro_com_ultima_analise
+from ..database.criacao import registrar_sinistro
+from ..database.consultas import LimiteConsultasMiddleware
 
-# Workers e tarefas
-from ..workers.tasks import processar_sinistro_async, enviar_webhook
+# Inicialização sob demanda (cold start)
+from ..utils.preguicoso import importar_preguicoso, inicializar_recursos, relatorio_inicializacao
 
-# Integrações
-from ..integrations.legacy_system import sincronizar_sinistro_com_legado
+# Workers (Celery) e integrações carregam no primeiro uso
+tasks = importar_preguicoso("..workers.tasks", __package__)
+legado = importar_preguicoso("..integrations.legacy_system", __package__)
+
+# Eventos em tempo real
+from ..events.bus import publicar_evento, publicar_mudanca_status
 
 # Monitoramento
-from ..monitoring.metrics import MetricsMiddleware, track_metric, track_error, track_time
+from ..monitoring.metrics import MetricsMiddleware, prometheus, track_metric, track_error, track_time
+from ..monitoring.rastreamento import RastreamentoMiddleware, anotar
+from ..monitoring import amostragem
+from .consistencia import LeituraAposEscritaMiddleware
+from .seguranca import exigir_admin
 
 # Modelos Pydantic
 from pydantic import BaseModel, Field, validator
@@ -38,6 +49,18 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# O Sentry sobe antes da aplicação, inclusive em serverless: iniciado só no
+# primeiro erro, perderia as transações e erros anteriores e a amostragem
+inicializar_recursos("sentry")
+
+# Status em que o pipeline de agentes ainda está trabalhando no sinistro
+STATUS_EM_ANDAMENTO = [
+    StatusSinistro.TRIAGEM,
+    StatusSinistro.EM_ANALISE,
+    StatusSinistro.EM_CALCULO,
+    StatusSinistro.EM_COMPLIANCE
+]
+
 # Criar aplicação FastAPI
 app = FastAPI(
     title="Sistema Inteligente de Análise de Sinistros",
@@ -59,6 +82,16 @@ app.add_middleware(
 # Middleware de métricas
 app.add_middleware(MetricsMiddleware)
 
+# Span de cada requisição (continua o traceparent recebido)
+app.add_middleware(RastreamentoMiddleware)
+
+# Leituras vão para réplicas, exceto logo após escritas do próprio cliente
+app.add_middleware(LeituraAposEscritaMiddleware)
+
+# Em testes, requisição com consultas demais (N+1) falha
+if settings.ENVIRONMENT == "test":
+    app.add_middleware(LimiteConsultasMiddleware)
+
 # Modelos Pydantic para API
 class TipoSinistroEnum(str, Enum):
     automovel = "automovel"
@@ -125,6 +158,15 @@ class AnaliseRequest(BaseModel):
     """Requisição para análise"""
     prioridade: Optional[int] = Field(5, ge=1, le=10)
     reprocessar: Optional[bool] = False
+    # Reexecutar todos os agentes em vez de apenas as etapas com entradas alteradas
+    completo: Optional[bool] = False
+
+class AmostragemUpdate(BaseModel):
+    traces: Optional[float] = Field(None, ge=0, le=1)
+    profiles: Optional[float] = Field(None, ge=0, le=1)
+    limiar_lento_ms: Optional[int] = Field(None, gt=0)
+    janela_reforco_segundos: Optional[int] = Field(None, ge=0)
+    rotas: Optional[Dict[str, float]] = None
 
 class AnaliseResponse(BaseModel):
     """Resposta da análise"""
@@ -152,7 +194,11 @@ async def general_exception_handler(request: Request, exc: Exception):
 
 # Incluir routers
 from .integrations_adapter import router as integrations_router
+from .eventos import router as eventos_router
+from .busca import router as busca_router
 app.include_router(integrations_router, prefix="/api/v1")
+app.include_router(eventos_router, prefix="/api/v1")
+app.include_router(busca_router, prefix="/api/v1")
 
 # Eventos de startup/shutdown
 @app.on_event("startup")
@@ -160,17 +206,27 @@ async def startup_event():
     """Inicializar recursos na startup"""
     logger.info("Iniciando aplicação...")
     
+    if settings.INICIALIZACAO_PREGUICOSA:
+        # Serverless: cada subsistema sobe no primeiro uso
+        logger.info(f"Inicialização preguiçosa: {relatorio_inicializacao(limite=10)}")
+        return
+    
     # Inicializar banco
     init_db()
     
+    # Pré-aquecer o que a primeira requisição usaria
+    inicializar_recursos("prometheus")
+    tasks._carregar()
+    
     # Verificar conexões
-    from ..integrations.legacy_system import legacy_client
     try:
         # Testar conexão com sistema legado
-        legacy_client.session.get(f"{settings.LEGACY_SYSTEM_URL}/health")
+        legado.legacy_client.session.get(f"{settings.LEGACY_SYSTEM_URL}/health")
         logger.info("Conexão com sistema legado OK")
     except Exception as e:
         logger.warning(f"Sistema legado indisponível: {e}")
+    
+    logger.info(f"Perfil de inicialização: {relatorio_inicializacao(limite=10)}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -197,52 +253,36 @@ async def criar_sinistro(
     """Criar novo sinistro"""
     with track_time("criar_sinistro"):
         try:
-            # Gerar número único
-            numero_sinistro = f"SIN-{datetime.now().year}-{uuid.uuid4().hex[:8].upper()}"
-            
-            # Criar sinistro no banco
-            sinistro = Sinistro(
-                numero_sinistro=numero_sinistro,
-                status=StatusSinistro.RECEBIDO,
-                data_ocorrencia=sinistro_data.data_ocorrencia,
-                segurado_nome=sinistro_data.segurado_nome,
-                segurado_documento=sinistro_data.segurado_documento,
-                segurado_telefone=sinistro_data.segurado_telefone,
-                segurado_email=sinistro_data.segurado_email,
-                apolice_numero=sinistro_data.apolice_numero,
-                descricao=sinistro_data.descricao,
-                local_ocorrencia=sinistro_data.local_ocorrencia,
-                valor_estimado=sinistro_data.valor_estimado,
-                canal_origem=sinistro_data.canal_origem,
-                sistema_origem=sinistro_data.sistema_origem,
-                metadata=sinistro_data.metadata
-            )
-            
-            db.add(sinistro)
-            db.commit()
-            db.refresh(sinistro)
-            
-            # Histórico
-            historico = HistoricoSinistro(
-                sinistro_id=sinistro.id,
-                acao="sinistro_criado",
+            # Sinistro e histórico de criação numa única transação
+            sinistro = registrar_sinistro(
+                db,
+                sinistro_data.dict(),
                 usuario="api",
-                descricao=f"Sinistro criado via {sinistro_data.canal_origem}"
+                descricao_historico=f"Sinistro criado via {sinistro_data.canal_origem}"
             )
-            db.add(historico)
-            db.commit()
+            commit_sem_expirar(db)
+            numero_sinistro = sinistro.numero_sinistro
+            anotar({"sinistro.numero": numero_sinistro})
             
             # Sincronizar com sistema legado em background
-            background_tasks.add_task(sincronizar_sinistro_com_legado, sinistro)
+            background_tasks.add_task(legado.sincronizar_sinistro_com_legado, sinistro.numero_sinistro)
             
             # Webhook de criação
             background_tasks.add_task(
-                enviar_webhook.delay,
+                tasks.enviar_webhook.delay,
                 sinistro.numero_sinistro,
                 "sinistro.criado",
                 {"numero": sinistro.numero_sinistro, "status": "recebido"}
             )
             
+            # Evento para o dashboard
+            background_tasks.add_task(
+                publicar_evento,
+                sinistro.numero_sinistro,
+                "sinistro.criado",
+                {"status": "recebido", "canal": sinistro.canal_origem}
+            )
+            
             # Métrica
             track_metric("sinistros_criados", 1, {
                 "canal": sinistro.canal_origem,
@@ -258,7 +298,7 @@ async def criar_sinistro(
             raise HTTPException(status_code=500, detail="Erro ao criar sinistro")
 
 @app.get("/api/v1/sinistros/{numero_sinistro}", response_model=SinistroResponse)
-async def obter_sinistro(numero_sinistro: str, db: Session = Depends(get_db)):
+async def obter_sinistro(numero_sinistro: str, db: Session = Depends(get_db_leitura)):
     """Obter sinistro por número"""
     sinistro = db.query(Sinistro).filter_by(numero_sinistro=numero_sinistro).first()
     
@@ -271,11 +311,21 @@ async def obter_sinistro(numero_sinistro: str, db: Session = Depends(get_db)):
 async def listar_sinistros(
     status: Optional[StatusSinistroEnum] = None,
     tipo: Optional[TipoSinistroEnum] = None,
+    legacy_id: Optional[str] = None,
+    origem: Optional[str] = None,
+    arquivo_lote: Optional[str] = None,
+    alerta: Optional[str] = None,
     limite: int = 100,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura)
 ):
-    """Listar sinistros com filtros"""
+    """
+    Listar sinistros com filtros
+    
+    legacy_id, origem (canal de recebimento) e arquivo_lote filtram chaves
+    indexadas de metadata; alerta busca sinistros com alguma análise que
+    contenha o alerta.
+    """
     query = db.query(Sinistro)
     
     if status:
@@ -284,6 +334,13 @@ async def listar_sinistros(
     if tipo:
         query = query.filter(Sinistro.tipo == TipoSinistro[tipo.value.upper()])
     
+    for chave, valor in (("legacy_id", legacy_id), ("source", origem), ("batch_file", arquivo_lote)):
+        if valor is not None:
+            query = query.filter(filtro_metadados(chave, valor))
+    
+    if alerta:
+        query = query.filter(filtro_alerta(db.bind.dialect.name, alerta))
+    
     sinistros = query.offset(offset).limit(limite).all()
     return sinistros
 
@@ -295,6 +352,7 @@ async def analisar_sinistro(
 ):
     """Iniciar análise de sinistro pelos agentes"""
     with track_time("iniciar_analise", {"prioridade": str(analise_req.prioridade)}):
+        anotar({"sinistro.numero": numero_sinistro})
         sinistro = db.query(Sinistro).filter_by(numero_sinistro=numero_sinistro).first()
         
         if not sinistro:
@@ -310,15 +368,14 @@ async def analisar_sinistro(
                 )
         
         try:
-            # Criar task assíncrona
-            task = processar_sinistro_async.apply_async(
-                args=[numero_sinistro],
-                priority=analise_req.prioridade
-            )
-            
-            # Atualizar status
+            # Atualizar status: enfileirar_analise o grava junto com a fila antes
+            # de publicar a task, senão o worker pode avançá-lo e ser sobrescrito
+            status_anterior = sinistro.status.value
             sinistro.status = StatusSinistro.TRIAGEM
-            db.commit()
+
+            # Criar task assíncrona
+            task = tasks.enfileirar_analise(db, numero_sinistro, analise_req.prioridade, analise_req.completo)
+            publicar_mudanca_status(numero_sinistro, status_anterior, StatusSinistro.TRIAGEM.value, {"task_id": task.id})
             
             # Métrica
             track_metric("analises_iniciadas", 1, {"prioridade": str(analise_req.prioridade)})
@@ -335,31 +392,32 @@ async def analisar_sinistro(
             raise HTTPException(status_code=500, detail="Erro ao iniciar análise")
 
 @app.get("/api/v1/sinistros/{numero_sinistro}/status")
-async def status_analise(numero_sinistro: str, db: Session = Depends(get_db)):
+async def status_analise(numero_sinistro: str, db: Session = Depends(get_db_leitura)):
     """Verificar status da análise"""
-    sinistro = db.query(Sinistro).filter_by(numero_sinistro=numero_sinistro).first()
+    # Sinistro e última análise consolidada (as demais são as etapas de cada agente) numa consulta
+    sinistro, ultima_analise = sinistro_com_ultima_analise(db, numero_sinistro)
     
     if not sinistro:
         raise HTTPException(status_code=404, detail="Sinistro não encontrado")
     
-    # Buscar última análise
-    ultima_analise = db.query(Analise).filter_by(
-        sinistro_id=sinistro.id
-    ).order_by(Analise.data_inicio.desc()).first()
-    
     return {
         "numero_sinistro": numero_sinistro,
         "status_atual": sinistro.status.value,
         "analise": {
-            "em_andamento": sinistro.status in [StatusSinistro.EM_ANALISE, StatusSinistro.TRIAGEM],
+            "em_andamento": sinistro.status in STATUS_EM_ANDAMENTO,
             "data_inicio": ultima_analise.data_inicio if ultima_analise else None,
             "data_fim": ultima_analise.data_fim if ultima_analise else None,
-            "resultado": ultima_analise.resultado if ultima_analise and ultima_analise.data_fim else None
+            "resultado": ultima_analise.resultado if ultima_analise and ultima_analise.data_fim else None,
+            "consumo": {
+                "tokens_prompt": ultima_analise.tokens_prompt,
+                "tokens_completion": ultima_analise.tokens_completion,
+                "custo_estimado_usd": ultima_analise.custo_estimado
+            } if ultima_analise else None
         }
     }
 
 @app.get("/api/v1/admin/metricas")
-async def obter_metricas(db: Session = Depends(get_db)):
+async def obter_metricas(db: Session = Depends(get_db_leitura)):
     """Obter métricas do sistema"""
     from sqlalchemy import func
     
@@ -384,7 +442,7 @@ async def obter_metricas(db: Session = Depends(get_db)):
         "totais": {
             "sinistros": db.query(func.count(Sinistro.id)).scalar(),
             "em_analise": db.query(func.count(Sinistro.id)).filter(
-                Sinistro.status.in_([StatusSinistro.EM_ANALISE, StatusSinistro.TRIAGEM])
+                Sinistro.status.in_(STATUS_EM_ANDAMENTO)
             ).scalar()
         },
         "por_status": {status.value: count for status, count in status_count if status},
@@ -396,14 +454,46 @@ async def obter_metricas(db: Session = Depends(get_db)):
         }
     }
 
+@app.get("/api/v1/admin/inicializacao")
+async def perfil_inicializacao():
+    """Tempo de import por módulo (com PERFIL_INICIALIZACAO=1) e de criação dos recursos"""
+    return relatorio_inicializacao()
+
+@app.get("/api/v1/admin/amostragem")
+async def obter_amostragem():
+    """Taxas de amostragem do Sentry em vigor (e rotas reforçadas neste processo)"""
+    return amostragem.estado_amostragem()
+
+@app.put("/api/v1/admin/amostragem", dependencies=[Depends(exigir_admin)])
+def atualizar_amostragem(dados: AmostragemUpdate):
+    """
+    Ajusta as taxas de amostragem do Sentry sem reiniciar; gravadas no
+    Redis, valem para todos os processos em até SENTRY_SINCRONIZAR_TAXAS_SEGUNDOS
+    """
+    try:
+        return amostragem.atualizar_taxas(**dados.dict(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.delete("/api/v1/admin/amostragem", dependencies=[Depends(exigir_admin)])
+def restaurar_amostragem():
+    """Volta todos os processos às taxas das settings"""
+    try:
+        return amostragem.restaurar_taxas()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 # Rota para Prometheus metrics
 if settings.PROMETHEUS_ENABLED:
-    from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
     from fastapi.responses import Response
     
     @app.get("/metrics")
     async def metrics():
         """Endpoint para Prometheus coletar métricas"""
+        from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+        prometheus.obter()
         return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
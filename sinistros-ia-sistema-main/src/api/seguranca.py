@@ -0,0 +1,27 @@
+"""
+Autorização das operações administrativas da API
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from ..config.settings import get_settings
+
+settings = get_settings()
+
+
+def exigir_admin(authorization: Optional[str] = Header(None)):
+    """
+    Dependência das operações administrativas de escrita:
+    Authorization: Bearer <ADMIN_API_TOKEN>. Sem token configurado, elas
+    ficam desabilitadas.
+    """
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Operações administrativas desabilitadas (ADMIN_API_TOKEN)")
+
+    esquema, _, token = (authorization or "").partition(" ")
+    if esquema.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token administrativo inválido",
+                            headers={"WWW-Authenticate": "Bearer"})
@@ -9,9 +9,11 @@ from abc import ABC, abstractmethod
 import json
 
 from ..database.connection import get_db_session
-from ..database.models import Sinistro, StatusSinistro
-from ..workers.tasks import processar_sinistro_async
+from ..database.criacao import registrar_sinistro
+from ..workers.tasks import enfileirar_analise
+from ..workers.filas import prioridade_canal
 from ..monitoring.metrics import track_metric, track_error
+from ..utils.compactacao import compactar_texto, normalizar_espacos
 
 logger = logging.getLogger(__name__)
 
@@ -39,21 +41,23 @@ class BaseClaimsReceiver(ABC):
             
             # 2. Transformar para formato interno
             claim_data = self.transform_claim_data(validated_data)
+            claim_data['descricao'] = normalizar_espacos(claim_data.get('descricao', ''))
             
-            # 3. Adicionar metadados
+            # 3. Adicionar metadados (os dados brutos vão para PayloadSinistro)
             claim_data['canal_origem'] = source
             claim_data['sistema_origem'] = self.__class__.__name__
             claim_data['metadata'] = {
-                'raw_data': raw_data,
+                **claim_data.get('metadata', {}),
                 'received_at': datetime.now().isoformat(),
                 'source': source
             }
             
-            # 4. Criar sinistro no banco
-            numero_sinistro = self._create_claim(claim_data)
-            
-            # 5. Iniciar processamento assíncrono
-            self._start_processing(numero_sinistro)
+            # 4. Criar sinistro e enfileirar a análise na mesma transação
+            with get_db_session() as db:
+                numero_sinistro = self._create_claim(db, claim_data, payloads={'raw_data': raw_data})
+                
+                # 5. Iniciar processamento assíncrono (o commit grava tudo junto)
+                self._start_processing(db, numero_sinistro, source)
             
             # 6. Métricas
             track_metric("sinistro_recebido", 1, {"canal": source, "receiver": self.__class__.__name__})
@@ -66,38 +70,20 @@ class BaseClaimsReceiver(ABC):
             track_error("erro_receber_sinistro", e, {"source": source})
             raise
     
-    def _create_claim(self, claim_data: Dict[str, Any]) -> str:
-        """Cria sinistro no banco de dados"""
-        import uuid
-        
-        with get_db_session() as db:
-            numero_sinistro = f"SIN-{datetime.now().year}-{uuid.uuid4().hex[:8].upper()}"
-            
-            sinistro = Sinistro(
-                numero_sinistro=numero_sinistro,
-                status=StatusSinistro.RECEBIDO,
-                data_ocorrencia=claim_data['data_ocorrencia'],
-                segurado_nome=claim_data['segurado_nome'],
-                segurado_documento=claim_data['segurado_documento'],
-                segurado_telefone=claim_data.get('segurado_telefone'),
-                segurado_email=claim_data.get('segurado_email'),
-                apolice_numero=claim_data['apolice_numero'],
-                descricao=claim_data['descricao'],
-                local_ocorrencia=claim_data.get('local_ocorrencia'),
-                valor_estimado=claim_data.get('valor_estimado', 0),
-                canal_origem=claim_data['canal_origem'],
-                sistema_origem=claim_data['sistema_origem'],
-                metadata=claim_data.get('metadata', {})
-            )
-            
-            db.add(sinistro)
-            db.commit()
-            
-            return numero_sinistro
+    def _create_claim(self, db, claim_data: Dict[str, Any], payloads: Optional[Dict[str, Any]] = None) -> str:
+        """Adiciona o sinistro (histórico e payloads volumosos à parte) à transação"""
+        sinistro = registrar_sinistro(
+            db,
+            claim_data,
+            usuario=claim_data['sistema_origem'],
+            descricao_historico=f"Sinistro recebido via {claim_data['canal_origem']}",
+            payloads=payloads
+        )
+        return sinistro.numero_sinistro
     
-    def _start_processing(self, numero_sinistro: str):
-        """Inicia processamento assíncrono"""
-        processar_sinistro_async.delay(numero_sinistro)
+    def _start_processing(self, db, numero_sinistro: str, source: str):
+        """Inicia processamento assíncrono com a prioridade do canal"""
+        enfileirar_analise(db, numero_sinistro, prioridade_canal(source))
 
 
 class LegacySystemReceiver(BaseClaimsReceiver):
@@ -204,6 +190,9 @@ class MobileAppReceiver(BaseClaimsReceiver):
 class EmailReceiver(BaseClaimsReceiver):
     """Recebe sinistros via email"""
     
+    # Corpo do email sem citações/assinaturas, limitado em tokens
+    MAX_TOKENS_CORPO = 400
+    
     def validate_claim_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Valida dados do email"""
         if not data.get('from_email'):
@@ -236,7 +225,7 @@ class EmailReceiver(BaseClaimsReceiver):
             'segurado_documento': cpf,
             'segurado_email': data['from_email'],
             'apolice_numero': apolice,
-            'descricao': f"Assunto: {data['subject']}\n\nCorpo: {body[:1000]}",
+            'descricao': f"Assunto: {data['subject']}\n\nCorpo: {compactar_texto(body, max_tokens=self.MAX_TOKENS_CORPO)}",
             'valor_estimado': 0,
             'metadata': {
                 'email_id': data.get('email_id'),
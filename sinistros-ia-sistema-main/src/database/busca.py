@@ -0,0 +1,171 @@
+"""
+Busca textual nas descrições dos sinistros e nas saídas dos agentes
+
+PostgreSQL: coluna gerada sinistros.busca_vetor (tsvector, configuração
+portuguese) com índice GIN; descricao tem peso A e texto_analises peso B.
+Por ser coluna gerada, o índice acompanha cada INSERT/UPDATE sem
+reindexação. SQLite (testes): tabela FTS5 de conteúdo externo mantida
+por triggers.
+
+Os resultados vêm ordenados por relevância e paginados por cursor
+(relevância, id), estável mesmo com novos sinistros entrando.
+"""
+
+import base64
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Numeric, and_, cast, column, func, literal_column, or_, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .models import Sinistro, StatusSinistro, TipoSinistro
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACAO_TEXTO = "portuguese"
+CASAS_RELEVANCIA = 6
+
+DDL_POSTGRES = [
+    "ALTER TABLE sinistros ADD COLUMN IF NOT EXISTS busca_vetor tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{CONFIGURACAO_TEXTO}', coalesce(descricao, '')), 'A') || "
+    f"setweight(to_tsvector('{CONFIGURACAO_TEXTO}', coalesce(texto_analises, '')), 'B')"
+    ") STORED",
+]
+INDICE_POSTGRES = "CREATE INDEX {concorrente} IF NOT EXISTS ix_sinistros_busca_vetor ON sinistros USING GIN (busca_vetor)"
+
+DDL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS sinistros_fts USING fts5("
+    "descricao, texto_analises, content='sinistros', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS sinistros_fts_ai AFTER INSERT ON sinistros BEGIN "
+    "INSERT INTO sinistros_fts(rowid, descricao, texto_analises) VALUES (new.id, new.descricao, new.texto_analises); END",
+    "CREATE TRIGGER IF NOT EXISTS sinistros_fts_ad AFTER DELETE ON sinistros BEGIN "
+    "INSERT INTO sinistros_fts(sinistros_fts, rowid, descricao, texto_analises) "
+    "VALUES ('delete', old.id, old.descricao, old.texto_analises); END",
+    "CREATE TRIGGER IF NOT EXISTS sinistros_fts_au AFTER UPDATE OF descricao, texto_analises ON sinistros BEGIN "
+    "INSERT INTO sinistros_fts(sinistros_fts, rowid, descricao, texto_analises) "
+    "VALUES ('delete', old.id, old.descricao, old.texto_analises); "
+    "INSERT INTO sinistros_fts(rowid, descricao, texto_analises) VALUES (new.id, new.descricao, new.texto_analises); END",
+]
+
+
+TABELA_FTS = table("sinistros_fts", column("rowid"))
+
+
+def configurar_busca(conexao: Connection):
+    """Cria a estrutura de busca do banco (idempotente)"""
+    dialeto = conexao.dialect.name
+    if dialeto == "postgresql":
+        for ddl in DDL_POSTGRES:
+            conexao.execute(text(ddl))
+        conexao.execute(text(INDICE_POSTGRES.format(concorrente="")))
+    elif dialeto == "sqlite":
+        for ddl in DDL_SQLITE:
+            conexao.execute(text(ddl))
+    else:
+        logger.warning(f"Busca textual não suportada no banco {dialeto}")
+
+
+def codificar_cursor(relevancia: float, sinistro_id: int) -> str:
+    dados = json.dumps({"r": relevancia, "id": sinistro_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[float, int]:
+    """(relevância, id) do último resultado da página anterior"""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(dados["r"]), int(dados["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
+
+
+def _tokens(termos: str) -> List[str]:
+    return re.findall(r"\w+", termos, flags=re.UNICODE)
+
+
+def _consulta_fts5(termos: str) -> str:
+    """Termos do usuário como tokens entre aspas (todos obrigatórios), sem sintaxe FTS5"""
+    return " ".join(f'"{token}"' for token in _tokens(termos))
+
+
+def _relevancia_e_filtro(db: Session, termos: str):
+    """Relevância (maior = melhor), condição de busca e tabela FTS a juntar (SQLite)"""
+    dialeto = db.bind.dialect.name
+    if dialeto == "postgresql":
+        vetor = literal_column("sinistros.busca_vetor")
+        consulta = func.websearch_to_tsquery(literal_column(f"'{CONFIGURACAO_TEXTO}'::regconfig"), termos)
+        relevancia = func.round(cast(func.ts_rank_cd(vetor, consulta), Numeric), CASAS_RELEVANCIA)
+        return relevancia, vetor.op("@@")(consulta), None
+
+    if dialeto == "sqlite":
+        fts = literal_column("sinistros_fts")
+        relevancia = func.round(-func.bm25(fts, 2.0, 1.0), CASAS_RELEVANCIA)
+        return relevancia, fts.op("MATCH")(_consulta_fts5(termos)), TABELA_FTS
+
+    raise NotImplementedError(f"Busca textual não suportada no banco {dialeto}")
+
+
+def buscar_sinistros(db: Session, termos: str,
+                     status: Optional[StatusSinistro] = None,
+                     tipo: Optional[TipoSinistro] = None,
+                     desde: Optional[datetime] = None,
+                     ate: Optional[datetime] = None,
+                     limite: int = 20,
+                     cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Sinistros que contêm os termos, do mais ao menos relevante
+
+    Retorna {"resultados": [...], "proximo_cursor": str | None}. Termos
+    só com pontuação ou operadores não casam com nada (no SQLite, MATCH ''
+    seria erro de sintaxe).
+    """
+    if not _tokens(termos):
+        return {"resultados": [], "proximo_cursor": None}
+
+    relevancia, condicao, tabela_fts = _relevancia_e_filtro(db, termos)
+
+    consulta = db.query(Sinistro, relevancia.label("relevancia"))
+    if tabela_fts is not None:
+        consulta = consulta.join(tabela_fts, tabela_fts.c.rowid == Sinistro.id)
+    consulta = consulta.filter(condicao)
+
+    if status:
+        consulta = consulta.filter(Sinistro.status == status)
+    if tipo:
+        consulta = consulta.filter(Sinistro.tipo == tipo)
+    if desde:
+        consulta = consulta.filter(Sinistro.data_ocorrencia >= desde)
+    if ate:
+        consulta = consulta.filter(Sinistro.data_ocorrencia <= ate)
+
+    if cursor:
+        ultima_relevancia, ultimo_id = decodificar_cursor(cursor)
+        consulta = consulta.filter(or_(
+            relevancia < ultima_relevancia,
+            and_(relevancia == ultima_relevancia, Sinistro.id < ultimo_id)
+        ))
+
+    linhas = consulta.order_by(relevancia.desc(), Sinistro.id.desc()).limit(limite + 1).all()
+    pagina = linhas[:limite]
+
+    resultados: List[Dict[str, Any]] = [
+        {
+            "numero_sinistro": sinistro.numero_sinistro,
+            "status": sinistro.status.value,
+            "tipo": sinistro.tipo.value if sinistro.tipo else None,
+            "data_ocorrencia": sinistro.data_ocorrencia.isoformat(),
+            "segurado_nome": sinistro.segurado_nome,
+            "relevancia": float(valor),
+        }
+        for sinistro, valor in pagina
+    ]
+    proximo_cursor = None
+    if len(linhas) > limite:
+        ultimo, valor = pagina[-1]
+        proximo_cursor = codificar_cursor(float(valor), ultimo.id)
+
+    return {"resultados": resultados, "proximo_cursor": proximo_cursor}
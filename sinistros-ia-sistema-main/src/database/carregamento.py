@@ -0,0 +1,58 @@
+"""
+Perfis de carregamento dos relacionamentos
+
+Cada padrão de acesso declara aqui o que precisa, para que o número de
+consultas não cresça com o número de documentos/análises (N+1):
+
+- analise_agentes: dados enviados aos agentes (_dados_sinistro)
+- sincronizacao_legado: envio do sinistro e documentos ao legado
+
+A última análise de um sinistro vem de uma subconsulta na mesma
+consulta do sinistro, sem carregar a coleção analises.
+"""
+
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Query, Session, selectinload
+
+from .models import Analise, Sinistro
+
+# Relacionamentos de Sinistro carregados com selectinload em cada perfil (as
+# opções são montadas na consulta, para não configurar os mappers no import)
+PERFIS = {
+    "analise_agentes": ("documentos",),
+    "sincronizacao_legado": ("documentos",),
+}
+
+
+def com_perfil(consulta: Query, perfil: str) -> Query:
+    """Aplica as opções de carregamento do perfil à consulta de Sinistro"""
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil de carregamento desconhecido: {perfil}")
+    return consulta.options(*(selectinload(getattr(Sinistro, relacao)) for relacao in PERFIS[perfil]))
+
+
+def id_ultima_analise(tipo_analise: Optional[str] = "completa"):
+    """Subconsulta correlacionada com o id da análise mais recente do sinistro"""
+    consulta = select(Analise.id).where(Analise.sinistro_id == Sinistro.id)
+    if tipo_analise:
+        consulta = consulta.where(Analise.tipo_analise == tipo_analise)
+    return (
+        consulta.order_by(Analise.data_inicio.desc(), Analise.id.desc())
+        .limit(1)
+        .correlate(Sinistro)
+        .scalar_subquery()
+    )
+
+
+def sinistro_com_ultima_analise(db: Session, numero_sinistro: str,
+                                tipo_analise: Optional[str] = "completa") -> Tuple[Optional[Sinistro], Optional[Analise]]:
+    """(sinistro, última análise do tipo) em uma consulta; (None, None) se não existe"""
+    linha = (
+        db.query(Sinistro, Analise)
+        .outerjoin(Analise, Analise.id == id_ultima_analise(tipo_analise))
+        .filter(Sinistro.numero_sinistro == numero_sinistro)
+        .first()
+    )
+    return (linha[0], linha[1]) if linha else (None, None)
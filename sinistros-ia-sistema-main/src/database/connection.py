@@ -1,26 +1,40 @@
 """
 Conexão e sessão do banco de dados
+
+Escritas usam o primário (get_db, get_db_session). Leituras que toleram
+alguns segundos de atraso usam get_db_leitura / get_db_leitura_session,
+que vão para uma das réplicas em DATABASE_REPLICA_URLS, exceto quando a
+requisição está marcada para ler do primário (leitura após escrita do
+próprio cliente, ver usar_primario).
+
+Os engines são criados no primeiro uso (get_engine), não no import: o
+driver do banco só é carregado quando a aplicação de fato acessa o banco.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
 from contextlib import contextmanager
+from contextvars import ContextVar
+import itertools
 import logging
-from typing import Generator
+import os
+import threading
+from typing import Generator, List
 
 from ..config.settings import get_settings
+from ..utils.preguicoso import recurso
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Criar engine do banco
-if settings.ENVIRONMENT == "test":
-    # Para testes, usar SQLite em memória
-    engine = create_engine("sqlite:///:memory:", poolclass=NullPool)
-else:
+def _criar_engine() -> Engine:
+    if settings.ENVIRONMENT == "test":
+        # Para testes, usar SQLite em memória
+        return create_engine("sqlite:///:memory:", poolclass=NullPool)
     # Para produção, usar PostgreSQL com pool
-    engine = create_engine(
+    return create_engine(
         settings.DATABASE_URL,
         pool_size=settings.DATABASE_POOL_SIZE,
         max_overflow=settings.DATABASE_MAX_OVERFLOW,
@@ -28,8 +42,73 @@ else:
         echo=settings.DEBUG,  # Log SQL em debug
     )
 
-# Criar sessão
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _criar_replicas() -> List[Engine]:
+    # Réplicas de leitura (nunca em testes)
+    if settings.ENVIRONMENT == "test":
+        return []
+    return [
+        create_engine(
+            url,
+            pool_size=settings.DATABASE_REPLICA_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            echo=settings.DEBUG,
+        )
+        for url in settings.DATABASE_REPLICA_URLS
+    ]
+
+engine_primario = recurso("banco", _criar_engine)
+engines_replicas = recurso("banco_replicas", _criar_replicas)
+
+def get_engine() -> Engine:
+    """Engine do primário (criado na primeira chamada)"""
+    return engine_primario.obter()
+
+def __getattr__(nome: str):
+    # Compatibilidade: connection.engine continua disponível, criado sob demanda
+    if nome == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+_proxima_replica = itertools.count()
+_lock_replica = threading.Lock()
+
+# Intenção de leitura da requisição/tarefa atual: True = ler do primário
+_ler_do_primario: ContextVar[bool] = ContextVar("ler_do_primario", default=False)
+
+# Sessões recebem o engine ao serem criadas (primário; réplica ou primário na leitura)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+SessionLeitura = sessionmaker(autocommit=False, autoflush=False)
+
+
+@event.listens_for(SessionLeitura, "before_flush")
+def _bloquear_escrita(session, flush_context, instances):
+    raise RuntimeError("Sessão de leitura não aceita escritas; use get_db/get_db_session")
+
+
+def usar_primario(ativo: bool = True):
+    """
+    Marca o contexto atual para ler do primário (retorna o token do ContextVar)
+    
+    Usado pelo middleware de leitura após escrita: o cliente que acabou
+    de escrever não deve ler uma réplica que ainda não recebeu a escrita.
+    """
+    return _ler_do_primario.set(ativo)
+
+
+def restaurar_intencao(token):
+    """Desfaz usar_primario ao fim da requisição"""
+    _ler_do_primario.reset(token)
+
+
+def engine_leitura() -> Engine:
+    """Engine para uma leitura: réplica em rodízio, ou o primário se não houver/for exigido"""
+    replicas = engines_replicas.obter()
+    if not replicas or _ler_do_primario.get():
+        return get_engine()
+    with _lock_replica:
+        indice = next(_proxima_replica)
+    return replicas[indice % len(replicas)]
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -40,7 +119,7 @@ def get_db() -> Generator[Session, None, None]:
     def create_item(db: Session = Depends(get_db)):
         ...
     """
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
@@ -55,7 +134,7 @@ def get_db_session() -> Generator[Session, None, None]:
     with get_db_session() as db:
         sinistro = db.query(Sinistro).first()
     """
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
         db.commit()
@@ -66,14 +145,73 @@ def get_db_session() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+def commit_sem_expirar(db: Session):
+    """
+    Commit mantendo os atributos carregados nos objetos da sessão
+    
+    Evita um SELECT de recarga quando o objeto recém-gravado ainda vai ser
+    lido (ex.: montar a resposta da API logo após a criação).
+    """
+    expirar = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expirar
+
+def get_db_leitura() -> Generator[Session, None, None]:
+    """
+    Dependency para endpoints somente leitura (listagens, status, métricas)
+    
+    A sessão vai para uma réplica e recusa flush de alterações.
+    """
+    db = SessionLeitura(bind=engine_leitura())
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def get_db_leitura_session() -> Generator[Session, None, None]:
+    """
+    Context manager de leitura para scripts e workers (sem commit)
+    
+    with get_db_leitura_session() as db:
+        total = db.query(func.count(Sinistro.id)).scalar()
+    """
+    db = SessionLeitura(bind=engine_leitura())
+    try:
+        yield db
+    finally:
+        db.rollback()
+        db.close()
+
+def dispose_engine():
+    """
+    Descarta o pool de conexões herdado após um fork
+    
+    Chamado no início de cada processo filho dos workers: as conexões do
+    processo pai continuam abertas para ele (close=False) e o filho abre
+    as suas sob demanda.
+    """
+    if engine_primario.inicializado:
+        get_engine().dispose(close=False)
+    if engines_replicas.inicializado:
+        for replica in engines_replicas.obter():
+            replica.dispose(close=False)
+    logger.debug(f"Pool de conexões descartado no processo {os.getpid()}")
+
 def init_db():
     """Inicializar banco de dados - criar tabelas"""
     from .models import Base
-    Base.metadata.create_all(bind=engine)
+    from .busca import configurar_busca
+    Base.metadata.create_all(bind=get_engine())
+    with get_engine().begin() as conexao:
+        configurar_busca(conexao)
     logger.info("Banco de dados inicializado")
 
 def drop_db():
     """Apagar todas as tabelas - CUIDADO!"""
     from .models import Base
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=get_engine())
     logger.warning("Todas as tabelas foram apagadas!")
@@ -0,0 +1,68 @@
+"""
+Contagem de consultas SQL por requisição
+
+Em testes (ENVIRONMENT=test) o middleware falha a requisição que emitir
+mais de LIMITE_CONSULTAS_POR_REQUISICAO consultas, para que um N+1 novo
+quebre a suíte em vez de chegar à produção. limitar_consultas faz o
+mesmo em torno de qualquer trecho de código.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config.settings import get_settings
+
+settings = get_settings()
+
+# Lista de SQL emitidos no contexto atual (None = sem contagem)
+_consultas: ContextVar[Optional[List[str]]] = ContextVar("consultas_sql", default=None)
+
+
+class ConsultasExcedidas(AssertionError):
+    """Trecho emitiu mais consultas que o permitido"""
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _contar_consulta(conn, cursor, statement, parameters, context, executemany):
+    consultas = _consultas.get()
+    if consultas is not None:
+        consultas.append(statement)
+
+
+@contextmanager
+def limitar_consultas(maximo: int, descricao: str = "trecho"):
+    """
+    Falha com ConsultasExcedidas se o bloco emitir mais de `maximo` consultas
+
+    with limitar_consultas(3):
+        status_analise("SIN-1", db)
+    """
+    consultas: List[str] = []
+    token = _consultas.set(consultas)
+    try:
+        yield consultas
+    finally:
+        _consultas.reset(token)
+    if len(consultas) > maximo:
+        resumo = "\n".join(f"  {sql.splitlines()[0][:120]}" for sql in consultas)
+        raise ConsultasExcedidas(f"{descricao} emitiu {len(consultas)} consultas (máximo {maximo}):\n{resumo}")
+
+
+class LimiteConsultasMiddleware:
+    """Middleware ASGI (apenas em testes) que aplica limitar_consultas a cada requisição"""
+
+    def __init__(self, app, maximo: int = None):
+        self.app = app
+        self.maximo = maximo if maximo is not None else settings.LIMITE_CONSULTAS_POR_REQUISICAO
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with limitar_consultas(self.maximo, f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
@@ -0,0 +1,103 @@
+"""
+Criação de sinistros em uma única transação
+
+registrar_sinistro monta o sinistro, o histórico de criação e os payloads
+e grava tudo num único flush (o INSERT do sinistro devolve id e datas via
+RETURNING). O número vem de um bloco reservado na sequência
+sinistros_numero_seq, então a maioria das criações não gasta ida ao banco
+com a numeração. Quem chama faz o commit (commit_sem_expirar evita o
+SELECT de recarga ao montar a resposta).
+"""
+
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from .models import HistoricoSinistro, Sinistro, StatusSinistro, SEQUENCIA_NUMERO_SINISTRO, TAMANHO_BLOCO_NUMERO
+from .payloads import novo_payload
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_SINISTRO = (
+    "data_ocorrencia", "segurado_nome", "segurado_documento", "segurado_telefone",
+    "segurado_email", "apolice_numero", "descricao", "local_ocorrencia",
+    "valor_estimado", "canal_origem", "sistema_origem",
+)
+
+
+def formatar_numero(sequencial: int, ano: int) -> str:
+    # 9 dígitos: não colide com os números antigos (8 caracteres hexadecimais)
+    return f"SIN-{ano}-{sequencial:09d}"
+
+
+class AlocadorNumeros:
+    """
+    Entrega números de sinistro a partir de blocos da sequência
+
+    Cada nextval (a sequência incrementa de TAMANHO_BLOCO_NUMERO) reserva
+    o bloco [valor, valor + bloco) para este processo. Números de um bloco
+    não usado até o fim do processo ficam como lacunas.
+    """
+
+    def __init__(self, tamanho_bloco: int = TAMANHO_BLOCO_NUMERO):
+        self.tamanho_bloco = tamanho_bloco
+        self._lock = threading.Lock()
+        self.resetar()
+
+    def resetar(self):
+        self._proximo = 0
+        self._fim = 0
+
+    def proximo(self, db: Session) -> str:
+        if not db.bind.dialect.supports_sequences:
+            # SQLite (testes): sem sequência, número aleatório como antes
+            return f"SIN-{datetime.now().year}-{uuid.uuid4().hex[:8].upper()}"
+
+        with self._lock:
+            if self._proximo >= self._fim:
+                inicio = db.execute(SEQUENCIA_NUMERO_SINISTRO.next_value()).scalar()
+                self._proximo, self._fim = inicio, inicio + self.tamanho_bloco
+                logger.debug(f"Bloco de números {inicio}..{self._fim - 1} reservado no processo {os.getpid()}")
+            sequencial = self._proximo
+            self._proximo += 1
+        return formatar_numero(sequencial, datetime.now().year)
+
+
+alocador_numeros = AlocadorNumeros()
+
+# O processo filho não pode reutilizar o bloco reservado pelo pai
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=alocador_numeros.resetar)
+
+
+def registrar_sinistro(db: Session, dados: Dict[str, Any], usuario: str, descricao_historico: str,
+                       payloads: Optional[Dict[str, Any]] = None) -> Sinistro:
+    """
+    Adiciona sinistro, histórico de criação e payloads à sessão e faz flush
+
+    Não faz commit: o chamador pode incluir outras linhas (ex.: a fila de
+    processamento) na mesma transação.
+    """
+    sinistro = Sinistro(
+        numero_sinistro=alocador_numeros.proximo(db),
+        status=StatusSinistro.RECEBIDO,
+        metadados=dados.get("metadata") or {},
+        **{campo: dados.get(campo) for campo in CAMPOS_SINISTRO if dados.get(campo) is not None}
+    )
+    sinistro.historico.append(HistoricoSinistro(
+        acao="sinistro_criado",
+        usuario=usuario,
+        status_novo=StatusSinistro.RECEBIDO.value,
+        descricao=descricao_historico
+    ))
+    for tipo, conteudo in (payloads or {}).items():
+        sinistro.payloads.append(novo_payload(tipo, conteudo))
+
+    db.add(sinistro)
+    db.flush()
+    return sinistro
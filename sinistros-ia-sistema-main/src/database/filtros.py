@@ -0,0 +1,32 @@
+"""
+Filtros sobre as colunas JSON dos sinistros e análises
+
+As expressões geradas coincidem com os índices criados na migração 0003
+(metadata->>'chave' e GIN em analises.alertas) no PostgreSQL; em outros
+bancos funcionam sem índice.
+"""
+
+from typing import Any
+
+from sqlalchemy import String, cast, exists, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .models import Sinistro, Analise
+
+# Chaves de metadata com índice de expressão (metadata->>'chave')
+CHAVES_INDEXADAS = ("legacy_id", "source", "batch_file")
+
+
+def filtro_metadados(chave: str, valor: Any):
+    """metadata->>'chave' = valor"""
+    return Sinistro.metadados[chave].as_string() == str(valor)
+
+
+def filtro_alerta(dialeto: str, alerta: str):
+    """Sinistros com alguma análise que contém o alerta"""
+    if dialeto == "postgresql":
+        # alertas @> '["..."]' usa o índice GIN
+        condicao = type_coerce(Analise.alertas, JSONB).contains([alerta])
+    else:
+        condicao = cast(Analise.alertas, String).like(f'%"{alerta}"%')
+    return exists().where(Analise.sinistro_id == Sinistro.id, condicao)
@@ -2,15 +2,24 @@
 Modelos de banco de dados para o sistema de sinistros
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Boolean, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Boolean, Text, ForeignKey, Index, LargeBinary, Sequence, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
 
 Base = declarative_base()
 
+# JSON consultável: JSONB (com índices GIN/expressão) no PostgreSQL, JSON nos demais
+JSONConsultavel = JSON().with_variant(JSONB(), "postgresql")
+
+# Numeração dos sinistros: cada nextval reserva um bloco de números para o
+# processo (ver criacao.AlocadorNumeros); ignorada em bancos sem sequências
+TAMANHO_BLOCO_NUMERO = 50
+SEQUENCIA_NUMERO_SINISTRO = Sequence("sinistros_numero_seq", increment=TAMANHO_BLOCO_NUMERO, metadata=Base.metadata)
+
 class StatusSinistro(enum.Enum):
     """Status possíveis de um sinistro"""
     RECEBIDO = "recebido"
@@ -70,18 +79,26 @@ class Sinistro(Base):
     valor_estimado = Column(Float, default=0.0)
     valor_aprovado = Column(Float, default=0.0)
     
+    # Saídas dos agentes compactadas, indexadas para busca textual (ver busca.py)
+    texto_analises = deferred(Column(Text))
+    
     # Origem e canal
     canal_origem = Column(String(50))  # web, mobile, telefone, presencial
     sistema_origem = Column(String(100))  # sistema legado que enviou
     
-    # Metadados
-    metadata = Column(JSON, default={})
+    # Metadados: apenas chaves pequenas; payloads brutos ficam em PayloadSinistro
+    # ("metadata" é reservado no SQLAlchemy, por isso o atributo tem outro nome)
+    metadados = Column("metadata", JSONConsultavel, default={})
     
     # Relacionamentos
     analises = relationship("Analise", back_populates="sinistro", cascade="all, delete-orphan")
     documentos = relationship("Documento", back_populates="sinistro", cascade="all, delete-orphan")
     historico = relationship("HistoricoSinistro", back_populates="sinistro", cascade="all, delete-orphan")
     webhooks = relationship("WebhookLog", back_populates="sinistro", cascade="all, delete-orphan")
+    payloads = relationship("PayloadSinistro", back_populates="sinistro", cascade="all, delete-orphan")
+    
+    # Datas geradas no banco voltam no RETURNING do INSERT, sem SELECT depois
+    __mapper_args__ = {"eager_defaults": True}
 
 class Analise(Base):
     """Análises realizadas pelos agentes"""
@@ -100,19 +117,54 @@ class Analise(Base):
     duracao_segundos = Column(Integer)
     
     # Resultados
-    resultado = Column(JSON, nullable=False)  # resultado estruturado da análise
+    resultado = Column(JSONConsultavel, nullable=False)  # resultado estruturado da análise
     decisao = Column(String(50))  # aprovado, negado, pendente
     confianca = Column(Float)  # 0-1 score de confiança
     justificativas = Column(JSON, default=[])
-    alertas = Column(JSON, default=[])
+    alertas = Column(JSONConsultavel, default=[])
     
     # Status
     sucesso = Column(Boolean, default=True)
     erro_mensagem = Column(Text)
     
+    # Hash dos campos de entrada da etapa (reprocessamento incremental)
+    hash_entrada = Column(String(64), index=True)
+    
+    # Consumo do LLM (por agente nas etapas, total do sinistro na análise completa)
+    tokens_prompt = Column(Integer, default=0)
+    tokens_completion = Column(Integer, default=0)
+    custo_estimado = Column(Float, default=0.0)  # USD
+    
     # Relacionamento
     sinistro = relationship("Sinistro", back_populates="analises")
 
+class PayloadSinistro(Base):
+    """
+    Payloads volumosos do sinistro (dados brutos de entrada, enriquecimento
+    do legado), comprimidos e carregados apenas quando pedidos
+    """
+    __tablename__ = "payloads_sinistro"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sinistro_id = Column(Integer, ForeignKey("sinistros.id"), nullable=False)
+    
+    tipo = Column(String(50), nullable=False)  # raw_data, apolice_dados, historico_sinistros
+    hash_conteudo = Column(String(64), nullable=False, index=True)  # sha256 do JSON canônico
+    compressao = Column(String(10), nullable=False)  # zstd, zlib
+    tamanho_original = Column(Integer)
+    tamanho_comprimido = Column(Integer)
+    conteudo = deferred(Column(LargeBinary, nullable=False))
+    
+    data_criacao = Column(DateTime, default=func.now())
+    data_atualizacao = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # Relacionamento
+    sinistro = relationship("Sinistro", back_populates="payloads")
+    
+    __table_args__ = (
+        UniqueConstraint("sinistro_id", "tipo", name="uq_payloads_sinistro_tipo"),
+    )
+
 class Documento(Base):
     """Documentos anexados ao sinistro"""
     __tablename__ = "documentos"
@@ -145,8 +197,8 @@ class HistoricoSinistro(Base):
     id = Column(Integer, primary_key=True, index=True)
     sinistro_id = Column(Integer, ForeignKey("sinistros.id"), nullable=False)
     
-    # Informações da mudança
-    data = Column(DateTime, default=func.now())
+    # Informações da mudança (coluna de partição mensal no PostgreSQL)
+    data = Column(DateTime, default=func.now(), nullable=False)
     usuario = Column(String(100))  # quem fez a mudança
     acao = Column(String(50), nullable=False)  # status_alterado, documento_adicionado, etc
     
@@ -158,6 +210,10 @@ class HistoricoSinistro(Base):
     
     # Relacionamento
     sinistro = relationship("Sinistro", back_populates="historico")
+    
+    __table_args__ = (
+        Index("ix_historico_sinistros_sinistro_data", "sinistro_id", "data"),
+    )
 
 class WebhookLog(Base):
     """Log de webhooks enviados"""
@@ -170,8 +226,8 @@ class WebhookLog(Base):
     url = Column(String(500), nullable=False)
     evento = Column(String(50), nullable=False)  # sinistro.criado, analise.concluida, etc
     
-    # Tentativa
-    data_envio = Column(DateTime, default=func.now())
+    # Tentativa (coluna de partição mensal no PostgreSQL)
+    data_envio = Column(DateTime, default=func.now(), nullable=False)
     tentativas = Column(Integer, default=1)
     
     # Resposta
@@ -185,6 +241,10 @@ class WebhookLog(Base):
     
     # Relacionamento
     sinistro = relationship("Sinistro", back_populates="webhooks")
+    
+    __table_args__ = (
+        Index("ix_webhook_logs_sinistro_data", "sinistro_id", "data_envio"),
+    )
 
 class FilaProcessamento(Base):
     """Fila de processamento para análises"""
@@ -194,7 +254,7 @@ class FilaProcessamento(Base):
     sinistro_numero = Column(String(50), nullable=False, index=True)
     
     # Status da fila
-    status = Column(String(50), default="aguardando")  # aguardando, processando, concluido, erro
+    status = Column(String(50), default="aguardando")  # aguardando, agendado, processando, concluido, erro
     prioridade = Column(Integer, default=5)  # 1-10, onde 1 é mais prioritário
     
     # Timestamps
@@ -212,3 +272,8 @@ class FilaProcessamento(Base):
     
     # Task ID (Celery)
     task_id = Column(String(100), unique=True)
+    
+    __table_args__ = (
+        # Busca do agendador de retries (status + vencimento)
+        Index("ix_fila_processamento_retry", "status", "proxima_tentativa"),
+    )
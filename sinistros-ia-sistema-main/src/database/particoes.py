@@ -0,0 +1,92 @@
+"""
+Particionamento mensal das tabelas append-only (PostgreSQL)
+
+historico_sinistros e webhook_logs são particionadas por faixa (RANGE)
+na coluna de data, uma partição por mês. A migração converte as tabelas
+e a tarefa de manutenção cria as partições dos próximos meses. Em outros
+bancos (SQLite nos testes) as tabelas continuam simples e as funções
+daqui não fazem nada.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+# Tabela particionada -> coluna de partição
+TABELAS_PARTICIONADAS: Dict[str, str] = {
+    "historico_sinistros": "data",
+    "webhook_logs": "data_envio",
+}
+
+# Partições criadas à frente do mês corrente
+MESES_A_FRENTE = 3
+
+
+def inicio_mes(data: datetime) -> datetime:
+    return datetime(data.year, data.month, 1)
+
+
+def somar_meses(data: datetime, meses: int) -> datetime:
+    indice = data.year * 12 + data.month - 1 + meses
+    return datetime(indice // 12, indice % 12 + 1, 1)
+
+
+def limites_mes(data: datetime) -> Tuple[datetime, datetime]:
+    """Faixa [início, fim) do mês de data"""
+    inicio = inicio_mes(data)
+    return inicio, somar_meses(inicio, 1)
+
+
+def nome_particao(tabela: str, data: datetime) -> str:
+    return f"{tabela}_p{data:%Y_%m}"
+
+
+def ddl_particao(tabela: str, data: datetime) -> str:
+    """CREATE TABLE da partição do mês de data"""
+    inicio, fim = limites_mes(data)
+    return (
+        f'CREATE TABLE IF NOT EXISTS "{nome_particao(tabela, data)}" '
+        f'PARTITION OF "{tabela}" '
+        f"FOR VALUES FROM ('{inicio:%Y-%m-%d %H:%M:%S}') TO ('{fim:%Y-%m-%d %H:%M:%S}')"
+    )
+
+
+def particionada(conexao: Connection, tabela: str) -> bool:
+    """Se a tabela já é particionada (sempre False fora do PostgreSQL)"""
+    if conexao.dialect.name != "postgresql":
+        return False
+    return bool(conexao.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = :tabela"
+    ), {"tabela": tabela}).scalar())
+
+
+def criar_particoes(conexao: Connection, desde: Optional[datetime] = None,
+                    meses_a_frente: int = MESES_A_FRENTE) -> List[str]:
+    """
+    Garante as partições de desde (padrão: mês corrente) até meses_a_frente
+
+    Retorna os nomes das partições verificadas; idempotente.
+    """
+    hoje = datetime.now()
+    inicio = inicio_mes(desde or hoje)
+    fim = somar_meses(inicio_mes(hoje), meses_a_frente)
+
+    criadas = []
+    for tabela in TABELAS_PARTICIONADAS:
+        if not particionada(conexao, tabela):
+            continue
+        mes = inicio
+        while mes <= fim:
+            conexao.execute(text(ddl_particao(tabela, mes)))
+            criadas.append(nome_particao(tabela, mes))
+            mes = somar_meses(mes, 1)
+
+    if criadas:
+        logger.info(f"Partições verificadas: {len(criadas)} ({criadas[0]} .. {criadas[-1]})")
+    return criadas
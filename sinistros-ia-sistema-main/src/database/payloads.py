@@ -0,0 +1,109 @@
+"""
+Armazenamento dos payloads volumosos dos sinistros
+
+Dados brutos recebidos dos canais e o enriquecimento do sistema legado
+ficam em PayloadSinistro, comprimidos (zstd se disponível, senão zlib)
+e identificados pelo hash do conteúdo, fora da linha de Sinistro. A
+coluna metadata guarda apenas chaves pequenas usadas em filtros.
+"""
+
+import hashlib
+import json
+import logging
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .models import PayloadSinistro
+
+# zstd é opcional: comprime melhor e mais rápido que zlib
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+NIVEL_ZSTD = 3
+NIVEL_ZLIB = 6
+
+
+def serializar(dados: Any) -> bytes:
+    """JSON canônico (chaves ordenadas, sem espaços): mesmo conteúdo, mesmo hash"""
+    return json.dumps(dados, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def comprimir(bruto: bytes) -> Tuple[bytes, str]:
+    """Comprime com o melhor algoritmo disponível; retorna (dados, algoritmo)"""
+    if ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=NIVEL_ZSTD).compress(bruto), "zstd"
+    return zlib.compress(bruto, NIVEL_ZLIB), "zlib"
+
+
+def descomprimir(dados: bytes, algoritmo: str) -> bytes:
+    if algoritmo == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Payload comprimido com zstd, mas zstandard não está instalado")
+        return zstandard.ZstdDecompressor().decompress(dados)
+    if algoritmo == "zlib":
+        return zlib.decompress(dados)
+    raise ValueError(f"Compressão desconhecida: {algoritmo}")
+
+
+def salvar_payload(db: Session, sinistro_id: int, tipo: str, dados: Any) -> PayloadSinistro:
+    """
+    Grava (ou substitui) o payload de um tipo do sinistro
+
+    Se o conteúdo não mudou (mesmo hash), nada é regravado. Não faz commit.
+    """
+    bruto = serializar(dados)
+    hash_conteudo = hashlib.sha256(bruto).hexdigest()
+
+    payload = db.query(PayloadSinistro).filter_by(sinistro_id=sinistro_id, tipo=tipo).first()
+    if payload and payload.hash_conteudo == hash_conteudo:
+        return payload
+
+    if payload is None:
+        payload = PayloadSinistro(sinistro_id=sinistro_id, tipo=tipo)
+        db.add(payload)
+    return _preencher(payload, bruto, hash_conteudo)
+
+
+def novo_payload(tipo: str, dados: Any) -> PayloadSinistro:
+    """Payload de um sinistro novo (sem consulta), para anexar a Sinistro.payloads"""
+    bruto = serializar(dados)
+    return _preencher(PayloadSinistro(tipo=tipo), bruto, hashlib.sha256(bruto).hexdigest())
+
+
+def _preencher(payload: PayloadSinistro, bruto: bytes, hash_conteudo: str) -> PayloadSinistro:
+    conteudo, algoritmo = comprimir(bruto)
+    payload.hash_conteudo = hash_conteudo
+    payload.compressao = algoritmo
+    payload.conteudo = conteudo
+    payload.tamanho_original = len(bruto)
+    payload.tamanho_comprimido = len(conteudo)
+    logger.debug(f"Payload {payload.tipo}: {len(bruto)} -> {len(conteudo)} bytes ({algoritmo})")
+    return payload
+
+
+def carregar_payload(db: Session, sinistro_id: int, tipo: str) -> Optional[Any]:
+    """Payload descomprimido, ou None se o sinistro não tem esse tipo"""
+    payload = db.query(PayloadSinistro).filter_by(sinistro_id=sinistro_id, tipo=tipo).first()
+    if payload is None:
+        return None
+    return json.loads(descomprimir(payload.conteudo, payload.compressao))
+
+
+def listar_payloads(db: Session, sinistro_id: int) -> Dict[str, Dict[str, Any]]:
+    """Tipos de payload do sinistro com tamanhos, sem carregar o conteúdo"""
+    return {
+        payload.tipo: {
+            "hash_conteudo": payload.hash_conteudo,
+            "compressao": payload.compressao,
+            "tamanho_original": payload.tamanho_original,
+            "tamanho_comprimido": payload.tamanho_comprimido,
+        }
+        for payload in db.query(PayloadSinistro).filter_by(sinistro_id=sinistro_id)
+    }
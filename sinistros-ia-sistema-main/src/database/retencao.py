@@ -0,0 +1,212 @@
+"""
+Retenção e arquivamento das tabelas de alto volume
+
+Cada tabela tem uma política (coluna de data, prazo, filtro e se os
+registros são arquivados antes de apagados). Os registros vencidos são
+removidos em lotes pequenos, cada um em sua transação, para não segurar
+locks nem gerar um DELETE gigante. O arquivo é JSON Lines com gzip, um
+arquivo por tabela e execução. No PostgreSQL, partições inteiramente
+vencidas são removidas com DROP em vez de DELETE.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from .connection import get_db_session
+from .models import FilaProcessamento, WebhookLog, HistoricoSinistro
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Políticas por tabela
+POLITICAS: Dict[str, Dict[str, Any]] = {
+    "fila_processamento": {
+        "modelo": FilaProcessamento,
+        # Registros que terminaram sem data de fim (erro antes do início,
+        # worker perdido) vencem pela última data que tiverem
+        "coluna_data": func.coalesce(
+            FilaProcessamento.data_fim_processamento,
+            FilaProcessamento.data_inicio_processamento,
+            FilaProcessamento.data_entrada,
+        ),
+        "dias": settings.RETENCAO_DIAS_FILA,
+        "filtro": [FilaProcessamento.status.in_(["concluido", "erro"])],
+        "arquivar": False,
+    },
+    "webhook_logs": {
+        "modelo": WebhookLog,
+        "coluna_data": WebhookLog.data_envio,
+        "dias": settings.RETENCAO_DIAS_WEBHOOKS,
+        "filtro": [],
+        "arquivar": True,
+    },
+    "historico_sinistros": {
+        "modelo": HistoricoSinistro,
+        "coluna_data": HistoricoSinistro.data,
+        "dias": settings.RETENCAO_DIAS_HISTORICO,
+        "filtro": [],
+        "arquivar": True,
+    },
+}
+
+# Limite superior de uma partição por faixa: FOR VALUES FROM (...) TO ('2024-02-01 ...')
+_LIMITE_PARTICAO = re.compile(r"TO \('([^']+)'\)")
+
+
+def _linha_para_dict(registro) -> Dict[str, Any]:
+    return {coluna.name: getattr(registro, coluna.key) for coluna in registro.__mapper__.columns}
+
+
+class ArquivoRetencao:
+    """Arquivo JSON Lines (gzip) com os registros removidos de uma tabela"""
+
+    def __init__(self, tabela: str):
+        diretorio = os.path.join(settings.RETENCAO_DIR_ARQUIVO, tabela)
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, f"{tabela}-{datetime.now():%Y%m%d%H%M%S}.jsonl.gz")
+        self._arquivo = None
+
+    def escrever(self, registros: List[Dict[str, Any]]):
+        if self._arquivo is None:
+            self._arquivo = gzip.open(self.caminho, "at", encoding="utf-8")
+        for registro in registros:
+            self._arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        # Garantir que o lote está em disco antes do DELETE ser confirmado
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+
+
+def particoes_expiradas(db: Session, tabela: str, limite: datetime) -> List[str]:
+    """Partições (PostgreSQL) cujo limite superior é anterior ao prazo"""
+    if db.bind.dialect.name != "postgresql":
+        return []
+
+    linhas = db.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :tabela"
+    ), {"tabela": tabela}).all()
+
+    expiradas = []
+    for nome, limites in linhas:
+        encontrado = _LIMITE_PARTICAO.search(limites or "")
+        if encontrado and datetime.fromisoformat(encontrado.group(1)) <= limite:
+            expiradas.append(nome)
+    return sorted(expiradas)
+
+
+def _particao_vazia(db: Session, particao: str) -> bool:
+    return db.execute(text(f'SELECT 1 FROM "{particao}" LIMIT 1')).first() is None
+
+
+def _remover_particoes(db: Session, tabela: str, limite: datetime, somente_vazias: bool = False) -> int:
+    removidas = 0
+    for particao in particoes_expiradas(db, tabela, limite):
+        if somente_vazias and not _particao_vazia(db, particao):
+            # Ainda há registros vencidos não arquivados: ficam para a próxima execução
+            logger.warning(f"Retenção: partição {particao} mantida, ainda tem registros a arquivar")
+            continue
+        db.execute(text(f'ALTER TABLE "{tabela}" DETACH PARTITION "{particao}"'))
+        db.execute(text(f'DROP TABLE "{particao}"'))
+        db.commit()
+        logger.info(f"Retenção: partição {particao} removida")
+        removidas += 1
+    return removidas
+
+
+def _remover_em_lotes(tabela: str, politica: Dict[str, Any], limite: datetime) -> Tuple[int, bool]:
+    """
+    Remove (e arquiva) os registros vencidos em lotes
+
+    Retorna os registros removidos e se todos os vencidos foram removidos;
+    com RETENCAO_MAX_LOTES atingido sobram registros para a próxima execução.
+    """
+    modelo = politica["modelo"]
+    arquivo = ArquivoRetencao(tabela) if politica["arquivar"] else None
+    removidos = 0
+    esgotou = False
+
+    try:
+        for _ in range(settings.RETENCAO_MAX_LOTES):
+            with get_db_session() as db:
+                consulta = db.query(modelo).filter(politica["coluna_data"] < limite, *politica["filtro"])
+                lote = consulta.order_by(modelo.id).limit(settings.RETENCAO_LOTE).all()
+                if not lote:
+                    esgotou = True
+                    break
+
+                if arquivo:
+                    arquivo.escrever([_linha_para_dict(registro) for registro in lote])
+
+                db.query(modelo).filter(
+                    modelo.id.in_([registro.id for registro in lote])
+                ).delete(synchronize_session=False)
+                db.commit()
+
+            removidos += len(lote)
+            if len(lote) < settings.RETENCAO_LOTE:
+                esgotou = True
+                break
+            # Pausa entre lotes para não competir com o tráfego normal
+            time.sleep(settings.RETENCAO_PAUSA_LOTE_SEGUNDOS)
+    finally:
+        if arquivo:
+            arquivo.fechar()
+
+    if arquivo and removidos:
+        logger.info(f"Retenção: {removidos} registros de {tabela} arquivados em {arquivo.caminho}")
+    return removidos, esgotou
+
+
+def aplicar_politica(tabela: str, agora: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Aplica a política de retenção de uma tabela
+
+    Sem arquivamento, partições vencidas são descartadas antes (DROP é
+    instantâneo); com arquivamento, os registros são arquivados primeiro
+    e as partições descartadas depois. Se o limite de lotes interrompeu o
+    arquivamento, só partições já vazias são descartadas.
+    """
+    politica = POLITICAS[tabela]
+    limite = (agora or datetime.now()) - timedelta(days=politica["dias"])
+    resultado = {"registros": 0, "particoes": 0}
+
+    if not politica["arquivar"]:
+        with get_db_session() as db:
+            resultado["particoes"] += _remover_particoes(db, tabela, limite)
+
+    resultado["registros"], esgotou = _remover_em_lotes(tabela, politica, limite)
+
+    if politica["arquivar"]:
+        with get_db_session() as db:
+            resultado["particoes"] += _remover_particoes(db, tabela, limite, somente_vazias=not esgotou)
+
+    return resultado
+
+
+def aplicar_retencao(agora: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+    """Aplica todas as políticas; a falha de uma tabela não impede as demais"""
+    resultados = {}
+    for tabela in POLITICAS:
+        try:
+            resultados[tabela] = aplicar_politica(tabela, agora)
+        except Exception as e:
+            logger.error(f"Erro na retenção de {tabela}: {e}")
+            resultados[tabela] = {"erro": str(e)}
+    return resultados
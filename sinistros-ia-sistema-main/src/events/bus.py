@@ -0,0 +1,151 @@
+"""
+Barramento de eventos de sinistros (Redis pub/sub)
+
+Workers e API publicam transições de status e andamento da análise;
+os canais SSE/WebSocket da API assinam e repassam aos clientes.
+"""
+
+import importlib.util
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, AsyncIterator
+
+# Redis é opcional: sem ele os eventos são apenas descartados
+# (importado no primeiro evento, não no startup)
+REDIS_AVAILABLE = importlib.util.find_spec("redis") is not None
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Status a partir dos quais o sinistro não muda mais sem ação manual
+STATUS_FINAIS = {"aprovado", "negado", "cancelado", "finalizado", "documentacao_pendente"}
+
+_redis_client = None
+
+def canal_global() -> str:
+    """Canal que recebe os eventos de todos os sinistros"""
+    return f"{settings.EVENTS_CHANNEL_PREFIX}:todos"
+
+def canal_sinistro(numero_sinistro: str) -> str:
+    """Canal exclusivo de um sinistro"""
+    return f"{settings.EVENTS_CHANNEL_PREFIX}:sinistro:{numero_sinistro}"
+
+def _redis_url() -> str:
+    return settings.EVENTS_REDIS_URL or settings.REDIS_URL
+
+def get_redis_client():
+    """Retorna o cliente Redis síncrono, inicializando se necessário"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(_redis_url())
+    return _redis_client
+
+def publicar_evento(numero_sinistro: str, tipo: str, dados: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Publica um evento no canal do sinistro e no canal global
+    Falhas no Redis nunca interrompem o fluxo de quem publica
+    """
+    if not (REDIS_AVAILABLE and settings.EVENTS_ENABLED):
+        return False
+
+    evento = {
+        "tipo": tipo,
+        "numero_sinistro": numero_sinistro,
+        "timestamp": datetime.now().isoformat(),
+        "dados": dados or {}
+    }
+    payload = json.dumps(evento, default=str)
+
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        pipe.publish(canal_sinistro(numero_sinistro), payload)
+        pipe.publish(canal_global(), payload)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"Falha ao publicar evento {tipo} do sinistro {numero_sinistro}: {e}")
+        return False
+
+def publicar_mudanca_status(numero_sinistro: str, status_anterior: Optional[str], status_novo: str,
+                            dados: Optional[Dict[str, Any]] = None) -> bool:
+    """Publica uma transição de status (triagem → em_analise → aprovado, etc)"""
+    return publicar_evento(numero_sinistro, "status.alterado", {
+        "status_anterior": status_anterior,
+        "status_novo": status_novo,
+        **(dados or {})
+    })
+
+class AssinaturaEventos:
+    """
+    Assinatura dos eventos de um sinistro (ou de todos, se numero_sinistro for None)
+
+    abrir() conecta e assina o canal: falhas (Redis ausente ou fora do ar)
+    aparecem ali, antes de o chamador responder ao cliente. A iteração
+    produz os eventos e None a cada EVENTS_HEARTBEAT_SECONDS sem mensagens,
+    para que o chamador envie keep-alive e detecte clientes desconectados.
+    fechar() libera a conexão (pode ser chamado mais de uma vez).
+    """
+
+    def __init__(self, numero_sinistro: Optional[str] = None):
+        self.canal = canal_sinistro(numero_sinistro) if numero_sinistro else canal_global()
+        self._client = None
+        self._pubsub = None
+
+    async def abrir(self) -> "AssinaturaEventos":
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("Redis não disponível para assinatura de eventos")
+
+        import redis.asyncio as redis_async
+
+        self._client = redis_async.Redis.from_url(_redis_url())
+        self._pubsub = self._client.pubsub()
+        try:
+            await self._pubsub.subscribe(self.canal)
+        except Exception:
+            await self.fechar()
+            raise
+        return self
+
+    async def __aiter__(self) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        while True:
+            mensagem = await self._pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=settings.EVENTS_HEARTBEAT_SECONDS
+            )
+            if mensagem is None:
+                yield None
+                continue
+
+            try:
+                yield json.loads(mensagem["data"])
+            except (TypeError, ValueError):
+                logger.warning(f"Evento inválido ignorado no canal {self.canal}")
+
+    async def fechar(self):
+        pubsub, client = self._pubsub, self._client
+        self._pubsub = self._client = None
+        if pubsub is not None:
+            try:
+                await pubsub.unsubscribe(self.canal)
+            except Exception as e:
+                logger.debug(f"Falha ao cancelar a assinatura de {self.canal}: {e}")
+            await pubsub.aclose()
+        if client is not None:
+            await client.aclose()
+
+def formatar_sse(evento: Optional[Dict[str, Any]]) -> str:
+    """Formata um evento no protocolo Server-Sent Events (None vira keep-alive)"""
+    if evento is None:
+        return ": keep-alive\n\n"
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento, default=str)}\n\n"
+
+def evento_final(evento: Dict[str, Any]) -> bool:
+    """Indica se o evento encerra o acompanhamento do sinistro"""
+    return (
+        evento.get("tipo") == "status.alterado"
+        and evento.get("dados", {}).get("status_novo") in STATUS_FINAIS
+    )
@@ -10,8 +10,12 @@ import json
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..config.settings import get_settings
+from ..database.connection import get_db_session
+from ..database.carregamento import com_perfil
 from ..database.models import Sinistro, StatusSinistro
+from ..database.payloads import salvar_payload
 from ..monitoring.metrics import track_metric, track_error
+from ..utils.http import get_http_session
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -23,8 +27,11 @@ class LegacySystemClient:
         self.base_url = settings.LEGACY_SYSTEM_URL
         self.api_key = settings.LEGACY_SYSTEM_API_KEY
         self.timeout = settings.LEGACY_SYSTEM_TIMEOUT
-        self.session = requests.Session()
-        self.session.headers.update({
+    
+    @property
+    def session(self) -> requests.Session:
+        """Sessão compartilhada (pool keep-alive), recriada após fork do worker"""
+        return get_http_session("legacy", headers={
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "Accept": "application/json"
@@ -122,7 +129,7 @@ class LegacySystemClient:
                 "ClaimType": sinistro.tipo.value if sinistro.tipo else "outros",
                 "Status": self._mapear_status(sinistro.status),
                 "Channel": sinistro.canal_origem or "api",
-                "ExternalMetadata": sinistro.metadata
+                "ExternalMetadata": sinistro.metadados
             }
             
             response = self.session.post(
@@ -247,48 +254,69 @@ class LegacySystemClient:
 # Instância global do cliente
 legacy_client = LegacySystemClient()
 
-def sincronizar_sinistro_com_legado(sinistro: Sinistro) -> bool:
+def sincronizar_sinistro_com_legado(numero_sinistro: str) -> bool:
     """
     Sincroniza sinistro completo com sistema legado
+    
+    Roda em background depois que a sessão da requisição foi fechada, por
+    isso recarrega o sinistro (com os documentos) numa sessão própria.
     """
     try:
-        # 1. Buscar dados da apólice
-        apolice_data = legacy_client.buscar_apolice(sinistro.apolice_numero)
-        if apolice_data:
-            # Atualizar dados do sinistro com informações da apólice
-            sinistro.apolice_produto = apolice_data.get("produto")
-            sinistro.metadata["apolice_dados"] = apolice_data
-        
-        # 2. Buscar histórico do segurado
-        historico = legacy_client.buscar_historico_sinistros(sinistro.segurado_documento)
-        if historico:
-            sinistro.metadata["historico_sinistros"] = historico
-            sinistro.metadata["qtd_sinistros_anteriores"] = len(historico)
-        
-        # 3. Registrar sinistro no sistema legado
-        legacy_id = legacy_client.registrar_sinistro(sinistro)
-        if legacy_id:
-            sinistro.metadata["legacy_id"] = legacy_id
-        
-        # 4. Enviar documentos
-        if sinistro.documentos:
-            documentos_dict = [
-                {
-                    "nome": doc.nome,
-                    "tipo": doc.tipo,
-                    "categoria": doc.categoria,
-                    "caminho_s3": doc.caminho_s3,
-                    "tamanho_bytes": doc.tamanho_bytes,
-                    "data_upload": doc.data_upload.isoformat()
-                }
-                for doc in sinistro.documentos
-            ]
-            legacy_client.enviar_documentos(sinistro.numero_sinistro, documentos_dict)
-        
-        logger.info(f"Sinistro {sinistro.numero_sinistro} sincronizado com sucesso")
-        return True
+        with get_db_session() as db:
+            sinistro = com_perfil(
+                db.query(Sinistro).filter_by(numero_sinistro=numero_sinistro),
+                "sincronizacao_legado"
+            ).first()
+            if not sinistro:
+                logger.warning(f"Sinistro {numero_sinistro} não encontrado para sincronizar")
+                return False
+            return _sincronizar(db, sinistro)
         
     except Exception as e:
-        logger.error(f"Erro ao sincronizar sinistro {sinistro.numero_sinistro}: {str(e)}")
+        logger.error(f"Erro ao sincronizar sinistro {numero_sinistro}: {str(e)}")
         track_error("erro_sincronizar_legado", e)
         return False
+
+def _sincronizar(db, sinistro: Sinistro) -> bool:
+    """Envia apólice, histórico, registro e documentos; grava o retorno na sessão"""
+    # Dados volumosos do legado vão para PayloadSinistro; metadata só recebe chaves pequenas
+    metadados = dict(sinistro.metadados or {})
+    
+    # 1. Buscar dados da apólice
+    apolice_data = legacy_client.buscar_apolice(sinistro.apolice_numero)
+    if apolice_data:
+        # Atualizar dados do sinistro com informações da apólice
+        sinistro.apolice_produto = apolice_data.get("produto")
+        salvar_payload(db, sinistro.id, "apolice_dados", apolice_data)
+    
+    # 2. Buscar histórico do segurado
+    historico = legacy_client.buscar_historico_sinistros(sinistro.segurado_documento)
+    if historico:
+        salvar_payload(db, sinistro.id, "historico_sinistros", historico)
+        metadados["qtd_sinistros_anteriores"] = len(historico)
+    
+    # 3. Registrar sinistro no sistema legado
+    legacy_id = legacy_client.registrar_sinistro(sinistro)
+    if legacy_id:
+        metadados["legacy_id"] = legacy_id
+    
+    # Reatribuir para o SQLAlchemy detectar a mudança no JSON
+    sinistro.metadados = metadados
+    
+    # 4. Enviar documentos
+    if sinistro.documentos:
+        documentos_dict = [
+            {
+                "nome": doc.nome,
+                "tipo": doc.tipo,
+                "categoria": doc.categoria,
+                "caminho_s3": doc.caminho_s3,
+                "tamanho_bytes": doc.tamanho_bytes,
+                "data_upload": doc.data_upload.isoformat()
+            }
+            for doc in sinistro.documentos
+        ]
+        legacy_client.enviar_documentos(sinistro.numero_sinistro, documentos_dict)
+    
+    logger.info(f"Sinistro {sinistro.numero_sinistro} sincronizado com sucesso")
+    return True
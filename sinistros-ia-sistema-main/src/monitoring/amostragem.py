@@ -0,0 +1,240 @@
+"""
+Política de amostragem dos traces e profiles do Sentry
+
+Erros são sempre enviados (sample_rate=1.0); transações são amostradas:
+- trace que já veio amostrado (ou descartado) de outro serviço segue a
+  decisão do pai, para não quebrar traces distribuídos
+- rotas da API e tarefas Celery que terminaram lentas (acima de
+  SENTRY_LIMIAR_LENTO_MS) ou com erro nos últimos SENTRY_JANELA_REFORCO_SEGUNDOS
+  são amostradas a 100%: a decisão do Sentry é tomada no início da
+  transação, então a lentidão observada reforça as próximas
+- rotas (template, ex.: /api/v1/sinistros/{numero_sinistro}) e tarefas
+  listadas em SENTRY_TAXAS_POR_ROTA usam a própria taxa
+- o resto usa SENTRY_TAXA_TRACES
+
+As taxas vêm das settings e podem ser trocadas em execução
+(atualizar_taxas, PUT /api/v1/admin/amostragem): a alteração é gravada no
+Redis e cada processo (API e workers) a relê numa thread própria a cada
+SENTRY_SINCRONIZAR_TAXAS_SEGUNDOS; restaurar_taxas volta às settings. O
+traces_sampler roda no caminho da requisição e só consulta a memória.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from ..config.settings import get_settings
+from ..utils.preguicoso import recurso
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MAX_ROTAS_REFORCADAS = 200
+
+# Taxas alteradas em execução, compartilhadas por todos os processos
+CHAVE_TAXAS = "sinistros:amostragem:taxas"
+
+
+def _taxas_das_settings() -> Dict[str, Any]:
+    return {
+        "traces": settings.SENTRY_TAXA_TRACES,
+        "profiles": settings.SENTRY_TAXA_PROFILES,
+        "limiar_lento_ms": settings.SENTRY_LIMIAR_LENTO_MS,
+        "janela_reforco_segundos": settings.SENTRY_JANELA_REFORCO_SEGUNDOS,
+        "rotas": dict(settings.SENTRY_TAXAS_POR_ROTA),
+    }
+
+
+taxas: Dict[str, Any] = _taxas_das_settings()
+
+
+def _criar_cliente_redis():
+    """Cliente com timeouts curtos: um Redis lento não atrasa a sincronização"""
+    if importlib.util.find_spec("redis") is None:
+        return None
+    import redis
+    return redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+_redis = recurso("redis_amostragem", _criar_cliente_redis)
+# Processo em que a thread de sincronização já foi iniciada (threads não sobrevivem ao fork)
+_pid_sincronizacao: Optional[int] = None
+
+# Rota/tarefa → instante (monotônico) até quando é amostrada a 100%
+_reforcadas: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def _padrao_rota(rota: str) -> "re.Pattern":
+    """Template de rota → regex que casa com os caminhos concretos"""
+    partes = re.split(r"(\{[^}]+\})", rota)
+    return re.compile("".join("[^/]+" if p.startswith("{") else re.escape(p) for p in partes) + "$")
+
+
+def _casa(rota: str, alvo: str) -> bool:
+    return rota == alvo or ("{" in rota and _padrao_rota(rota).match(alvo) is not None)
+
+
+def registrar_execucao(rota: str, duracao_segundos: float, erro: bool = False):
+    """
+    Chamado ao fim de cada requisição/tarefa: lenta ou com erro, a rota
+    passa a ser amostrada a 100% durante a janela de reforço
+    """
+    if not erro and duracao_segundos * 1000 < taxas["limiar_lento_ms"]:
+        return
+    with _lock:
+        if rota not in _reforcadas and len(_reforcadas) >= MAX_ROTAS_REFORCADAS:
+            _descartar_expiradas()
+            if len(_reforcadas) >= MAX_ROTAS_REFORCADAS:
+                return
+        _reforcadas[rota] = time.monotonic() + taxas["janela_reforco_segundos"]
+
+
+def _descartar_expiradas():
+    agora = time.monotonic()
+    for rota in [r for r, ate in _reforcadas.items() if ate <= agora]:
+        del _reforcadas[rota]
+
+
+def _alvo(contexto: Dict[str, Any]) -> Optional[str]:
+    """Caminho da requisição ou nome da tarefa da transação que começa"""
+    escopo = contexto.get("asgi_scope")
+    if escopo:
+        return escopo.get("path")
+    tarefa = contexto.get("celery_job")
+    if tarefa:
+        return tarefa.get("task")
+    return (contexto.get("transaction_context") or {}).get("name")
+
+
+def taxa_para(alvo: Optional[str]) -> float:
+    """Taxa de amostragem da transação (caminho concreto ou nome da tarefa)"""
+    if alvo is None:
+        return taxas["traces"]
+    if _reforcadas:
+        agora = time.monotonic()
+        for rota, ate in list(_reforcadas.items()):
+            if ate > agora and _casa(rota, alvo):
+                return 1.0
+    for rota, taxa in taxas["rotas"].items():
+        if _casa(rota, alvo):
+            return taxa
+    return taxas["traces"]
+
+
+def sincronizar_taxas() -> bool:
+    """Relê do Redis as taxas alteradas via API; retorna se leu"""
+    cliente = _redis.obter()
+    if cliente is None:
+        return False
+    try:
+        alteradas = json.loads(cliente.get(CHAVE_TAXAS) or "{}")
+    except Exception as e:
+        logger.debug(f"Taxas de amostragem não sincronizadas: {e}")
+        return False
+    taxas.update({**_taxas_das_settings(), **alteradas})
+    return True
+
+
+def _sincronizar_periodicamente():
+    while True:
+        sincronizar_taxas()
+        time.sleep(max(settings.SENTRY_SINCRONIZAR_TAXAS_SEGUNDOS, 1))
+
+
+def iniciar_sincronizacao():
+    """Inicia, uma vez por processo, a thread que relê as taxas do Redis"""
+    global _pid_sincronizacao
+    pid = os.getpid()
+    if _pid_sincronizacao == pid:
+        return
+    with _lock:
+        if _pid_sincronizacao == pid:
+            return
+        _pid_sincronizacao = pid
+    threading.Thread(target=_sincronizar_periodicamente, name="amostragem-sentry", daemon=True).start()
+
+
+def traces_sampler(contexto: Dict[str, Any]) -> float:
+    """traces_sampler do Sentry"""
+    iniciar_sincronizacao()
+    if contexto.get("parent_sampled") is not None:
+        return float(contexto["parent_sampled"])
+    return taxa_para(_alvo(contexto))
+
+
+def profiles_sampler(contexto: Dict[str, Any]) -> float:
+    """profiles_sampler do Sentry (fração das transações já amostradas)"""
+    return taxas["profiles"]
+
+
+def _validar_taxa(nome: str, valor: float) -> float:
+    if not 0.0 <= valor <= 1.0:
+        raise ValueError(f"{nome} deve estar entre 0 e 1 (recebido {valor})")
+    return float(valor)
+
+
+def atualizar_taxas(traces: Optional[float] = None, profiles: Optional[float] = None,
+                    limiar_lento_ms: Optional[int] = None, janela_reforco_segundos: Optional[int] = None,
+                    rotas: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Troca as taxas em execução (só os valores informados) em todos os
+    processos; retorna o estado. RuntimeError se o Redis não estiver acessível.
+    """
+    novas = {}
+    if traces is not None:
+        novas["traces"] = _validar_taxa("traces", traces)
+    if profiles is not None:
+        novas["profiles"] = _validar_taxa("profiles", profiles)
+    if limiar_lento_ms is not None:
+        if limiar_lento_ms <= 0:
+            raise ValueError("limiar_lento_ms deve ser positivo")
+        novas["limiar_lento_ms"] = int(limiar_lento_ms)
+    if janela_reforco_segundos is not None:
+        if janela_reforco_segundos < 0:
+            raise ValueError("janela_reforco_segundos não pode ser negativa")
+        novas["janela_reforco_segundos"] = int(janela_reforco_segundos)
+    if rotas is not None:
+        novas["rotas"] = {rota: _validar_taxa(rota, taxa) for rota, taxa in rotas.items()}
+
+    if novas:
+        alteradas = _gravar_alteradas(lambda atuais: {**atuais, **novas})
+        taxas.update({**_taxas_das_settings(), **alteradas})
+        logger.info(f"Amostragem do Sentry atualizada: {novas}")
+    return estado_amostragem()
+
+
+def restaurar_taxas() -> Dict[str, Any]:
+    """Descarta as alterações feitas em execução: todos os processos voltam às settings"""
+    _gravar_alteradas(lambda atuais: {})
+    taxas.update(_taxas_das_settings())
+    logger.info("Amostragem do Sentry restaurada para as settings")
+    return estado_amostragem()
+
+
+def _gravar_alteradas(alterar) -> Dict[str, Any]:
+    cliente = _redis.obter()
+    if cliente is None:
+        raise RuntimeError("Redis não disponível: taxas não podem ser alteradas em execução")
+    try:
+        alteradas = alterar(json.loads(cliente.get(CHAVE_TAXAS) or "{}"))
+        cliente.set(CHAVE_TAXAS, json.dumps(alteradas))
+    except Exception as e:
+        raise RuntimeError(f"Falha ao gravar as taxas de amostragem no Redis: {e}") from e
+    return alteradas
+
+
+def estado_amostragem() -> Dict[str, Any]:
+    """Taxas em vigor e rotas reforçadas (segundos restantes)"""
+    agora = time.monotonic()
+    with _lock:
+        _descartar_expiradas()
+        reforcadas = {rota: round(ate - agora, 1) for rota, ate in _reforcadas.items()}
+    return {**taxas, "rotas": dict(taxas["rotas"]), "reforcadas": reforcadas}
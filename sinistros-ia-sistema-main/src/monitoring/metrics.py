@@ -2,134 +2,336 @@
 Sistema de monitoramento e métricas
 """
 
+import functools
+import importlib.util
+import inspect
 import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
 import time
 from typing import Dict, Any, Optional
 from datetime import datetime
-from contextlib import contextmanager
+from contextvars import ContextVar
 import json
 
-# Importações opcionais para diferentes sistemas de monitoramento
-try:
-    import sentry_sdk
-    SENTRY_AVAILABLE = True
-except ImportError:
-    SENTRY_AVAILABLE = False
-
-try:
-    from prometheus_client import Counter, Histogram, Gauge, Info
-    PROMETHEUS_AVAILABLE = True
-except ImportError:
-    PROMETHEUS_AVAILABLE = False
-
 from ..config.settings import get_settings
+from ..utils.preguicoso import Recurso, recurso
+from . import amostragem
+
+# Dependências opcionais: só a presença é verificada aqui; o import (e a
+# inicialização) acontece no primeiro uso, para não pesar no cold start
+SENTRY_AVAILABLE = importlib.util.find_spec("sentry_sdk") is not None
+PROMETHEUS_AVAILABLE = importlib.util.find_spec("prometheus_client") is not None
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Inicializar Sentry se disponível
-if SENTRY_AVAILABLE and settings.SENTRY_DSN:
+def _inicializar_sentry() -> bool:
+    """
+    Inicializa o Sentry se disponível e configurado; retorna se está ativo
+    
+    Com INICIALIZACAO_PREGUICOSA só as integrações da API (Starlette e
+    FastAPI) são ativadas: as automáticas importariam Celery, OpenAI e
+    Redis, e o init deixaria de caber no cold start.
+    """
+    if not (SENTRY_AVAILABLE and settings.SENTRY_DSN):
+        return False
+    import sentry_sdk
+    opcoes = {}
+    if settings.INICIALIZACAO_PREGUICOSA:
+        from sentry_sdk.integrations.fastapi import FastApiIntegration
+        from sentry_sdk.integrations.starlette import StarletteIntegration
+        opcoes = {
+            "auto_enabling_integrations": False,
+            "integrations": [StarletteIntegration(), FastApiIntegration()],
+        }
     sentry_sdk.init(
         dsn=settings.SENTRY_DSN,
         environment=settings.ENVIRONMENT,
-        traces_sample_rate=1.0,
-        profiles_sample_rate=1.0,
+        sample_rate=1.0,  # erros: todos
+        traces_sampler=amostragem.traces_sampler,
+        profiles_sampler=amostragem.profiles_sampler,
+        **opcoes,
     )
     logger.info("Sentry inicializado")
+    return True
 
-# Métricas Prometheus se disponível
-if PROMETHEUS_AVAILABLE and settings.PROMETHEUS_ENABLED:
+# Declaração das métricas: nome lógico → tipo, nome no Prometheus, descrição,
+# labels e buckets. Nomes não declarados são registrados automaticamente no
+# primeiro uso (contador/histograma/gauge conforme a chamada).
+METRICAS: Dict[str, Dict[str, Any]] = {
     # Contadores
-    sinistros_criados = Counter('sinistros_criados_total', 'Total de sinistros criados', ['canal', 'tipo'])
-    sinistros_processados = Counter('sinistros_processados_total', 'Total de sinistros processados', ['status', 'agente'])
-    webhooks_enviados = Counter('webhooks_enviados_total', 'Total de webhooks enviados', ['evento', 'sucesso'])
-    erros_sistema = Counter('erros_sistema_total', 'Total de erros do sistema', ['tipo', 'componente'])
-    
+    "sinistros_criados": {"tipo": "counter", "nome": "sinistros_criados_total", "descricao": "Total de sinistros criados", "labels": ("canal", "tipo")},
+    "sinistros_processados": {"tipo": "counter", "nome": "sinistros_processados_total", "descricao": "Total de sinistros processados", "labels": ("status", "agente")},
+    "sinistro_recebido": {"tipo": "counter", "nome": "sinistros_recebidos_total", "descricao": "Sinistros recebidos pelos conectores", "labels": ("canal", "receiver")},
+    "analises_iniciadas": {"tipo": "counter", "nome": "analises_iniciadas_total", "descricao": "Análises solicitadas pela API", "labels": ("prioridade",)},
+    "sinistro_registrado_legado": {"tipo": "counter", "nome": "sinistros_registrados_legado_total", "descricao": "Sinistros registrados no sistema legado", "labels": ()},
+    "webhooks_enviados": {"tipo": "counter", "nome": "webhooks_enviados_total", "descricao": "Total de webhooks enviados", "labels": ("evento", "sucesso")},
+    "erros_sistema": {"tipo": "counter", "nome": "erros_sistema_total", "descricao": "Total de erros do sistema", "labels": ("tipo", "componente")},
+    "tokens_consumidos": {"tipo": "counter", "nome": "tokens_consumidos_total", "descricao": "Tokens consumidos pelos agentes", "labels": ("agente", "canal", "tipo")},
+    "custo_llm": {"tipo": "counter", "nome": "custo_llm_dolares_total", "descricao": "Custo estimado das chamadas ao LLM (USD)", "labels": ("agente", "canal")},
+    "orcamento_tokens_excedido": {"tipo": "counter", "nome": "orcamento_tokens_excedido_total", "descricao": "Análises interrompidas pelo orçamento de tokens", "labels": ("canal",)},
+    "requisicoes_api": {"tipo": "counter", "nome": "requisicoes_api_total", "descricao": "Respostas da API por rota e status HTTP", "labels": ("endpoint", "metodo", "status")},
+
     # Histogramas
-    tempo_processamento = Histogram('tempo_processamento_sinistro_segundos', 'Tempo de processamento de sinistros', ['tipo'])
-    tempo_resposta_api = Histogram('tempo_resposta_api_segundos', 'Tempo de resposta da API', ['endpoint', 'metodo'])
+    "tempo_processamento": {"tipo": "histogram", "nome": "tempo_processamento_sinistro_segundos", "descricao": "Tempo de processamento de sinistros", "labels": ("tipo",)},
+    "tempo_resposta_api": {"tipo": "histogram", "nome": "tempo_resposta_api_segundos", "descricao": "Tempo de resposta da API", "labels": ("endpoint", "metodo")},
+    "criar_sinistro": {"tipo": "histogram", "nome": "criar_sinistro_segundos", "descricao": "Tempo de criação de sinistro na API", "labels": ()},
+    "iniciar_analise": {"tipo": "histogram", "nome": "iniciar_analise_segundos", "descricao": "Tempo para enfileirar uma análise", "labels": ("prioridade",)},
+    "tokens_por_sinistro": {
+        "tipo": "histogram", "nome": "tokens_por_sinistro", "descricao": "Total de tokens consumidos por sinistro", "labels": ("canal",),
+        "buckets": (1000, 5000, 10000, 20000, 40000, 60000, 100000, 200000),
+    },
+    "tempo_etapa_agente": {
+        "tipo": "histogram", "nome": "tempo_etapa_agente_segundos", "descricao": "Tempo de cada agente no pipeline de análise", "labels": ("etapa", "agente"),
+        "buckets": (1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+    },
+    "tempo_servico_tarefa": {
+        "tipo": "histogram", "nome": "tempo_servico_tarefa_segundos", "descricao": "Tempo de execução das tarefas Celery", "labels": ("tarefa", "fila"),
+        "buckets": (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    },
+    "tempo_espera_fila": {
+        "tipo": "histogram", "nome": "tempo_espera_fila_segundos", "descricao": "Tempo entre a publicação e o início da tarefa", "labels": ("fila",),
+        "buckets": (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 900),
+    },
+
+    # Gauges ("modo_multiprocesso": como os valores dos processos filhos do
+    # worker prefork são agregados; ver iniciar_servidor_metricas)
+    "fila_tamanho": {"tipo": "gauge", "nome": "fila_processamento_tamanho", "descricao": "Tamanho atual da fila de processamento", "labels": (), "modo_multiprocesso": "mostrecent"},
+    "sinistros_em_analise": {"tipo": "gauge", "nome": "sinistros_em_analise", "descricao": "Número de sinistros em análise", "labels": (), "modo_multiprocesso": "mostrecent"},
+    "fila_broker_profundidade": {"tipo": "gauge", "nome": "fila_broker_profundidade", "descricao": "Mensagens aguardando no broker", "labels": ("fila",), "modo_multiprocesso": "mostrecent"},
+    "fila_broker_idade": {"tipo": "gauge", "nome": "fila_broker_idade_mais_antiga_segundos", "descricao": "Idade da mensagem mais antiga no broker", "labels": ("fila",), "modo_multiprocesso": "mostrecent"},
+    "replicas_desejadas": {"tipo": "gauge", "nome": "workers_replicas_desejadas", "descricao": "Réplicas de worker necessárias por fila", "labels": ("fila",), "modo_multiprocesso": "mostrecent"},
+    "requisicoes_em_andamento": {"tipo": "gauge", "nome": "requisicoes_api_em_andamento", "descricao": "Requisições HTTP sendo atendidas", "labels": ("metodo",), "modo_multiprocesso": "livesum"},
+}
+
+# Valor que substitui os valores de label acima do limite de cardinalidade
+# (METRICAS_MAX_VALORES_POR_LABEL, ou "max_valores" na declaração)
+VALOR_EXCEDENTE = "other"
+
+_CLASSES_PROMETHEUS = {"counter": "Counter", "histogram": "Histogram", "gauge": "Gauge"}
+
+
+def _nome_prometheus(nome: str, tipo: str) -> str:
+    """Nome válido no Prometheus para uma métrica registrada automaticamente"""
+    nome = re.sub(r"[^a-zA-Z0-9_]", "_", nome)
+    return f"{nome}_total" if tipo == "counter" and not nome.endswith("_total") else nome
+
+
+def _criar_metrica(declaracao: Dict[str, Any], registro=None):
+    """Objeto Prometheus da declaração (registro padrão se nenhum for dado)"""
+    import prometheus_client
+    classe = getattr(prometheus_client, _CLASSES_PROMETHEUS[declaracao["tipo"]])
+    opcoes = {"registry": registro} if registro is not None else {}
+    if declaracao.get("buckets"):
+        opcoes["buckets"] = declaracao["buckets"]
+    if declaracao.get("modo_multiprocesso"):
+        opcoes["multiprocess_mode"] = declaracao["modo_multiprocesso"]
+    return classe(declaracao["nome"], declaracao["descricao"], list(declaracao["labels"]), **opcoes)
+
+
+def _criar_metricas_prometheus(registro=None) -> Dict[str, Any]:
+    """Cria e registra as métricas declaradas; vazio se desabilitado"""
+    if not (PROMETHEUS_AVAILABLE and settings.PROMETHEUS_ENABLED):
+        return {}
+    from prometheus_client import Info
     
-    # Gauges
-    fila_tamanho = Gauge('fila_processamento_tamanho', 'Tamanho atual da fila de processamento')
-    sinistros_em_analise = Gauge('sinistros_em_analise', 'Número de sinistros em análise')
+    metricas = {nome: _criar_metrica(declaracao, registro) for nome, declaracao in METRICAS.items()}
     
     # Info
-    sistema_info = Info('sistema_sinistros', 'Informações do sistema')
+    sistema_info = Info('sistema_sinistros', 'Informações do sistema', **({"registry": registro} if registro is not None else {}))
     sistema_info.info({
         'versao': '1.0.0',
         'ambiente': settings.ENVIRONMENT
     })
+    return metricas
+
+# Criados no primeiro uso (ou no startup da API/worker)
+sentry = recurso("sentry", _inicializar_sentry)
+prometheus = recurso("prometheus", _criar_metricas_prometheus)
+
+def iniciar_servidor_metricas(porta: int, multiprocesso: bool = False) -> bool:
+    """
+    Expõe as métricas do processo em http://0.0.0.0:<porta>/metrics (worker)
+    
+    multiprocesso=True (pool prefork): cada processo filho grava suas
+    métricas em PROMETHEUS_MULTIPROC_DIR (um diretório temporário, se não
+    configurado) e o servidor no processo principal agrega todos. Precisa
+    rodar antes de o prometheus_client ser importado, isto é, antes de
+    inicializar o recurso prometheus.
+    """
+    if not (PROMETHEUS_AVAILABLE and settings.PROMETHEUS_ENABLED):
+        return False
+    
+    registro = None
+    if multiprocesso:
+        if "prometheus_client" in sys.modules and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            logger.warning("prometheus_client já importado: métricas dos processos filhos não serão exportadas")
+        else:
+            diretorio = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="prometheus_")
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = diretorio
+            # Arquivos de uma execução anterior inflariam contadores e gauges
+            for arquivo in os.listdir(diretorio):
+                if arquivo.endswith(".db"):
+                    os.remove(os.path.join(diretorio, arquivo))
+            from prometheus_client import CollectorRegistry, multiprocess
+            registro = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registro)
+    
+    from prometheus_client import REGISTRY, start_http_server
+    try:
+        start_http_server(porta, registry=registro or REGISTRY)
+    except OSError as e:
+        logger.warning(f"Servidor de métricas não iniciado na porta {porta}: {e}")
+        return False
+    logger.info(f"Métricas expostas na porta {porta}" + (" (multiprocesso)" if registro else ""))
+    return True
+
+def encerrar_processo_metricas(pid: int):
+    """Processo filho encerrado: gauges 'live*' deixam de contar seus valores"""
+    if PROMETHEUS_AVAILABLE and os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+# Marca, no cache de séries, as combinações que não geram métrica
+_SEM_SERIE = object()
 
 class MetricsCollector:
-    """Coletor de métricas centralizado"""
+    """
+    Coletor de métricas centralizado
+    
+    Cada (tipo, nome, labels) é resolvido uma vez para a série Prometheus
+    (objeto com labels já aplicados) e guardado em cache: o caminho quente
+    é uma consulta a dicionário e um inc/observe/set. Labels não declarados
+    são descartados e os que faltam ficam vazios.
     
-    def __init__(self):
+    Cada label aceita no máximo max_valores valores distintos por métrica;
+    os seguintes caem na série VALOR_EXCEDENTE e não entram no cache, para
+    que a memória não cresça com IDs ou caminhos brutos.
+    """
+    
+    def __init__(self, metricas: Recurso = None, registro=None):
         self.metrics_buffer = []
-        self.start_times = {}
+        self._metricas = metricas or prometheus
+        self._registro = registro
+        self._series: Dict[tuple, Any] = {}
+        self._valores_label: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+        self.taxa_log = settings.METRICAS_LOG_AMOSTRAGEM
+    
+    def _serie(self, tipo: str, metric_name: str, labels: Optional[Dict[str, Any]]):
+        chave = (tipo, metric_name, tuple(labels.items()) if labels else ())
+        serie = self._series.get(chave)
+        if serie is None:
+            serie = self._resolver(chave, tipo, metric_name, labels or {})
+        return serie
+    
+    def _resolver(self, chave: tuple, tipo: str, metric_name: str, labels: Dict[str, Any]):
+        metricas = self._metricas.obter()
+        with self._lock:
+            if not metricas:
+                serie = _SEM_SERIE
+            else:
+                metrica = metricas.get(metric_name)
+                if metrica is None:
+                    metrica = self._registrar_automaticamente(metricas, tipo, metric_name, labels)
+                declaracao = METRICAS[metric_name]
+                if declaracao["tipo"] != tipo:
+                    logger.warning(f"Métrica {metric_name} é {declaracao['tipo']}, ignorando registro como {tipo}")
+                    serie = _SEM_SERIE
+                elif declaracao["labels"]:
+                    valores = {
+                        label: self._limitar_valor(metric_name, declaracao, label, str(labels.get(label, "")))
+                        for label in declaracao["labels"]
+                    }
+                    serie = metrica.labels(**valores)
+                    if VALOR_EXCEDENTE in valores.values() and VALOR_EXCEDENTE not in map(str, labels.values()):
+                        return serie  # sem cache para valores excedentes
+                else:
+                    serie = metrica
+                extras = set(labels) - set(declaracao["labels"])
+                if extras:
+                    # Sem cache: valores de labels descartados podem ser ilimitados
+                    logger.debug(f"Labels não declarados em {metric_name} descartados: {sorted(extras)}")
+                    return serie
+            self._series[chave] = serie
+        return serie
+    
+    def _limitar_valor(self, metric_name: str, declaracao: Dict[str, Any], label: str, valor: str) -> str:
+        """O próprio valor, ou VALOR_EXCEDENTE se o label já atingiu o limite"""
+        vistos = self._valores_label.setdefault((metric_name, label), set())
+        if valor in vistos:
+            return valor
+        if len(vistos) < declaracao.get("max_valores", settings.METRICAS_MAX_VALORES_POR_LABEL):
+            vistos.add(valor)
+            return valor
+        if VALOR_EXCEDENTE not in vistos:
+            vistos.add(VALOR_EXCEDENTE)
+            logger.warning(f"Label {label} de {metric_name} atingiu o limite de valores; excedentes vão para '{VALOR_EXCEDENTE}'")
+        return VALOR_EXCEDENTE
+    
+    def _registrar_automaticamente(self, metricas: Dict[str, Any], tipo: str, metric_name: str, labels: Dict[str, Any]):
+        """Declara e cria a métrica desconhecida com os labels da primeira chamada"""
+        METRICAS[metric_name] = {
+            "tipo": tipo,
+            "nome": _nome_prometheus(metric_name, tipo),
+            "descricao": f"{metric_name} (registrada automaticamente)",
+            "labels": tuple(sorted(labels)),
+        }
+        metricas[metric_name] = _criar_metrica(METRICAS[metric_name], self._registro)
+        logger.info(f"Métrica {metric_name} registrada automaticamente como {tipo}")
+        return metricas[metric_name]
+    
+    def _log(self, tipo: str, metric_name: str, value: Any, labels: Optional[Dict[str, Any]]):
+        """Log estruturado de uma fração (taxa_log) dos eventos"""
+        if random.random() < self.taxa_log:
+            logger.info(f"Métrica: {metric_name}", extra={
+                "metric_type": tipo,
+                "metric_name": metric_name,
+                "value": value,
+                "labels": labels
+            })
+    
+    def resetar(self):
+        """Esquece as séries resolvidas (após recriar as métricas)"""
+        with self._lock:
+            self._series.clear()
+            self._valores_label.clear()
     
     def track_counter(self, metric_name: str, value: float = 1, labels: Optional[Dict[str, str]] = None):
         """Registra um contador"""
-        if PROMETHEUS_AVAILABLE and settings.PROMETHEUS_ENABLED:
-            if metric_name == "sinistros_criados":
-                sinistros_criados.labels(**labels).inc(value)
-            elif metric_name == "sinistros_processados":
-                sinistros_processados.labels(**labels).inc(value)
-            elif metric_name == "webhooks_enviados":
-                webhooks_enviados.labels(**labels).inc(value)
-            elif metric_name == "erros_sistema":
-                erros_sistema.labels(**labels).inc(value)
-        
-        # Log estruturado
-        logger.info(f"Métrica: {metric_name}", extra={
-            "metric_type": "counter",
-            "metric_name": metric_name,
-            "value": value,
-            "labels": labels
-        })
+        serie = self._serie("counter", metric_name, labels)
+        if serie is not _SEM_SERIE:
+            serie.inc(value)
+        if self.taxa_log:
+            self._log("counter", metric_name, value, labels)
     
     def track_histogram(self, metric_name: str, value: float, labels: Optional[Dict[str, str]] = None):
         """Registra um histograma"""
-        if PROMETHEUS_AVAILABLE and settings.PROMETHEUS_ENABLED:
-            if metric_name == "tempo_processamento":
-                tempo_processamento.labels(**labels).observe(value)
-            elif metric_name == "tempo_resposta_api":
-                tempo_resposta_api.labels(**labels).observe(value)
-        
-        # Log estruturado
-        logger.info(f"Métrica: {metric_name}", extra={
-            "metric_type": "histogram",
-            "metric_name": metric_name,
-            "value": value,
-            "labels": labels
-        })
+        serie = self._serie("histogram", metric_name, labels)
+        if serie is not _SEM_SERIE:
+            serie.observe(value)
+        if self.taxa_log:
+            self._log("histogram", metric_name, value, labels)
     
-    def track_gauge(self, metric_name: str, value: float):
+    def track_gauge(self, metric_name: str, value: float, labels: Optional[Dict[str, str]] = None):
         """Registra um gauge"""
-        if PROMETHEUS_AVAILABLE and settings.PROMETHEUS_ENABLED:
-            if metric_name == "fila_tamanho":
-                fila_tamanho.set(value)
-            elif metric_name == "sinistros_em_analise":
-                sinistros_em_analise.set(value)
-        
-        # Log estruturado
-        logger.info(f"Métrica: {metric_name}", extra={
-            "metric_type": "gauge",
-            "metric_name": metric_name,
-            "value": value
-        })
+        serie = self._serie("gauge", metric_name, labels)
+        if serie is not _SEM_SERIE:
+            serie.set(value)
+        if self.taxa_log:
+            self._log("gauge", metric_name, value, labels)
     
-    def start_timer(self, timer_name: str):
-        """Inicia um timer"""
-        self.start_times[timer_name] = time.time()
-    
-    def end_timer(self, timer_name: str, metric_name: str, labels: Optional[Dict[str, str]] = None):
-        """Finaliza um timer e registra o tempo"""
-        if timer_name in self.start_times:
-            duration = time.time() - self.start_times[timer_name]
-            self.track_histogram(metric_name, duration, labels)
-            del self.start_times[timer_name]
-            return duration
-        return 0
+    def track_gauge_delta(self, metric_name: str, delta: float, labels: Optional[Dict[str, str]] = None):
+        """Soma delta (positivo ou negativo) a um gauge"""
+        serie = self._serie("gauge", metric_name, labels)
+        if serie is not _SEM_SERIE:
+            serie.inc(delta)
+
 
 # Instância global do coletor
 metrics_collector = MetricsCollector()
@@ -150,7 +352,8 @@ def track_metric(name: str, value: Any, labels: Optional[Dict[str, str]] = None)
 def track_error(error_type: str, exception: Exception, context: Optional[Dict[str, Any]] = None):
     """Registra um erro"""
     # Sentry
-    if SENTRY_AVAILABLE and settings.SENTRY_DSN:
+    if sentry.obter():
+        import sentry_sdk
         with sentry_sdk.push_scope() as scope:
             if context:
                 for key, value in context.items():
@@ -170,16 +373,99 @@ def track_error(error_type: str, exception: Exception, context: Optional[Dict[st
         "context": context
     }, exc_info=True)
 
-@contextmanager
-def track_time(metric_name: str, labels: Optional[Dict[str, str]] = None):
-    """Context manager para medir tempo de execução"""
-    timer_name = f"{metric_name}_{time.time()}"
-    metrics_collector.start_timer(timer_name)
+# Cronômetro (span) aberto no contexto atual: cada requisição/tarefa/thread
+# tem o seu, então cronômetros aninhados sabem quem é o pai
+_cronometro_atual: ContextVar[Optional["Cronometro"]] = ContextVar("cronometro_atual", default=None)
+
+class Cronometro:
+    """
+    Mede uma duração com perf_counter_ns e registra no histograma metric_name
     
-    try:
-        yield
-    finally:
-        metrics_collector.end_timer(timer_name, metric_name, labels)
+    O estado fica na própria instância (nada compartilhado entre requisições)
+    e o cronômetro aberto é publicado num ContextVar, então cronômetros
+    aninhados formam uma árvore de spans (pai, caminho). Sem metric_name só
+    mede, sem registrar.
+    
+    with track_time("criar_sinistro"): ...
+    async with track_time("iniciar_analise", {"prioridade": "1"}): ...
+    @track_time("gerar_relatorio")
+    def gerar_relatorio(): ...
+    """
+    
+    __slots__ = ("metric_name", "labels", "nome", "pai", "inicio_ns", "duracao_ns", "_token")
+    
+    def __init__(self, metric_name: Optional[str], labels: Optional[Dict[str, str]] = None, nome: Optional[str] = None):
+        self.metric_name = metric_name
+        self.labels = labels
+        self.nome = nome or metric_name
+        self.pai = None
+        self.inicio_ns = 0
+        self.duracao_ns = None
+        self._token = None
+    
+    def __enter__(self) -> "Cronometro":
+        self.pai = _cronometro_atual.get()
+        self._token = _cronometro_atual.set(self)
+        self.inicio_ns = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duracao_ns = time.perf_counter_ns() - self.inicio_ns
+        _cronometro_atual.reset(self._token)
+        self._token = None
+        if self.metric_name:
+            metrics_collector.track_histogram(self.metric_name, self.duracao_ns / 1e9, self.labels)
+        return False
+    
+    async def __aenter__(self) -> "Cronometro":
+        return self.__enter__()
+    
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+    
+    def __call__(self, funcao):
+        """Como decorador: um cronômetro novo a cada chamada"""
+        metric_name, labels, nome = self.metric_name, self.labels, self.nome
+        
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def cronometrada_async(*args, **kwargs):
+                with Cronometro(metric_name, labels, nome):
+                    return await funcao(*args, **kwargs)
+            return cronometrada_async
+        
+        @functools.wraps(funcao)
+        def cronometrada(*args, **kwargs):
+            with Cronometro(metric_name, labels, nome):
+                return funcao(*args, **kwargs)
+        return cronometrada
+    
+    def decorrido_ns(self) -> int:
+        """Duração final, ou o tempo até agora se ainda aberto"""
+        if self.duracao_ns is not None:
+            return self.duracao_ns
+        return time.perf_counter_ns() - self.inicio_ns
+    
+    def decorrido_ms(self) -> int:
+        return self.decorrido_ns() // 1_000_000
+    
+    @property
+    def caminho(self) -> str:
+        """Nomes dos cronômetros da raiz até este (ex.: "processar_sinistro/etapa_triagem")"""
+        nomes = []
+        cronometro = self
+        while cronometro is not None:
+            nomes.append(cronometro.nome or "?")
+            cronometro = cronometro.pai
+        return "/".join(reversed(nomes))
+
+def cronometro_atual() -> Optional[Cronometro]:
+    """Cronômetro aberto mais interno no contexto atual"""
+    return _cronometro_atual.get()
+
+def track_time(metric_name: str, labels: Optional[Dict[str, str]] = None, nome: Optional[str] = None) -> Cronometro:
+    """Mede tempo de execução: context manager (sync/async) ou decorador"""
+    return Cronometro(metric_name, labels, nome)
 
 def log_structured(level: str, message: str, **kwargs):
     """Log estruturado em JSON"""
@@ -203,32 +489,58 @@ def log_structured(level: str, message: str, **kwargs):
         )
 
 # Middleware para FastAPI
+ROTA_NAO_ENCONTRADA = "sem_rota"
+
+def rota_da_requisicao(scope) -> str:
+    """
+    Template da rota atendida (ex.: /api/v1/sinistros/{numero_sinistro})
+    
+    O roteador do FastAPI grava a rota em scope["route"]; requisições que
+    não casaram com nenhuma rota usam ROTA_NAO_ENCONTRADA, e não o caminho
+    bruto, para que varreduras de URL não criem séries novas.
+    """
+    rota = scope.get("route")
+    if rota is None:
+        return ROTA_NAO_ENCONTRADA
+    return getattr(rota, "path", ROTA_NAO_ENCONTRADA)
+
 class MetricsMiddleware:
-    """Middleware para coletar métricas da API"""
+    """Middleware ASGI: latência e status por template de rota e requisições em andamento"""
     
-    def __init__(self, app):
+    def __init__(self, app, coletor: MetricsCollector = None):
         self.app = app
+        self.coletor = coletor or metrics_collector
     
     async def __call__(self, scope, receive, send):
-        if scope["type"] == "http":
-            start_time = time.time()
-            
-            async def send_wrapper(message):
-                if message["type"] == "http.response.start":
-                    duration = time.time() - start_time
-                    
-                    # Registrar métrica
-                    metrics_collector.track_histogram(
-                        "tempo_resposta_api",
-                        duration,
-                        {
-                            "endpoint": scope["path"],
-                            "metodo": scope["method"]
-                        }
-                    )
-                
-                await send(message)
-            
-            await self.app(scope, receive, send_wrapper)
-        else:
+        if scope["type"] != "http":
             await self.app(scope, receive, send)
+            return
+        
+        metodo = scope["method"]
+        status = 500  # se a aplicação falhar antes de responder
+        # Span raiz da requisição: track_time nos handlers vira filho dele
+        requisicao = Cronometro(None, nome=f"{metodo} {scope['path']}")
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self.coletor.track_histogram(
+                    "tempo_resposta_api",
+                    requisicao.decorrido_ns() / 1e9,
+                    {"endpoint": rota_da_requisicao(scope), "metodo": metodo}
+                )
+            await send(message)
+        
+        self.coletor.track_gauge_delta("requisicoes_em_andamento", 1, {"metodo": metodo})
+        try:
+            with requisicao:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            rota = rota_da_requisicao(scope)
+            self.coletor.track_gauge_delta("requisicoes_em_andamento", -1, {"metodo": metodo})
+            self.coletor.track_counter("requisicoes_api", 1, {
+                "endpoint": rota, "metodo": metodo, "status": str(status)
+            })
+            if rota != ROTA_NAO_ENCONTRADA:
+                amostragem.registrar_execucao(rota, requisicao.decorrido_ns() / 1e9, status >= 500)
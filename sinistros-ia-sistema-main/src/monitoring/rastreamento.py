@@ -0,0 +1,425 @@
+"""
+Rastreamento distribuído (spans no modelo do OpenTelemetry)
+
+Requisições da API, tarefas Celery, etapas dos agentes, swarm.run,
+chamadas ao LLM, ferramentas, HTTP de saída e consultas SQL viram spans
+de um mesmo trace. O contexto atravessa processos no cabeçalho W3C
+traceparent (requisições HTTP e headers das mensagens Celery): a análise
+disparada por criar_sinistro/analisar_sinistro aparece no trace da
+requisição, e a espera na fila é o intervalo entre os dois spans.
+
+Os spans terminados são exportados em lote, em segundo plano, no formato
+OTLP/JSON (exportadores em EXPORTADORES):
+- arquivo: uma linha por lote em RASTREAMENTO_ARQUIVO (receiver
+  otlpjsonfile do OpenTelemetry Collector; útil offline e em testes)
+- otlp: POST em RASTREAMENTO_OTLP_ENDPOINT (collector local, /v1/traces)
+
+Com RASTREAMENTO_ATIVO=false iniciar_span devolve um span nulo e nada é
+registrado. Spans de HTTP de saída e SQL só são abertos dentro de outro
+span, para não criar traces soltos.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# SpanKind do OTLP
+TIPO_INTERNO = 1
+TIPO_SERVIDOR = 2
+TIPO_CLIENTE = 3
+TIPO_PRODUTOR = 4
+TIPO_CONSUMIDOR = 5
+
+CABECALHO_TRACEPARENT = "traceparent"
+TAMANHO_LOTE = 512
+MAX_PENDENTES = 4096  # acima disso os spans novos são descartados
+INTERVALO_ENVIO_SEGUNDOS = 2.0
+MAX_SQL_NO_SPAN = 1000
+
+_servico = {"nome": None}
+
+
+def ativo() -> bool:
+    return settings.RASTREAMENTO_ATIVO
+
+
+def definir_servico(nome: str):
+    """Nome do serviço nos spans exportados (padrão: RASTREAMENTO_SERVICO)"""
+    _servico["nome"] = nome
+
+
+class ContextoRemoto:
+    """Span pai vindo de outro processo (traceparent)"""
+
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+# Span aberto (ou contexto remoto) do contexto atual
+_span_atual: ContextVar[Optional[Any]] = ContextVar("span_rastreamento", default=None)
+
+
+def span_atual():
+    """Span aberto mais interno no contexto atual (ou o contexto remoto)"""
+    return _span_atual.get()
+
+
+class Span:
+    """
+    Operação com início e fim: context manager (sync/async) ou decorador
+
+    O pai é o span atual do contexto, ou o ContextoRemoto passado em pai.
+    """
+
+    __slots__ = ("nome", "tipo", "trace_id", "span_id", "pai_id", "atributos",
+                 "inicio_ns", "fim_ns", "erro", "_inicio_perf", "_token")
+
+    def __init__(self, nome: str, tipo: int = TIPO_INTERNO, atributos: Optional[Dict[str, Any]] = None,
+                 pai: Optional[ContextoRemoto] = None):
+        pai = pai or _span_atual.get()
+        self.nome = nome
+        self.tipo = tipo
+        self.trace_id = pai.trace_id if pai else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.pai_id = pai.span_id if pai else None
+        self.atributos = atributos or {}
+        self.inicio_ns = 0
+        self.fim_ns = None
+        self.erro = None
+        self._inicio_perf = 0
+        self._token = None
+
+    def definir_atributo(self, chave: str, valor: Any):
+        self.atributos[chave] = valor
+
+    def registrar_erro(self, exc):
+        """Marca o span como falho (exceção ou mensagem)"""
+        self.erro = exc if isinstance(exc, str) else f"{type(exc).__name__}: {exc}"
+
+    def __enter__(self) -> "Span":
+        self._token = _span_atual.set(self)
+        self.inicio_ns = time.time_ns()
+        self._inicio_perf = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        # Duração monotônica somada ao instante de início
+        self.fim_ns = self.inicio_ns + (time.perf_counter_ns() - self._inicio_perf)
+        if exc is not None and self.erro is None:
+            self.registrar_erro(exc)
+        if self._token is not None:
+            _span_atual.reset(self._token)
+            self._token = None
+        exportador.adicionar(self)
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+    def para_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.nome,
+            "kind": self.tipo,
+            "startTimeUnixNano": str(self.inicio_ns),
+            "endTimeUnixNano": str(self.fim_ns),
+            "attributes": _atributos_otlp(self.atributos),
+            "status": {"code": 2, "message": self.erro} if self.erro else {"code": 1},
+        }
+        if self.pai_id:
+            span["parentSpanId"] = self.pai_id
+        return span
+
+
+class _SpanNulo:
+    """Span do rastreamento desligado: não mede nem exporta"""
+
+    trace_id = span_id = pai_id = None
+
+    def definir_atributo(self, chave: str, valor: Any):
+        pass
+
+    def registrar_erro(self, exc):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+SPAN_NULO = _SpanNulo()
+
+
+def anotar(atributos: Dict[str, Any]):
+    """Acrescenta atributos ao span aberto no contexto atual (se houver)"""
+    atual = _span_atual.get()
+    if isinstance(atual, Span):
+        atual.atributos.update(atributos)
+
+
+def iniciar_span(nome: str, tipo: int = TIPO_INTERNO, atributos: Optional[Dict[str, Any]] = None,
+                 pai: Optional[ContextoRemoto] = None):
+    """Span novo (SPAN_NULO se o rastreamento estiver desligado)"""
+    if not ativo():
+        return SPAN_NULO
+    return Span(nome, tipo, atributos, pai)
+
+
+def rastrear(nome: Optional[str] = None, tipo: int = TIPO_INTERNO, **atributos) -> Callable:
+    """
+    Decorador: cada chamada da função roda dentro de um span
+
+    @rastrear("ferramenta.consultar_apolice")
+    def consultar_apolice(numero_apolice): ...
+    """
+    def decorador(funcao):
+        nome_span = nome or funcao.__qualname__
+
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def rastreada_async(*args, **kwargs):
+                async with iniciar_span(nome_span, tipo, dict(atributos)):
+                    return await funcao(*args, **kwargs)
+            return rastreada_async
+
+        @functools.wraps(funcao)
+        def rastreada(*args, **kwargs):
+            with iniciar_span(nome_span, tipo, dict(atributos)):
+                return funcao(*args, **kwargs)
+        return rastreada
+    return decorador
+
+
+# --- Propagação (W3C traceparent) ------------------------------------------
+
+def injetar(carrier: Dict[str, Any]):
+    """Grava o traceparent do span atual em carrier (headers HTTP ou Celery)"""
+    atual = _span_atual.get()
+    if atual is not None and ativo():
+        carrier[CABECALHO_TRACEPARENT] = f"00-{atual.trace_id}-{atual.span_id}-01"
+
+
+def extrair(traceparent: Optional[str]) -> Optional[ContextoRemoto]:
+    """ContextoRemoto do cabeçalho traceparent; None se ausente ou inválido"""
+    if not traceparent:
+        return None
+    partes = traceparent.strip().split("-")
+    if len(partes) != 4 or len(partes[1]) != 32 or len(partes[2]) != 16:
+        return None
+    if partes[1] == "0" * 32 or partes[2] == "0" * 16:
+        return None
+    return ContextoRemoto(partes[1].lower(), partes[2].lower())
+
+
+# --- Exportação ---------------------------------------------------------------
+
+def _atributos_otlp(atributos: Dict[str, Any]) -> List[Dict[str, Any]]:
+    convertidos = []
+    for chave, valor in atributos.items():
+        if valor is None:
+            continue
+        if isinstance(valor, bool):
+            convertido = {"boolValue": valor}
+        elif isinstance(valor, int):
+            convertido = {"intValue": str(valor)}
+        elif isinstance(valor, float):
+            convertido = {"doubleValue": valor}
+        else:
+            convertido = {"stringValue": str(valor)}
+        convertidos.append({"key": chave, "value": convertido})
+    return convertidos
+
+
+def para_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """Lote de spans no corpo de ExportTraceServiceRequest (OTLP/JSON)"""
+    recurso = {
+        "service.name": _servico["nome"] or settings.RASTREAMENTO_SERVICO,
+        "deployment.environment": settings.ENVIRONMENT,
+        "process.pid": os.getpid(),
+    }
+    return {"resourceSpans": [{
+        "resource": {"attributes": _atributos_otlp(recurso)},
+        "scopeSpans": [{"scope": {"name": "sinistros"}, "spans": [span.para_otlp() for span in spans]}],
+    }]}
+
+
+def _exportar_arquivo(spans: List[Span]):
+    caminho = Path(settings.RASTREAMENTO_ARQUIVO)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with caminho.open("a", encoding="utf-8") as arquivo:
+        arquivo.write(json.dumps(para_otlp(spans), ensure_ascii=False) + "\n")
+
+
+def _exportar_otlp(spans: List[Span]):
+    # requests direto (sem a sessão instrumentada): o envio não gera spans
+    import requests
+    resposta = requests.post(settings.RASTREAMENTO_OTLP_ENDPOINT, json=para_otlp(spans), timeout=5)
+    resposta.raise_for_status()
+
+
+EXPORTADORES: Dict[str, Callable[[List[Span]], None]] = {
+    "arquivo": _exportar_arquivo,
+    "otlp": _exportar_otlp,
+}
+
+
+class ExportadorLote:
+    """
+    Acumula spans terminados e os envia em lote
+
+    Uma thread em segundo plano envia a cada INTERVALO_ENVIO_SEGUNDOS (ou
+    antes, ao juntar TAMANHO_LOTE spans); forcar_envio envia o que estiver
+    pendente na thread de quem chama.
+    """
+
+    def __init__(self):
+        self.resetar()
+
+    def resetar(self):
+        self._pendentes: List[Span] = []
+        self._lock = threading.Lock()
+        self._lock_envio = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.descartados = 0
+
+    def adicionar(self, span: Span):
+        with self._lock:
+            if len(self._pendentes) >= MAX_PENDENTES:
+                self.descartados += 1
+                return
+            self._pendentes.append(span)
+            cheio = len(self._pendentes) >= TAMANHO_LOTE
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._laco, name="exportador-spans", daemon=True)
+                self._thread.start()
+        if cheio:
+            self._acordar.set()
+
+    def _laco(self):
+        while True:
+            self._acordar.wait(INTERVALO_ENVIO_SEGUNDOS)
+            self._acordar.clear()
+            self.forcar_envio()
+
+    def forcar_envio(self):
+        """Envia todos os spans terminados até agora"""
+        with self._lock_envio:
+            with self._lock:
+                lote, self._pendentes = self._pendentes, []
+            if not lote:
+                return
+            exportar = EXPORTADORES.get(settings.RASTREAMENTO_EXPORTADOR)
+            if exportar is None:
+                return
+            for inicio in range(0, len(lote), TAMANHO_LOTE):
+                try:
+                    exportar(lote[inicio:inicio + TAMANHO_LOTE])
+                except Exception as e:
+                    logger.warning(f"Falha ao exportar {len(lote)} spans ({settings.RASTREAMENTO_EXPORTADOR}): {e}")
+
+
+exportador = ExportadorLote()
+atexit.register(exportador.forcar_envio)
+
+# O processo filho não herda a thread de envio nem os spans do pai
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=exportador.resetar)
+
+
+# --- Consultas SQL ------------------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _iniciar_span_sql(conn, cursor, statement, parameters, context, executemany):
+    if context is None or _span_atual.get() is None or not ativo():
+        return
+    operacao = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    span = Span(f"db.{operacao}", TIPO_CLIENTE, {
+        "db.system": conn.dialect.name,
+        "db.statement": statement[:MAX_SQL_NO_SPAN],
+    })
+    context._span_rastreamento = span.__enter__()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _encerrar_span_sql(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_span_rastreamento", None)
+    if span is not None:
+        context._span_rastreamento = None
+        span.__exit__(None, None, None)
+
+
+@event.listens_for(Engine, "handle_error")
+def _erro_span_sql(contexto_excecao):
+    span = getattr(contexto_excecao.execution_context, "_span_rastreamento", None)
+    if span is not None:
+        contexto_excecao.execution_context._span_rastreamento = None
+        span.__exit__(type(contexto_excecao.original_exception), contexto_excecao.original_exception, None)
+
+
+# --- API (ASGI) ---------------------------------------------------------------
+
+class RastreamentoMiddleware:
+    """Span de servidor por requisição, continuando o traceparent recebido"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ativo():
+            await self.app(scope, receive, send)
+            return
+
+        from .metrics import rota_da_requisicao
+
+        cabecalhos = dict(scope.get("headers") or [])
+        pai = extrair(cabecalhos.get(CABECALHO_TRACEPARENT.encode(), b"").decode("latin-1"))
+        metodo = scope["method"]
+        span = Span(metodo, TIPO_SERVIDOR, {"http.method": metodo, "http.target": scope["path"]}, pai)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.definir_atributo("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.registrar_erro(f"HTTP {message['status']}")
+            await send(message)
+
+        with span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                rota = rota_da_requisicao(scope)
+                span.nome = f"{metodo} {rota}"
+                span.definir_atributo("http.route", rota)
@@ -0,0 +1,154 @@
+"""
+Compactação de contexto para os prompts dos agentes
+
+Normaliza espaços, remove boilerplate de emails (citações, assinaturas,
+avisos legais), reduz a saída de um agente aos campos estruturados e
+limita textos por contagem de tokens.
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+# Contagem exata de tokens se tiktoken estiver disponível
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+    TIKTOKEN_AVAILABLE = True
+except Exception:
+    _encoding = None
+    TIKTOKEN_AVAILABLE = False
+
+# Média aproximada de caracteres por token em português
+CARACTERES_POR_TOKEN = 4
+
+MARCADOR_CORTE = " [...]"
+
+# Linhas a partir das quais o resto do email é descartado
+_INICIO_BOILERPLATE = [
+    re.compile(r"^--\s*$"),  # delimitador padrão de assinatura
+    re.compile(r"^_{5,}\s*$"),
+    re.compile(r"^(em|on)\s.+(escreveu|wrote)\s*:\s*$", re.IGNORECASE),
+    re.compile(r"^-+\s*(mensagem original|original message|mensagem encaminhada|forwarded message)\s*-+", re.IGNORECASE),
+    re.compile(r"^(de|from)\s*:\s*.+@", re.IGNORECASE),
+    re.compile(r"^(atenciosamente|att|abra[çc]os|cordialmente|obrigad[oa])[\s,.!]*$", re.IGNORECASE),
+    re.compile(r"^enviado (do|de) meu", re.IGNORECASE),
+    re.compile(r"^sent from my", re.IGNORECASE),
+]
+
+# Parágrafos descartados onde quer que apareçam
+_PARAGRAFOS_DESCARTADOS = [
+    re.compile(r"(esta|this) (mensagem|message|e-?mail).{0,80}(confidencial|confidential)", re.IGNORECASE),
+    re.compile(r"antes de imprimir.{0,40}meio ambiente", re.IGNORECASE),
+]
+
+_BLOCO_JSON = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+
+def contar_tokens(texto: str) -> int:
+    """Conta tokens do texto (aproximado quando tiktoken não está instalado)"""
+    if not texto:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_encoding.encode(texto))
+    return -(-len(texto) // CARACTERES_POR_TOKEN)
+
+
+def normalizar_espacos(texto: str) -> str:
+    """Colapsa espaços e linhas em branco repetidas"""
+    if not texto:
+        return ""
+    linhas = [re.sub(r"[ \t ]+", " ", linha).strip() for linha in texto.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(linhas)).strip()
+
+
+def remover_boilerplate(texto: str) -> str:
+    """Remove citações de respostas, assinaturas e avisos legais de emails"""
+    if not texto:
+        return ""
+
+    linhas = []
+    for linha in texto.splitlines():
+        conteudo = linha.strip()
+        if any(padrao.match(conteudo) for padrao in _INICIO_BOILERPLATE):
+            break
+        if conteudo.startswith(">"):
+            continue
+        linhas.append(linha)
+
+    paragrafos = [
+        paragrafo for paragrafo in "\n".join(linhas).split("\n\n")
+        if not any(padrao.search(paragrafo) for padrao in _PARAGRAFOS_DESCARTADOS)
+    ]
+    return "\n\n".join(paragrafos)
+
+
+def limitar_tokens(texto: str, max_tokens: int) -> str:
+    """Corta o texto para caber em max_tokens, marcando o corte"""
+    if not texto or contar_tokens(texto) <= max_tokens:
+        return texto or ""
+
+    limite = max(max_tokens - contar_tokens(MARCADOR_CORTE), 0)
+    if TIKTOKEN_AVAILABLE:
+        cortado = _encoding.decode(_encoding.encode(texto)[:limite])
+    else:
+        cortado = texto[:limite * CARACTERES_POR_TOKEN]
+
+    # Evitar cortar no meio de uma palavra
+    if " " in cortado[-20:]:
+        cortado = cortado[:cortado.rfind(" ")]
+    return cortado.rstrip() + MARCADOR_CORTE
+
+
+def compactar_texto(texto: str, max_tokens: Optional[int] = None) -> str:
+    """Normaliza, remove boilerplate e (opcionalmente) limita em tokens"""
+    compactado = normalizar_espacos(remover_boilerplate(texto or ""))
+    if max_tokens is not None:
+        compactado = limitar_tokens(compactado, max_tokens)
+    return compactado
+
+
+def extrair_json(texto: str) -> Optional[Dict[str, Any]]:
+    """Extrai o primeiro objeto JSON da resposta de um agente, se houver"""
+    if not texto:
+        return None
+
+    candidatos = _BLOCO_JSON.findall(texto)
+    inicio, fim = texto.find("{"), texto.rfind("}")
+    if inicio != -1 and fim > inicio:
+        candidatos.append(texto[inicio:fim + 1])
+
+    for candidato in candidatos:
+        try:
+            dados = json.loads(candidato)
+        except ValueError:
+            continue
+        if isinstance(dados, dict):
+            return dados
+    return None
+
+
+def _campo_estruturado(valor: Any) -> bool:
+    if isinstance(valor, (bool, int, float)) or valor is None:
+        return True
+    if isinstance(valor, str):
+        return len(valor) <= 200
+    if isinstance(valor, list):
+        return all(_campo_estruturado(item) and not isinstance(item, (list, dict)) for item in valor)
+    return False
+
+
+def resumir_saida_agente(saida: str, max_tokens: int) -> str:
+    """
+    Reduz a saída de um agente para repassá-la ao próximo
+
+    Se a resposta tem JSON, mantém apenas os campos estruturados (valores
+    escalares, textos curtos e listas simples); senão, compacta o texto.
+    """
+    dados = extrair_json(saida)
+    if dados:
+        campos = {chave: valor for chave, valor in dados.items() if _campo_estruturado(valor)}
+        if campos:
+            return limitar_tokens(json.dumps(campos, ensure_ascii=False, separators=(",", ":")), max_tokens)
+
+    return compactar_texto(saida, max_tokens)
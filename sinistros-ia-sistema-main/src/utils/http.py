@@ -0,0 +1,85 @@
+"""
+Sessões HTTP compartilhadas para chamadas a sistemas externos
+
+Cada nome tem uma sessão com pool de conexões reutilizado entre tarefas
+(keep-alive), dimensionado para pools de workers com muitas tarefas
+simultâneas (gevent). As sessões são descartadas no processo filho após
+um fork, para não compartilhar sockets com o processo pai.
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config.settings import get_settings
+from ..monitoring import rastreamento
+
+_sessoes: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+class AdaptadorRastreado(HTTPAdapter):
+    """Abre um span de cliente por requisição e propaga o traceparent"""
+
+    def __init__(self, nome: str = "default", **kwargs):
+        self.nome = nome
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if rastreamento.span_atual() is None:
+            return super().send(request, **kwargs)
+
+        url = request.url.split("?", 1)[0]
+        with rastreamento.iniciar_span(f"HTTP {request.method}", rastreamento.TIPO_CLIENTE, {
+            "http.method": request.method,
+            "http.url": url,
+            "peer.service": self.nome,
+        }) as span:
+            rastreamento.injetar(request.headers)
+            resposta = super().send(request, **kwargs)
+            span.definir_atributo("http.status_code", resposta.status_code)
+            if resposta.status_code >= 500:
+                span.registrar_erro(f"HTTP {resposta.status_code}")
+            return resposta
+
+
+def criar_sessao_http(headers: Optional[Dict[str, str]] = None, nome: str = "default") -> requests.Session:
+    """Cria uma sessão com pool de conexões do tamanho configurado"""
+    tamanho_pool = get_settings().HTTP_POOL_MAXSIZE
+    sessao = requests.Session()
+    adaptador = AdaptadorRastreado(nome, pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    if headers:
+        sessao.headers.update(headers)
+    return sessao
+
+
+def get_http_session(nome: str = "default", headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """
+    Retorna a sessão compartilhada de nome dado, criando-a se necessário
+
+    headers só são aplicados na criação da sessão.
+    """
+    sessao = _sessoes.get(nome)
+    if sessao is None:
+        with _lock:
+            sessao = _sessoes.get(nome)
+            if sessao is None:
+                sessao = _sessoes[nome] = criar_sessao_http(headers, nome)
+    return sessao
+
+
+def resetar_sessoes_http():
+    """Descarta as sessões; as próximas chamadas abrem conexões novas"""
+    global _lock
+    _sessoes.clear()
+    _lock = threading.Lock()
+
+
+# Sockets herdados do processo pai não podem ser usados no filho
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=resetar_sessoes_http)
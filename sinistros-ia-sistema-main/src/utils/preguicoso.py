@@ -0,0 +1,204 @@
+"""
+Inicialização preguiçosa de subsistemas e perfil de startup
+
+Engines, clientes e bibliotecas pesadas (Celery, OpenAI/Swarm, Sentry,
+Prometheus) são criados no primeiro uso, e não no import, para que o
+cold start do deploy serverless só pague pelo que a requisição usa:
+
+- Recurso: singleton criado pela fábrica no primeiro obter(); registrado
+  em RECURSOS para ser pré-aquecido no startup (inicializar_recursos)
+  ou descartado após fork (resetar)
+- importar_preguicoso: módulo importado no primeiro acesso a um atributo
+
+Com PERFIL_INICIALIZACAO=1 no ambiente, o tempo de import de cada módulo
+e de criação de cada recurso é registrado (relatorio_inicializacao).
+"""
+
+import importlib
+import importlib.abc
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tempos de criação dos recursos (ms), sempre registrados
+_tempos_recursos: Dict[str, float] = {}
+
+
+class Recurso:
+    """Objeto criado uma única vez, no primeiro obter() (thread-safe)"""
+
+    def __init__(self, nome: str, fabrica: Callable[[], Any]):
+        self.nome = nome
+        self._fabrica = fabrica
+        self._valor = None
+        self._inicializado = False
+        self._lock = threading.Lock()
+
+    @property
+    def inicializado(self) -> bool:
+        return self._inicializado
+
+    def obter(self) -> Any:
+        if not self._inicializado:
+            with self._lock:
+                if not self._inicializado:
+                    inicio = time.perf_counter()
+                    self._valor = self._fabrica()
+                    self._inicializado = True
+                    _tempos_recursos[self.nome] = (time.perf_counter() - inicio) * 1000
+                    logger.debug(f"Recurso {self.nome} inicializado em {_tempos_recursos[self.nome]:.1f} ms")
+        return self._valor
+
+    def resetar(self):
+        """Esquece o valor; o próximo obter() cria outro"""
+        self._valor = None
+        self._inicializado = False
+        self._lock = threading.Lock()
+
+
+RECURSOS: Dict[str, Recurso] = {}
+
+
+def recurso(nome: str, fabrica: Callable[[], Any]) -> Recurso:
+    """Cria e registra um Recurso"""
+    RECURSOS[nome] = Recurso(nome, fabrica)
+    return RECURSOS[nome]
+
+
+def inicializar_recursos(*nomes: str) -> Dict[str, float]:
+    """Pré-aquece os recursos (todos se nenhum nome for dado); retorna ms de cada um"""
+    tempos = {}
+    for nome in nomes or list(RECURSOS):
+        inicio = time.perf_counter()
+        RECURSOS[nome].obter()
+        tempos[nome] = (time.perf_counter() - inicio) * 1000
+    return tempos
+
+
+class ModuloPreguicoso:
+    """Proxy de módulo: o import acontece no primeiro acesso a um atributo"""
+
+    def __init__(self, nome: str):
+        self._nome = nome
+        self._modulo = None
+
+    def _carregar(self):
+        """Importa o módulo agora (pré-aquecimento)"""
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nome)
+        return self._modulo
+
+    def __getattr__(self, atributo: str) -> Any:
+        return getattr(self._carregar(), atributo)
+
+    def __repr__(self) -> str:
+        estado = "carregado" if self._modulo is not None else "não carregado"
+        return f"<módulo preguiçoso {self._nome} ({estado})>"
+
+
+def importar_preguicoso(nome: str, pacote: Optional[str] = None) -> ModuloPreguicoso:
+    """
+    Módulo carregado sob demanda; aceita nome relativo com pacote
+
+    tasks = importar_preguicoso("..workers.tasks", __package__)
+    tasks.enfileirar_analise(db, numero)  # importa aqui
+    """
+    return ModuloPreguicoso(importlib.util.resolve_name(nome, pacote) if nome.startswith(".") else nome)
+
+
+# --- Perfil de importação -------------------------------------------------
+
+class _LoaderCronometrado:
+    """Loader que mede o exec_module do loader original"""
+
+    def __init__(self, loader, perfil: "_PerfilImportacao"):
+        self._loader = loader
+        self._perfil = perfil
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, modulo):
+        self._perfil.entrar()
+        inicio = time.perf_counter()
+        try:
+            self._loader.exec_module(modulo)
+        finally:
+            self._perfil.sair(modulo.__name__, (time.perf_counter() - inicio) * 1000)
+
+    def __getattr__(self, atributo):
+        return getattr(self._loader, atributo)
+
+
+class _PerfilImportacao(importlib.abc.MetaPathFinder):
+    """Mede tempo próprio e acumulado do import de cada módulo"""
+
+    def __init__(self):
+        self.modulos: Dict[str, Dict[str, float]] = {}
+        self._filhos: List[float] = []
+        self._local = threading.local()
+
+    def find_spec(self, nome, caminho, alvo=None):
+        if getattr(self._local, "buscando", False):
+            return None
+        self._local.buscando = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(nome, caminho, alvo)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _LoaderCronometrado(spec.loader, self)
+                    return spec
+            return None
+        finally:
+            self._local.buscando = False
+
+    def entrar(self):
+        self._filhos.append(0.0)
+
+    def sair(self, nome: str, acumulado_ms: float):
+        filhos = self._filhos.pop()
+        if self._filhos:
+            self._filhos[-1] += acumulado_ms
+        self.modulos[nome] = {"proprio_ms": acumulado_ms - filhos, "acumulado_ms": acumulado_ms}
+
+
+_perfil: Optional[_PerfilImportacao] = None
+_inicio_processo = time.perf_counter()
+
+
+def ativar_perfil_importacao():
+    """Passa a medir os imports seguintes (chamar antes de importar a aplicação)"""
+    global _perfil
+    if _perfil is None:
+        _perfil = _PerfilImportacao()
+        sys.meta_path.insert(0, _perfil)
+
+
+def relatorio_inicializacao(limite: int = 25) -> Dict[str, Any]:
+    """Módulos mais lentos de importar (se o perfil estiver ativo) e tempo dos recursos"""
+    modulos = []
+    if _perfil is not None:
+        modulos = sorted(
+            ({"modulo": nome, **tempos} for nome, tempos in _perfil.modulos.items()),
+            key=lambda item: item["proprio_ms"],
+            reverse=True
+        )[:limite]
+    return {
+        "perfil_ativo": _perfil is not None,
+        "desde_inicio_ms": (time.perf_counter() - _inicio_processo) * 1000,
+        "importacoes": [{k: round(v, 2) if isinstance(v, float) else v for k, v in item.items()} for item in modulos],
+        "recursos_ms": {nome: round(ms, 2) for nome, ms in _tempos_recursos.items()},
+    }
+
+
+if os.getenv("PERFIL_INICIALIZACAO", "").lower() in ("1", "true", "yes"):
+    ativar_perfil_importacao()
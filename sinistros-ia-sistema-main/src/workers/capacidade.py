@@ -0,0 +1,177 @@
+"""
+Observabilidade das filas do broker e sinal de capacidade dos workers
+
+Mede a profundidade de cada fila (somando as sub-filas de prioridade do
+Redis), a idade da mensagem mais antiga e o tempo de serviço médio das
+tarefas, e a partir disso calcula quantas réplicas de worker cada fila
+precisa. O AutoscalerPorFila usa a profundidade para ajustar a
+concorrência de um worker (--autoscale).
+"""
+
+import json
+import logging
+import math
+import time
+from typing import Dict, Any, Iterable, Optional
+
+from celery.worker.autoscale import Autoscaler
+
+# Redis é opcional: sem ele não há medição (profundidade 0)
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from ..config.settings import get_settings
+from .filas import Fila, NIVEIS_PRIORIDADE, CONCORRENCIA_POR_FILA
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Cabeçalho com o instante (epoch) em que a tarefa foi publicada
+CABECALHO_ENFILEIRADO_EM = "enfileirado_em"
+
+# Mesmo separador de broker_transport_options em celery_app.py
+SEPARADOR_PRIORIDADE = ":"
+
+# Tempo de serviço médio (EWMA) por fila, compartilhado entre os workers
+CHAVE_TEMPO_SERVICO = "sinistros:capacidade:tempo_servico"
+PESO_EWMA = 0.2
+
+_redis_client = None
+
+def get_broker_redis():
+    """Cliente Redis do broker (None se indisponível)"""
+    global _redis_client
+    if not REDIS_AVAILABLE:
+        return None
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _redis_client
+
+def sub_filas(fila: str) -> Iterable[str]:
+    """Listas do Redis de uma fila: o kombu cria uma por nível de prioridade"""
+    for nivel in NIVEIS_PRIORIDADE:
+        yield f"{fila}{SEPARADOR_PRIORIDADE}{nivel}" if nivel else fila
+
+def profundidade_fila(cliente, fila: str) -> int:
+    """Mensagens aguardando na fila, somando todos os níveis de prioridade"""
+    pipe = cliente.pipeline(transaction=False)
+    for nome in sub_filas(fila):
+        pipe.llen(nome)
+    return sum(pipe.execute())
+
+def idade_mais_antiga(cliente, fila: str, agora: Optional[float] = None) -> float:
+    """
+    Idade (segundos) da mensagem mais antiga da fila
+
+    O kombu faz LPUSH e consome pela direita, então a mais antiga de cada
+    sub-fila é o último elemento.
+    """
+    agora = agora or time.time()
+    pipe = cliente.pipeline(transaction=False)
+    for nome in sub_filas(fila):
+        pipe.lindex(nome, -1)
+
+    idade = 0.0
+    for mensagem in pipe.execute():
+        if not mensagem:
+            continue
+        try:
+            enfileirado_em = json.loads(mensagem).get("headers", {}).get(CABECALHO_ENFILEIRADO_EM)
+        except (ValueError, AttributeError):
+            continue
+        if enfileirado_em:
+            idade = max(idade, agora - float(enfileirado_em))
+    return idade
+
+def registrar_tempo_servico(cliente, fila: str, segundos: float):
+    """Atualiza a média móvel (EWMA) do tempo de serviço da fila"""
+    atual = cliente.hget(CHAVE_TEMPO_SERVICO, fila)
+    media = segundos if atual is None else PESO_EWMA * segundos + (1 - PESO_EWMA) * float(atual)
+    cliente.hset(CHAVE_TEMPO_SERVICO, fila, media)
+
+def tempo_servico_medio(cliente, fila: str) -> Optional[float]:
+    valor = cliente.hget(CHAVE_TEMPO_SERVICO, fila)
+    return float(valor) if valor is not None else None
+
+def replicas_desejadas(profundidade: int, tempo_servico: Optional[float], concorrencia: int,
+                       alvo_segundos: float, minimo: int = 1, maximo: int = 20) -> int:
+    """
+    Réplicas necessárias para drenar a fila dentro de alvo_segundos
+
+    Cada slot de concorrência processa alvo_segundos / tempo_servico
+    tarefas no prazo; sem histórico de tempo de serviço, assume uma
+    tarefa por slot.
+    """
+    if profundidade <= 0:
+        return minimo
+    tarefas_por_slot = max(alvo_segundos / tempo_servico, 1.0) if tempo_servico else 1.0
+    slots = profundidade / tarefas_por_slot
+    return min(max(math.ceil(slots / max(concorrencia, 1)), minimo), maximo)
+
+def medir_filas(cliente=None) -> Dict[str, Dict[str, Any]]:
+    """Profundidade, idade, tempo de serviço e réplicas desejadas de cada fila"""
+    cliente = cliente or get_broker_redis()
+    if cliente is None:
+        return {}
+
+    medicoes = {}
+    agora = time.time()
+    for fila in Fila:
+        profundidade = profundidade_fila(cliente, fila.value)
+        tempo_servico = tempo_servico_medio(cliente, fila.value)
+        medicoes[fila.value] = {
+            "profundidade": profundidade,
+            "idade_mais_antiga_segundos": idade_mais_antiga(cliente, fila.value, agora),
+            "tempo_servico_segundos": tempo_servico,
+            "replicas_desejadas": replicas_desejadas(
+                profundidade,
+                tempo_servico,
+                CONCORRENCIA_POR_FILA[fila],
+                settings.CAPACIDADE_ALVO_DRENAGEM_SEGUNDOS,
+                settings.WORKER_REPLICAS_MIN,
+                settings.WORKER_REPLICAS_MAX
+            )
+        }
+    return medicoes
+
+class AutoscalerPorFila(Autoscaler):
+    """
+    Autoscaler que também considera a fila no broker
+
+    O Autoscaler padrão só enxerga as mensagens já reservadas pelo worker,
+    que com prefetch 1 são poucas; aqui a carga é reservadas + mensagens
+    aguardando nas filas que o worker consome (limitada por --autoscale).
+    """
+
+    INTERVALO_MEDICAO = 5.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._profundidade = 0
+        self._medido_em = 0.0
+
+    def _filas_consumidas(self) -> Iterable[str]:
+        try:
+            return list(self.worker.app.amqp.queues.consume_from)
+        except AttributeError:
+            return [fila.value for fila in Fila]
+
+    def _profundidade_consumida(self) -> int:
+        if time.monotonic() - self._medido_em < self.INTERVALO_MEDICAO:
+            return self._profundidade
+        self._medido_em = time.monotonic()
+        cliente = get_broker_redis()
+        if cliente is None:
+            return 0
+        try:
+            self._profundidade = sum(profundidade_fila(cliente, fila) for fila in self._filas_consumidas())
+        except Exception as e:
+            logger.warning(f"Autoscaler: falha ao medir filas: {e}")
+        return self._profundidade
+
+    @property
+    def qty(self):
+        return super().qty + self._profundidade_consumida()
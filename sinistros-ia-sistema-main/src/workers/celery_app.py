@@ -3,11 +3,21 @@ Configuração do Celery para processamento assíncrono
 """
 
 from celery import Celery
-from celery.signals import task_prerun, task_postrun, task_failure
+from celery.signals import (
+    before_task_publish, task_prerun, task_postrun, task_failure, worker_init, worker_process_init,
+    worker_process_shutdown
+)
 import logging
+import time
 from datetime import datetime
 
 from ..config.settings import get_settings
+from ..database.connection import dispose_engine
+from .filas import Fila, NIVEIS_PRIORIDADE, PRIORIDADE_PADRAO, prioridade_broker, task_queues, task_routes, beat_schedule
+from .capacidade import CABECALHO_ENFILEIRADO_EM, get_broker_redis, registrar_tempo_servico
+from ..monitoring.metrics import encerrar_processo_metricas, iniciar_servidor_metricas, metrics_collector, track_time
+from ..monitoring import amostragem, rastreamento
+from ..utils.preguicoso import inicializar_recursos
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -35,76 +45,157 @@ celery_app.conf.update(
     task_max_retries=3,
     
     # Configurações de performance
-    worker_prefetch_multiplier=4,
+    # Prefetch 1: mensagens reservadas não são reordenadas por prioridade
+    worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
+    # --autoscale=max,min também considera as mensagens aguardando no broker
+    worker_autoscaler="src.workers.capacidade:AutoscalerPorFila",
     
-    # Configurações de roteamento
-    task_routes={
-        "src.workers.tasks.processar_sinistro_async": {"queue": "analise"},
-        "src.workers.tasks.enviar_webhook": {"queue": "webhooks"},
-        "src.workers.tasks.gerar_relatorio": {"queue": "relatorios"},
-    },
+    # Configurações de roteamento (registro único em filas.py)
+    task_routes=task_routes(),
+    task_queues=task_queues(),
+    task_default_queue=Fila.DEFAULT.value,
+    task_default_exchange=Fila.DEFAULT.value,
+    task_default_routing_key=Fila.DEFAULT.value,
     
-    # Configurações de fila
-    task_default_queue="default",
-    task_queues={
-        "default": {
-            "exchange": "default",
-            "exchange_type": "direct",
-            "routing_key": "default"
-        },
-        "analise": {
-            "exchange": "analise",
-            "exchange_type": "direct",
-            "routing_key": "analise",
-            "priority": 10  # Alta prioridade
-        },
-        "webhooks": {
-            "exchange": "webhooks",
-            "exchange_type": "direct",
-            "routing_key": "webhooks",
-            "priority": 5
-        },
-        "relatorios": {
-            "exchange": "relatorios",
-            "exchange_type": "direct",
-            "routing_key": "relatorios",
-            "priority": 1  # Baixa prioridade
-        }
-    }
+    # Prioridades: no Redis cada nível vira uma sub-fila consumida em ordem
+    task_default_priority=prioridade_broker(PRIORIDADE_PADRAO),
+    task_queue_max_priority=len(NIVEIS_PRIORIDADE),
+    broker_transport_options={
+        "priority_steps": NIVEIS_PRIORIDADE,
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
 )
 
 # Configurar beats (tarefas agendadas)
-celery_app.conf.beat_schedule = {
-    "limpar-filas-antigas": {
-        "task": "src.workers.tasks.limpar_filas_antigas",
-        "schedule": 3600.0,  # A cada hora
-    },
-    "reprocessar-falhas": {
-        "task": "src.workers.tasks.reprocessar_sinistros_falhos",
-        "schedule": 300.0,  # A cada 5 minutos
-    },
-    "gerar-metricas": {
-        "task": "src.workers.tasks.gerar_metricas_sistema",
-        "schedule": 60.0,  # A cada minuto
-    }
-}
+celery_app.conf.beat_schedule = beat_schedule()
+
+# Signals de ciclo de vida dos workers
+@worker_process_init.connect
+def worker_process_init_handler(**kwargs):
+    """Processo filho (prefork) não reaproveita conexões do banco do processo pai"""
+    dispose_engine()
+
+@worker_process_shutdown.connect
+def worker_process_shutdown_handler(pid=None, **kwargs):
+    encerrar_processo_metricas(pid)
+
+def _pool_prefork(worker) -> bool:
+    """Tarefas rodam em processos filhos (-P prefork, o padrão)?"""
+    from celery.concurrency import get_implementation
+    from celery.concurrency.prefork import TaskPool
+    pool = get_implementation(getattr(worker, "pool_cls", None) or celery_app.conf.worker_pool)
+    return isinstance(pool, type) and issubclass(pool, TaskPool)
+
+@worker_init.connect
+def inicializar_subsistemas(sender=None, **kwargs):
+    """
+    O worker sobe uma vez e roda por muito tempo: inicializa já no processo
+    principal (antes do fork) o que a API deixa para o primeiro uso
+    
+    As métricas do worker (filas, tokens, tempo das tarefas) são expostas
+    em PROMETHEUS_PORT; o servidor sobe antes das métricas serem criadas
+    para que o modo multiprocesso valha para os processos filhos.
+    """
+    iniciar_servidor_metricas(settings.PROMETHEUS_PORT, multiprocesso=_pool_prefork(sender))
+    inicializar_recursos("sentry", "prometheus")
+    rastreamento.definir_servico("sinistros-worker")
+    from .tasks import agentes
+    agentes._carregar()
+
+@worker_init.connect
+def worker_init_handler(**kwargs):
+    """
+    Pool gevent (-P gevent): torna o driver do PostgreSQL cooperativo
+    
+    Sockets, requests e o cliente da OpenAI já ficam cooperativos com o
+    monkey patch que o Celery aplica; o psycopg2 precisa do psycogreen.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return
+    if not monkey.is_module_patched("socket"):
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        logger.info("psycopg2 em modo cooperativo (gevent)")
+    except ImportError:
+        logger.warning("psycogreen não instalado: consultas ao banco bloquearão o pool gevent")
 
 # Signals para monitoramento
+def _fila_da_tarefa(task) -> str:
+    return (task.request.delivery_info or {}).get("routing_key") or Fila.DEFAULT.value
+
+@before_task_publish.connect
+def before_task_publish_handler(sender=None, headers=None, **kwargs):
+    """Marca o instante de publicação e propaga o trace de quem publicou"""
+    if headers is None:
+        return
+    headers.setdefault(CABECALHO_ENFILEIRADO_EM, time.time())
+    if rastreamento.span_atual() is not None:
+        with rastreamento.iniciar_span(f"publicar {sender}", rastreamento.TIPO_PRODUTOR, {"celery.tarefa": sender}):
+            rastreamento.injetar(headers)
+
 @task_prerun.connect
 def task_prerun_handler(sender=None, task_id=None, task=None, **kwargs):
     """Log quando task inicia"""
     logger.info(f"Task iniciada: {task.name} [{task_id}]")
+    fila = _fila_da_tarefa(task)
+    
+    enfileirado_em = getattr(task.request, CABECALHO_ENFILEIRADO_EM, None)
+    if enfileirado_em:
+        metrics_collector.track_histogram("tempo_espera_fila", max(time.time() - float(enfileirado_em), 0), {
+            "fila": fila
+        })
+    
+    # Span raiz da tarefa (fechado no postrun); fica no request desta execução
+    task.request.cronometro = track_time("tempo_servico_tarefa", {"tarefa": task.name, "fila": fila}, nome=task.name)
+    task.request.cronometro.__enter__()
+    
+    # Continua o trace da mensagem (ou inicia um, para tarefas do beat)
+    task.request.span = rastreamento.iniciar_span(task.name, rastreamento.TIPO_CONSUMIDOR, {
+        "celery.tarefa": task.name,
+        "celery.task_id": task_id,
+        "celery.fila": fila,
+        "celery.tentativa": task.request.retries,
+    }, pai=rastreamento.extrair(getattr(task.request, rastreamento.CABECALHO_TRACEPARENT, None)))
+    task.request.span.__enter__()
 
 @task_postrun.connect
 def task_postrun_handler(sender=None, task_id=None, task=None, result=None, **kwargs):
     """Log quando task termina"""
     logger.info(f"Task concluída: {task.name} [{task_id}]")
+    span = getattr(task.request, "span", None)
+    if span is not None:
+        span.__exit__(None, None, None)
+        task.request.span = None
+    
+    cronometro = getattr(task.request, "cronometro", None)
+    if cronometro is None:
+        return
+    
+    cronometro.__exit__(None, None, None)
+    task.request.cronometro = None
+    duracao = cronometro.duracao_ns / 1e9
+    fila = cronometro.labels["fila"]
+    amostragem.registrar_execucao(task.name, duracao, erro=kwargs.get("state") == "FAILURE")
+    cliente = get_broker_redis()
+    if cliente is not None:
+        try:
+            registrar_tempo_servico(cliente, fila, duracao)
+        except Exception as e:
+            logger.warning(f"Falha ao registrar tempo de serviço da fila {fila}: {e}")
 
 @task_failure.connect
 def task_failure_handler(sender=None, task_id=None, exception=None, **kwargs):
     """Log quando task falha"""
     logger.error(f"Task falhou: {sender.name} [{task_id}] - {exception}")
+    span = getattr(sender.request, "span", None)
+    if span is not None:
+        span.registrar_erro(exception)
 
 if __name__ == "__main__":
     # Para executar: celery -A src.workers.celery_app worker --loglevel=info
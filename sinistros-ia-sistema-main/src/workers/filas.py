@@ -0,0 +1,127 @@
+"""
+Registro único de tarefas, filas e prioridades do Celery
+
+Nomes das tarefas, roteamento, agendamentos e níveis de prioridade do
+broker saem daqui; celery_app.py e tasks.py apenas consomem o registro.
+"""
+
+import random
+from enum import Enum
+from typing import Dict, Any, List, Optional
+
+from kombu import Exchange, Queue
+
+class Tarefa(str, Enum):
+    """Nomes com que as tarefas são registradas no Celery"""
+    PROCESSAR_SINISTRO = "processar_sinistro_async"
+    EXECUTAR_ETAPA = "executar_etapa_agente"
+    CONSOLIDAR_ANALISE = "consolidar_analise"
+    REGISTRAR_FALHA_ANALISE = "registrar_falha_analise"
+    ENVIAR_WEBHOOK = "enviar_webhook"
+    APLICAR_RETENCAO = "aplicar_retencao"
+    MANTER_PARTICOES = "manter_particoes"
+    REPROCESSAR_FALHOS = "reprocessar_sinistros_falhos"
+    GERAR_METRICAS = "gerar_metricas_sistema"
+    COLETAR_METRICAS_FILAS = "coletar_metricas_filas"
+
+class Fila(str, Enum):
+    """Filas do broker; cada uma pode ter um pool de workers dedicado"""
+    DEFAULT = "default"
+    ANALISE = "analise"  # orquestração e decisão do gerente
+    AGENTES = "agentes"  # agentes especializados (chamadas longas à OpenAI)
+    WEBHOOKS = "webhooks"  # I/O curto para sistemas externos
+    RELATORIOS = "relatorios"  # métricas e relatórios
+    MANUTENCAO = "manutencao"  # limpeza e reprocessamento agendados
+
+# Fila de cada tarefa
+ROTAS: Dict[Tarefa, Fila] = {
+    Tarefa.PROCESSAR_SINISTRO: Fila.ANALISE,
+    Tarefa.EXECUTAR_ETAPA: Fila.AGENTES,
+    Tarefa.CONSOLIDAR_ANALISE: Fila.ANALISE,
+    Tarefa.REGISTRAR_FALHA_ANALISE: Fila.ANALISE,
+    Tarefa.ENVIAR_WEBHOOK: Fila.WEBHOOKS,
+    Tarefa.GERAR_METRICAS: Fila.RELATORIOS,
+    Tarefa.COLETAR_METRICAS_FILAS: Fila.RELATORIOS,
+    Tarefa.APLICAR_RETENCAO: Fila.MANUTENCAO,
+    Tarefa.MANTER_PARTICOES: Fila.MANUTENCAO,
+    Tarefa.REPROCESSAR_FALHOS: Fila.MANUTENCAO,
+}
+
+# Tarefas periódicas (Celery beat): tarefa -> intervalo em segundos
+AGENDAMENTOS: Dict[Tarefa, float] = {
+    Tarefa.APLICAR_RETENCAO: 3600.0,  # A cada hora
+    Tarefa.MANTER_PARTICOES: 86400.0,  # Diário (partições de meses à frente)
+    Tarefa.REPROCESSAR_FALHOS: 15.0,  # Agendador de retries
+    Tarefa.GERAR_METRICAS: 60.0,  # A cada minuto
+    Tarefa.COLETAR_METRICAS_FILAS: 15.0,  # Sinal de autoscaling
+}
+
+# Concorrência de uma réplica de worker de cada fila (mesma do docker-compose)
+CONCORRENCIA_POR_FILA: Dict[Fila, int] = {
+    Fila.DEFAULT: 4,
+    Fila.ANALISE: 4,
+    Fila.AGENTES: 200,
+    Fila.WEBHOOKS: 100,
+    Fila.RELATORIOS: 2,
+    Fila.MANUTENCAO: 2,
+}
+
+# Prioridades no broker. No Redis 0 é a mais alta e cada nível listado
+# vira uma sub-fila consumida em ordem (queue_order_strategy=priority).
+NIVEIS_PRIORIDADE = list(range(10))
+PRIORIDADE_PADRAO = 5
+
+# Prioridade (1-10, 1 = mais urgente) por canal de entrada dos sinistros
+PRIORIDADE_POR_CANAL = {
+    "mobile": 3,
+    "web": 4,
+    "email": 5,
+    "legacy": 6,
+    "batch": 9,  # importações em massa nunca passam na frente de sinistros urgentes
+}
+
+def prioridade_broker(prioridade: Optional[int]) -> int:
+    """
+    Converte a prioridade da API (1-10, 1 = mais urgente, mesma escala de
+    FilaProcessamento.prioridade) para um nível existente no broker
+    """
+    if prioridade is None:
+        prioridade = PRIORIDADE_PADRAO
+    nivel = min(max(int(prioridade), 1), len(NIVEIS_PRIORIDADE)) - 1
+    return NIVEIS_PRIORIDADE[nivel]
+
+def prioridade_canal(canal: Optional[str]) -> int:
+    """Prioridade (escala da API) para sinistros recebidos pelo canal"""
+    return PRIORIDADE_POR_CANAL.get(canal or "", PRIORIDADE_PADRAO)
+
+def atraso_retry(tentativas: int, base: float, teto: float) -> float:
+    """
+    Atraso (segundos) até a próxima tentativa: exponencial com jitter
+    
+    Metade do atraso é fixa e metade aleatória, para que falhas em massa
+    (ex.: OpenAI fora do ar) não voltem todas no mesmo instante.
+    """
+    atraso = min(teto, base * 2 ** max(tentativas - 1, 0))
+    return atraso / 2 + random.uniform(0, atraso / 2)
+
+def task_queues() -> List[Queue]:
+    """Declaração das filas no broker"""
+    return [
+        Queue(fila.value, Exchange(fila.value, type="direct"), routing_key=fila.value,
+              queue_arguments={"x-max-priority": len(NIVEIS_PRIORIDADE)})
+        for fila in Fila
+    ]
+
+def task_routes() -> Dict[str, Dict[str, str]]:
+    """Roteamento tarefa -> fila no formato de task_routes"""
+    return {
+        tarefa.value: {"queue": fila.value, "routing_key": fila.value}
+        for tarefa, fila in ROTAS.items()
+    }
+
+def beat_schedule() -> Dict[str, Dict[str, Any]]:
+    """Agendamentos no formato de beat_schedule"""
+    return {
+        tarefa.value.replace("_", "-"): {"task": tarefa.value, "schedule": intervalo}
+        for tarefa, intervalo in AGENDAMENTOS.items()
+    }
@@ -2,164 +2,469 @@
 Tasks assíncronas do Celery
 """
 
-from celery import Task
+from celery import Task, chord, group
 from celery.exceptions import MaxRetriesExceededError
 import logging
 from datetime import datetime, timedelta
 import json
-import requests
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, List, Optional
 
 from .celery_app import celery_app
-from ..database.connection import get_db_session
+from .filas import Tarefa, prioridade_broker, atraso_retry
+from .capacidade import medir_filas
+from ..database.connection import get_db_session, get_db_leitura_session
+from ..database.retencao import aplicar_retencao as executar_retencao
+from ..database.particoes import criar_particoes
+from ..database.carregamento import com_perfil
 from ..database.models import Sinistro, Analise, FilaProcessamento, WebhookLog, HistoricoSinistro, StatusSinistro
-from ..agents.claims_agent_system import processar_sinistro as processar_sinistro_agentes
+from ..utils.preguicoso import importar_preguicoso
 from ..config.settings import get_settings
-from ..monitoring.metrics import track_metric, track_error
+from ..utils.http import get_http_session
+from ..utils.compactacao import limitar_tokens, normalizar_espacos
+from ..events.bus import publicar_evento, publicar_mudanca_status
+from ..monitoring.metrics import track_metric, track_error, metrics_collector
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Agentes (OpenAI/Swarm) só são importados quando uma etapa roda: a API
+# usa este módulo apenas para enfileirar e não paga por esse import
+agentes = importar_preguicoso("..agents.claims_agent_system", __package__)
+
+# Limite do texto das análises indexado na busca textual
+MAX_TOKENS_TEXTO_BUSCA = 2000
+
 class BaseTask(Task):
-    """Task base com retry automático"""
-    autoretry_for = (Exception,)
-    retry_kwargs = {"max_retries": 3}
-    retry_backoff = True
+    """
+    Task base sem retry do Celery
+    
+    Falhas de análise são registradas em FilaProcessamento e reagendadas
+    por reprocessar_sinistros_falhos, o único responsável por retries.
+    """
+    max_retries = 0
 
-@celery_app.task(bind=True, base=BaseTask, name="processar_sinistro_async")
-def processar_sinistro_async(self, sinistro_numero: str) -> Dict[str, Any]:
+def _custo_tokens(tokens: Dict[str, int]) -> float:
+    """Custo estimado (USD) de um consumo de tokens"""
+    return (
+        tokens.get("prompt_tokens", 0) / 1000 * settings.OPENAI_PRECO_PROMPT_POR_MIL
+        + tokens.get("completion_tokens", 0) / 1000 * settings.OPENAI_PRECO_COMPLETION_POR_MIL
+    )
+
+# Status percorridos durante a análise, na ordem em que podem avançar
+ORDEM_STATUS_ANALISE = [
+    StatusSinistro.RECEBIDO,
+    StatusSinistro.TRIAGEM,
+    StatusSinistro.EM_ANALISE,
+    StatusSinistro.EM_CALCULO,
+    StatusSinistro.EM_COMPLIANCE,
+]
+
+class AcompanhamentoEtapas:
     """
-    Processa sinistro de forma assíncrona usando os agentes
+    Callback que acompanha cada agente do pipeline: atualiza o status do
+    sinistro, grava uma Analise por agente, contabiliza tokens e publica o andamento
+    
+    Cada evento grava numa sessão curta própria: o acompanhamento vive
+    durante as chamadas ao LLM e não deve segurar uma conexão do pool.
     """
-    logger.info(f"Iniciando processamento assíncrono do sinistro {sinistro_numero}")
-    start_time = datetime.now()
     
-    try:
+    def __init__(self, sinistro: Sinistro):
+        self.sinistro_id = sinistro.id
+        self.numero_sinistro = sinistro.numero_sinistro
+        self.status = sinistro.status
+        self.canal = sinistro.canal_origem or "desconhecido"
+        self.uso_total = {"prompt_tokens": 0, "completion_tokens": 0, "chamadas": 0}
+    
+    def __call__(self, evento: Dict[str, Any]):
+        if evento["tipo"] == "etapa.iniciada" and evento.get("status"):
+            self._atualizar_status(StatusSinistro(evento["status"]))
+        elif evento["tipo"] == "etapa.concluida":
+            self._registrar_etapa(evento)
+        
+        # Publicar sem a saída completa do agente, que fica na Analise
+        publicar_evento(self.numero_sinistro, evento["tipo"], {
+            k: v for k, v in evento.items() if k not in ("tipo", "sinistro_numero", "saida")
+        })
+    
+    def _atualizar_status(self, novo_status: StatusSinistro):
+        # Etapas rodam em paralelo: o status só avança, nunca volta
+        anteriores = ORDEM_STATUS_ANALISE[:ORDEM_STATUS_ANALISE.index(novo_status)]
+        status_anterior = self.status
         with get_db_session() as db:
-            # Buscar sinistro
-            sinistro = db.query(Sinistro).filter_by(numero_sinistro=sinistro_numero).first()
-            if not sinistro:
-                raise ValueError(f"Sinistro {sinistro_numero} não encontrado")
-            
-            # Atualizar status
-            sinistro.status = StatusSinistro.EM_ANALISE
-            db.commit()
-            
-            # Registrar no histórico
-            historico = HistoricoSinistro(
-                sinistro_id=sinistro.id,
-                acao="analise_iniciada",
-                status_anterior=StatusSinistro.TRIAGEM.value,
-                status_novo=StatusSinistro.EM_ANALISE.value,
-                usuario="sistema",
-                descricao="Análise automática iniciada pelos agentes"
-            )
-            db.add(historico)
-            
-            # Preparar dados para os agentes
-            sinistro_data = {
-                "numero_sinistro": sinistro.numero_sinistro,
-                "tipo": sinistro.tipo.value if sinistro.tipo else None,
-                "data_ocorrencia": sinistro.data_ocorrencia.isoformat(),
-                "segurado": {
-                    "nome": sinistro.segurado_nome,
-                    "documento": sinistro.segurado_documento,
-                    "telefone": sinistro.segurado_telefone,
-                    "email": sinistro.segurado_email
-                },
-                "apolice": {
-                    "numero": sinistro.apolice_numero,
-                    "produto": sinistro.apolice_produto
+            atualizados = db.query(Sinistro).filter(
+                Sinistro.id == self.sinistro_id,
+                Sinistro.status.in_(anteriores)
+            ).update({Sinistro.status: novo_status}, synchronize_session=False)
+        if atualizados:
+            self.status = novo_status
+            publicar_mudanca_status(self.numero_sinistro, status_anterior.value, novo_status.value)
+    
+    def _registrar_etapa(self, evento: Dict[str, Any]):
+        tokens = evento["tokens"]
+        for chave in self.uso_total:
+            self.uso_total[chave] += tokens.get(chave, 0)
+        
+        data_fim = datetime.fromisoformat(evento["fim"])
+        with get_db_session() as db:
+            db.add(Analise(
+                sinistro_id=self.sinistro_id,
+                agente=evento["agente"],
+                tipo_analise=evento["etapa"],
+                data_inicio=data_fim - timedelta(milliseconds=evento["duracao_ms"]),
+                data_fim=data_fim,
+                duracao_segundos=evento["duracao_ms"] // 1000,
+                resultado={
+                    "saida": evento["saida"],
+                    "duracao_ms": evento["duracao_ms"],
+                    "tokens": tokens
                 },
-                "descricao": sinistro.descricao,
-                "valor_estimado": sinistro.valor_estimado,
-                "documentos": [doc.nome for doc in sinistro.documentos],
-                "metadata": sinistro.metadata or {}
-            }
-            
-            # Processar com os agentes
-            logger.info(f"Enviando sinistro {sinistro_numero} para análise dos agentes")
-            resultado = processar_sinistro_agentes(sinistro_data)
-            
-            # Salvar análise
-            duracao = (datetime.now() - start_time).total_seconds()
-            analise = Analise(
-                sinistro_id=sinistro.id,
-                agente=resultado.get("agent_usado", "GerenteSinistros"),
-                tipo_analise="completa",
-                data_fim=datetime.now(),
-                duracao_segundos=int(duracao),
-                resultado=resultado,
-                decisao=resultado.get("decisao", "pendente"),
-                confianca=resultado.get("confianca", 0.8),
-                justificativas=resultado.get("justificativas", []),
-                alertas=resultado.get("alertas", []),
-                sucesso=True
-            )
-            db.add(analise)
-            
-            # Atualizar status do sinistro baseado na decisão
-            if "aprovado" in resultado.get("mensagem", "").lower():
-                sinistro.status = StatusSinistro.APROVADO
-                sinistro.valor_aprovado = resultado.get("valor_aprovado", sinistro.valor_estimado)
-            elif "negado" in resultado.get("mensagem", "").lower():
-                sinistro.status = StatusSinistro.NEGADO
-            else:
-                sinistro.status = StatusSinistro.DOCUMENTACAO_PENDENTE
-            
-            # Atualizar fila
-            fila = db.query(FilaProcessamento).filter_by(
-                sinistro_numero=sinistro_numero,
-                task_id=self.request.id
-            ).first()
-            if fila:
-                fila.status = "concluido"
-                fila.data_fim_processamento = datetime.now()
-            
-            db.commit()
-            
-            # Enviar webhook
-            enviar_webhook.delay(
-                sinistro_numero=sinistro_numero,
-                evento="analise.concluida",
-                dados=resultado
-            )
-            
-            # Métricas
-            track_metric("sinistro_processado", 1, {
-                "status": sinistro.status.value,
-                "duracao": duracao,
-                "agente": resultado.get("agent_usado")
+                sucesso=evento["sucesso"],
+                erro_mensagem=evento["erro"],
+                hash_entrada=evento["hash_entrada"],
+                tokens_prompt=tokens.get("prompt_tokens", 0),
+                tokens_completion=tokens.get("completion_tokens", 0),
+                custo_estimado=_custo_tokens(tokens)
+            ))
+        
+        for tipo in ("prompt", "completion"):
+            metrics_collector.track_counter("tokens_consumidos", tokens.get(f"{tipo}_tokens", 0), {
+                "agente": evento["agente"],
+                "canal": self.canal,
+                "tipo": tipo
             })
-            
-            logger.info(f"Sinistro {sinistro_numero} processado com sucesso em {duracao:.2f}s")
-            return resultado
-            
+        metrics_collector.track_counter("custo_llm", _custo_tokens(tokens), {
+            "agente": evento["agente"],
+            "canal": self.canal
+        })
+
+def _resultado_anterior(db, sinistro: Sinistro, nome_etapa: str) -> Optional[Dict[str, Any]]:
+    """
+    Última saída bem-sucedida da etapa, com o hash de entrada usado
+    
+    Lê só o hash e a saída (extraída do JSON no banco) da linha mais
+    recente, sem carregar as demais análises do sinistro.
+    """
+    anterior = db.query(
+        Analise.hash_entrada,
+        Analise.resultado["saida"].as_string().label("saida")
+    ).filter(
+        Analise.sinistro_id == sinistro.id,
+        Analise.tipo_analise == nome_etapa,
+        Analise.sucesso == True,
+        Analise.hash_entrada.isnot(None)
+    ).order_by(Analise.data_fim.desc(), Analise.id.desc()).first()
+    
+    if anterior is None:
+        return None
+    return {"hash_entrada": anterior.hash_entrada, "saida": anterior.saida}
+
+def _dados_sinistro(sinistro: Sinistro) -> Dict[str, Any]:
+    """Dados do sinistro no formato esperado pelos agentes"""
+    return {
+        "numero_sinistro": sinistro.numero_sinistro,
+        "tipo": sinistro.tipo.value if sinistro.tipo else None,
+        "data_ocorrencia": sinistro.data_ocorrencia.isoformat(),
+        "data_aviso": sinistro.data_aviso.isoformat() if sinistro.data_aviso else None,
+        "segurado": {
+            "nome": sinistro.segurado_nome,
+            "documento": sinistro.segurado_documento,
+            "telefone": sinistro.segurado_telefone,
+            "email": sinistro.segurado_email
+        },
+        "apolice": {
+            "numero": sinistro.apolice_numero,
+            "produto": sinistro.apolice_produto
+        },
+        "descricao": sinistro.descricao,
+        "valor_estimado": sinistro.valor_estimado,
+        "documentos": [doc.nome for doc in sinistro.documentos],
+        "metadata": sinistro.metadados or {}
+    }
+
+def _buscar_sinistro(db, sinistro_numero: str, perfil: Optional[str] = None) -> Sinistro:
+    consulta = db.query(Sinistro).filter_by(numero_sinistro=sinistro_numero)
+    if perfil:
+        consulta = com_perfil(consulta, perfil)
+    sinistro = consulta.first()
+    if not sinistro:
+        raise ValueError(f"Sinistro {sinistro_numero} não encontrado")
+    return sinistro
+
+def _orcamento_etapa() -> Optional[int]:
+    """Orçamento de tokens de cada agente: uma fatia igual do orçamento do sinistro"""
+    if not settings.MAX_TOKENS_POR_SINISTRO:
+        return None
+    return settings.MAX_TOKENS_POR_SINISTRO // (len(agentes.ETAPAS) + 1)
+
+def enfileirar_analise(db, sinistro_numero: str, prioridade: Optional[int] = None, completo: bool = False):
+    """
+    Registra a análise em FilaProcessamento e publica a tarefa
+    
+    O registro é gravado antes da publicação, com o mesmo task_id, para
+    que o worker sempre o encontre. prioridade usa a escala da API (1-10).
+    """
+    fila = FilaProcessamento(
+        sinistro_numero=sinistro_numero,
+        status="aguardando",
+        prioridade=prioridade if prioridade is not None else 5,
+        task_id=str(uuid.uuid4())
+    )
+    db.add(fila)
+    db.commit()
+    
+    return processar_sinistro_async.apply_async(
+        args=[sinistro_numero],
+        kwargs={"completo": completo},
+        task_id=fila.task_id,
+        priority=prioridade_broker(fila.prioridade)
+    )
+
+def _preparar_analise(sinistro_numero: str, task_id: str):
+    """Marca o sinistro como em análise e a fila como em processamento"""
+    with get_db_session() as db:
+        sinistro = _buscar_sinistro(db, sinistro_numero)
+        
+        # Atualizar status
+        sinistro.status = StatusSinistro.EM_ANALISE
+        
+        fila = db.query(FilaProcessamento).filter_by(task_id=task_id).first()
+        if fila:
+            fila.status = "processando"
+            fila.data_inicio_processamento = datetime.now()
+        
+        # Registrar no histórico
+        historico = HistoricoSinistro(
+            sinistro_id=sinistro.id,
+            acao="analise_iniciada",
+            status_anterior=StatusSinistro.TRIAGEM.value,
+            status_novo=StatusSinistro.EM_ANALISE.value,
+            usuario="sistema",
+            descricao="Análise automática iniciada pelos agentes"
+        )
+        db.add(historico)
+        db.commit()
+
+@celery_app.task(bind=True, base=BaseTask, name=Tarefa.PROCESSAR_SINISTRO.value)
+def processar_sinistro_async(self, sinistro_numero: str, completo: bool = False) -> Dict[str, Any]:
+    """
+    Inicia a análise do sinistro pelos agentes
+    
+    A análise é um chord: os quatro agentes especializados rodam em
+    paralelo na fila de agentes (cada um persistindo sua Analise) e o
+    gerente consolida as saídas ao final. Por padrão cada etapa
+    reaproveita a saída anterior se suas entradas não mudaram, então o
+    retry de uma análise que falhou só reexecuta as etapas que falharam;
+    completo=True reexecuta todos os agentes.
+    """
+    logger.info(f"Iniciando processamento assíncrono do sinistro {sinistro_numero}")
+    
+    try:
+        _preparar_analise(sinistro_numero, self.request.id)
     except Exception as e:
-        logger.error(f"Erro ao processar sinistro {sinistro_numero}: {str(e)}")
-        track_error("erro_processamento_sinistro", e, {"sinistro": sinistro_numero})
+        _registrar_falha(sinistro_numero, self.request.id, e)
+        raise
+    
+    publicar_mudanca_status(sinistro_numero, StatusSinistro.TRIAGEM.value, StatusSinistro.EM_ANALISE.value)
+    
+    # Agentes em paralelo → gerente; falha definitiva de qualquer etapa cai no errback
+    logger.info(f"Enviando sinistro {sinistro_numero} para análise dos agentes")
+    prioridade = (self.request.delivery_info or {}).get("priority")
+    pipeline = chord(
+        group(
+            executar_etapa_agente.s(sinistro_numero, etapa["nome"], completo).set(priority=prioridade)
+            for etapa in agentes.ETAPAS
+        ),
+        consolidar_analise.s(sinistro_numero, self.request.id).on_error(
+            registrar_falha_analise.s(sinistro_numero, self.request.id)
+        )
+    )
+    resultado = pipeline.apply_async()
+    
+    return {"sinistro_numero": sinistro_numero, "analise_id": resultado.id}
+
+@celery_app.task(bind=True, base=BaseTask, name=Tarefa.EXECUTAR_ETAPA.value)
+def executar_etapa_agente(self, sinistro_numero: str, nome_etapa: str, completo: bool = False) -> Dict[str, Any]:
+    """
+    Executa um agente especializado e grava sua Analise
+    
+    A Analise gravada é reaproveitada pelo retry da análise, que assim
+    reexecuta apenas as etapas que falharam.
+    """
+    with get_db_session() as db:
+        sinistro = _buscar_sinistro(db, sinistro_numero, "analise_agentes")
+        dados = _dados_sinistro(sinistro)
+        anterior = None if completo else _resultado_anterior(db, sinistro, nome_etapa)
+        acompanhamento = AcompanhamentoEtapas(sinistro)
+    
+    # Conexão devolvida ao pool antes do LLM: com -P gevent centenas de
+    # etapas aguardam a OpenAI ao mesmo tempo
+    return agentes.executar_etapa(
+        nome_etapa,
+        dados,
+        on_evento=acompanhamento,
+        resultado_anterior=anterior,
+        orcamento_tokens=_orcamento_etapa()
+    )
+
+@celery_app.task(bind=True, base=BaseTask, name=Tarefa.CONSOLIDAR_ANALISE.value)
+def consolidar_analise(self, resultados_etapas: List[Dict[str, Any]], sinistro_numero: str,
+                       task_id_origem: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Callback do chord: o gerente consolida as etapas e o sinistro recebe a decisão
+    
+    As etapas chegam prontas em resultados_etapas; se o gerente falhar,
+    o retry da análise reaproveita todas elas e reexecuta só o gerente.
+    """
+    start_time = datetime.now()
+    
+    with get_db_session() as db:
+        sinistro = _buscar_sinistro(db, sinistro_numero, "analise_agentes")
+        dados = _dados_sinistro(sinistro)
+        acompanhamento = AcompanhamentoEtapas(sinistro)
+    
+    # O gerente fica com o que sobrou do orçamento do sinistro
+    orcamento = None
+    if settings.MAX_TOKENS_POR_SINISTRO:
+        consumido = sum(
+            etapa["tokens"].get("prompt_tokens", 0) + etapa["tokens"].get("completion_tokens", 0)
+            for etapa in resultados_etapas
+        )
+        orcamento = max(settings.MAX_TOKENS_POR_SINISTRO - consumido, 1)
+    
+    # Sem sessão aberta durante o LLM, como nas etapas
+    resultado = agentes.consolidar_decisao(
+        dados,
+        resultados_etapas,
+        on_evento=acompanhamento,
+        orcamento_tokens=orcamento
+    )
+    
+    # Consumo do sinistro (inclui etapas interrompidas pelo orçamento)
+    uso = resultado["tokens"]
+    metrics_collector.track_histogram(
+        "tokens_por_sinistro",
+        uso["prompt_tokens"] + uso["completion_tokens"],
+        {"canal": acompanhamento.canal}
+    )
+    if resultado.get("parcial"):
+        logger.warning(f"Sinistro {sinistro_numero} interrompido por orçamento de tokens: {uso}")
+        track_metric("orcamento_tokens_excedido", 1, {"canal": acompanhamento.canal})
+    
+    with get_db_session() as db:
+        sinistro = _buscar_sinistro(db, sinistro_numero)
         
-        # Atualizar fila com erro
-        with get_db_session() as db:
-            fila = db.query(FilaProcessamento).filter_by(
-                sinistro_numero=sinistro_numero,
-                task_id=self.request.id
-            ).first()
-            if fila:
-                fila.status = "erro"
-                fila.erro_mensagem = str(e)
-                fila.tentativas += 1
-                
-                if fila.tentativas < fila.max_tentativas:
-                    fila.proxima_tentativa = datetime.now() + timedelta(minutes=5 * fila.tentativas)
-                    fila.status = "aguardando"
-                
-            db.commit()
+        # Salvar análise
+        duracao = sum(etapa.get("duracao_ms", 0) for etapa in resultado["etapas"]) / 1000
+        analise = Analise(
+            sinistro_id=sinistro.id,
+            agente=resultado.get("agent_usado", "GerenteSinistros"),
+            tipo_analise="completa",
+            data_inicio=start_time,
+            data_fim=datetime.now(),
+            duracao_segundos=int(duracao),
+            resultado=resultado,
+            decisao=resultado.get("decisao", "pendente"),
+            confianca=resultado.get("confianca", 0.8),
+            justificativas=resultado.get("justificativas", []),
+            alertas=resultado.get("alertas", []),
+            sucesso=True,
+            tokens_prompt=uso["prompt_tokens"],
+            tokens_completion=uso["completion_tokens"],
+            custo_estimado=_custo_tokens(uso)
+        )
+        db.add(analise)
+        
+        # Texto indexado para busca: decisão e saída de cada agente (sem as
+        # regras de boilerplate de email, que cortariam citações e markdown)
+        sinistro.texto_analises = limitar_tokens(normalizar_espacos(
+            "\n\n".join([resultado.get("mensagem") or ""] + [etapa.get("saida") or "" for etapa in resultados_etapas])
+        ), MAX_TOKENS_TEXTO_BUSCA)
         
-        # Retry automático do Celery
-        raise self.retry(exc=e, countdown=300)  # Retry em 5 minutos
+        # Atualizar status do sinistro baseado na decisão
+        status_anterior = sinistro.status.value
+        if "aprovado" in resultado.get("mensagem", "").lower():
+            sinistro.status = StatusSinistro.APROVADO
+            sinistro.valor_aprovado = resultado.get("valor_aprovado", sinistro.valor_estimado)
+        elif "negado" in resultado.get("mensagem", "").lower():
+            sinistro.status = StatusSinistro.NEGADO
+        else:
+            sinistro.status = StatusSinistro.DOCUMENTACAO_PENDENTE
+        
+        # Atualizar fila
+        fila = db.query(FilaProcessamento).filter_by(
+            sinistro_numero=sinistro_numero,
+            task_id=task_id_origem
+        ).first()
+        if fila:
+            fila.status = "concluido"
+            fila.data_fim_processamento = datetime.now()
+        
+        db.commit()
+        publicar_mudanca_status(sinistro_numero, status_anterior, sinistro.status.value, {
+            "decisao": analise.decisao,
+            "valor_aprovado": sinistro.valor_aprovado
+        })
+        
+        # Enviar webhook
+        enviar_webhook.delay(
+            sinistro_numero=sinistro_numero,
+            evento="analise.concluida",
+            dados=resultado
+        )
+        
+        # Métricas
+        track_metric("sinistros_processados", 1, {
+            "status": sinistro.status.value,
+            "agente": resultado.get("agent_usado")
+        })
+        metrics_collector.track_histogram("tempo_processamento", duracao, {
+            "tipo": sinistro.tipo.value if sinistro.tipo else "indefinido"
+        })
+        
+        logger.info(f"Sinistro {sinistro_numero} processado com sucesso em {duracao:.2f}s de agentes")
+        return resultado
+
+def _registrar_falha(sinistro_numero: str, task_id: Optional[str], exc: Exception):
+    """
+    Registra a falha da análise e agenda a próxima tentativa
+    
+    O atraso cresce exponencialmente com jitter; esgotadas as tentativas
+    a fila fica em erro.
+    """
+    logger.error(f"Erro ao processar sinistro {sinistro_numero} (task {task_id}): {str(exc)}")
+    track_error("erro_processamento_sinistro", exc, {"sinistro": sinistro_numero})
+    publicar_evento(sinistro_numero, "analise.erro", {"erro": str(exc)})
+    
+    with get_db_session() as db:
+        fila = db.query(FilaProcessamento).filter_by(
+            sinistro_numero=sinistro_numero,
+            task_id=task_id
+        ).first()
+        if fila:
+            fila.status = "erro"
+            fila.erro_mensagem = str(exc)
+            fila.tentativas += 1
+            
+            if fila.tentativas < fila.max_tentativas:
+                atraso = atraso_retry(fila.tentativas, settings.RETRY_BASE_SEGUNDOS, settings.RETRY_TETO_SEGUNDOS)
+                fila.proxima_tentativa = datetime.now() + timedelta(seconds=atraso)
+                fila.status = "aguardando"
+            
+        db.commit()
+
+@celery_app.task(name=Tarefa.REGISTRAR_FALHA_ANALISE.value)
+def registrar_falha_analise(request, exc, traceback, sinistro_numero: str,
+                            task_id_origem: Optional[str] = None):
+    """
+    Errback do chord: uma etapa ou o gerente falhou
+    
+    Agenda o retry da análise; as etapas que já concluíram serão
+    reaproveitadas pelo hash de entrada na próxima tentativa.
+    """
+    _registrar_falha(sinistro_numero, task_id_origem, exc)
 
-@celery_app.task(name="enviar_webhook")
+@celery_app.task(name=Tarefa.ENVIAR_WEBHOOK.value)
 def enviar_webhook(sinistro_numero: str, evento: str, dados: Dict[str, Any]) -> bool:
     """
     Envia webhook para sistemas externos
@@ -206,7 +511,7 @@ def enviar_webhook(sinistro_numero: str, evento: str, dados: Dict[str, Any]) ->
         
         for url in webhook_urls:
             try:
-                response = requests.post(
+                response = get_http_session("webhooks").post(
                     url,
                     json=payload,
                     headers=headers,
@@ -243,65 +548,93 @@ def enviar_webhook(sinistro_numero: str, evento: str, dados: Dict[str, Any]) ->
         db.commit()
         return True
 
-@celery_app.task(name="limpar_filas_antigas")
-def limpar_filas_antigas() -> int:
-    """
-    Limpa registros antigos da fila de processamento
+@celery_app.task(name=Tarefa.APLICAR_RETENCAO.value)
+def aplicar_retencao() -> Dict[str, Dict[str, int]]:
     """
-    logger.info("Limpando filas antigas")
+    Aplica as políticas de retenção (fila, webhooks e histórico)
     
+    Registros vencidos são apagados ou arquivados em lotes; ver
+    database/retencao.py.
+    """
+    logger.info("Aplicando políticas de retenção")
+    resultados = executar_retencao()
+    logger.info(f"Retenção concluída: {resultados}")
+    return resultados
+
+@celery_app.task(name=Tarefa.MANTER_PARTICOES.value)
+def manter_particoes() -> List[str]:
+    """Garante as partições mensais do mês corrente e dos próximos meses"""
     with get_db_session() as db:
-        # Remover registros concluídos há mais de 7 dias
-        limite = datetime.now() - timedelta(days=7)
-        
-        deletados = db.query(FilaProcessamento).filter(
-            FilaProcessamento.status.in_(["concluido", "erro"]),
-            FilaProcessamento.data_fim_processamento < limite
-        ).delete()
-        
+        particoes = criar_particoes(db.connection())
         db.commit()
-        
-        logger.info(f"Removidos {deletados} registros antigos da fila")
-        return deletados
+    return particoes
+
+def _reivindicar_retries(db, limite: datetime) -> List[FilaProcessamento]:
+    """
+    Reivindica um lote de retries vencendo até limite
+    
+    FOR UPDATE SKIP LOCKED: execuções concorrentes do agendador (vários
+    beats ou uma execução atrasada) nunca pegam a mesma linha.
+    """
+    filas = db.query(FilaProcessamento).filter(
+        FilaProcessamento.status == "aguardando",
+        FilaProcessamento.proxima_tentativa <= limite,
+        FilaProcessamento.tentativas < FilaProcessamento.max_tentativas
+    ).order_by(
+        FilaProcessamento.proxima_tentativa
+    ).limit(settings.RETRY_LOTE).with_for_update(skip_locked=True).all()
+    
+    for fila in filas:
+        fila.status = "agendado"
+        fila.task_id = str(uuid.uuid4())
+    db.commit()
+    return filas
 
-@celery_app.task(name="reprocessar_sinistros_falhos")
+@celery_app.task(name=Tarefa.REPROCESSAR_FALHOS.value)
 def reprocessar_sinistros_falhos() -> int:
     """
-    Reprocessa sinistros que falharam e estão aguardando retry
+    Agendador de retries das análises
+    
+    Reivindica em lotes as tentativas que vencem dentro da janela e as
+    publica com ETA (countdown) no horário agendado. Cada lote é uma transação curta,
+    confirmada antes da publicação.
     """
-    logger.info("Verificando sinistros para reprocessamento")
+    limite = datetime.now() + timedelta(seconds=settings.RETRY_JANELA_SEGUNDOS)
+    reprocessados = 0
     
-    with get_db_session() as db:
-        # Buscar sinistros aguardando retry
-        sinistros_retry = db.query(FilaProcessamento).filter(
-            FilaProcessamento.status == "aguardando",
-            FilaProcessamento.proxima_tentativa <= datetime.now(),
-            FilaProcessamento.tentativas < FilaProcessamento.max_tentativas
-        ).all()
-        
-        reprocessados = 0
-        for fila in sinistros_retry:
-            logger.info(f"Reprocessando sinistro {fila.sinistro_numero} (tentativa {fila.tentativas + 1})")
-            
-            # Criar nova task
-            task = processar_sinistro_async.delay(fila.sinistro_numero)
-            fila.task_id = task.id
-            fila.status = "processando"
-            fila.data_inicio_processamento = datetime.now()
+    while True:
+        with get_db_session() as db:
+            filas = _reivindicar_retries(db, limite)
             
-            reprocessados += 1
-        
-        db.commit()
+            for fila in filas:
+                logger.info(f"Reprocessando sinistro {fila.sinistro_numero} (tentativa {fila.tentativas + 1})")
+                try:
+                    processar_sinistro_async.apply_async(
+                        args=[fila.sinistro_numero],
+                        task_id=fila.task_id,
+                        countdown=max((fila.proxima_tentativa - datetime.now()).total_seconds(), 0),
+                        priority=prioridade_broker(fila.prioridade)
+                    )
+                    reprocessados += 1
+                except Exception as e:
+                    # Devolver à fila; a próxima execução tenta de novo
+                    logger.error(f"Falha ao publicar retry do sinistro {fila.sinistro_numero}: {e}")
+                    fila.status = "aguardando"
+            db.commit()
         
+        if len(filas) < settings.RETRY_LOTE:
+            break
+    
+    if reprocessados:
         logger.info(f"Reprocessados {reprocessados} sinistros")
-        return reprocessados
+    return reprocessados
 
-@celery_app.task(name="gerar_metricas_sistema")
+@celery_app.task(name=Tarefa.GERAR_METRICAS.value)
 def gerar_metricas_sistema() -> Dict[str, Any]:
     """
     Gera métricas do sistema para monitoramento
     """
-    with get_db_session() as db:
+    with get_db_leitura_session() as db:
         # Contar sinistros por status
         from sqlalchemy import func
         status_count = db.query(
@@ -342,3 +675,29 @@ def gerar_metricas_sistema() -> Dict[str, Any]:
         track_metric("metricas_sistema", metricas)
         
         return metricas
+
+@celery_app.task(name=Tarefa.COLETAR_METRICAS_FILAS.value)
+def coletar_metricas_filas() -> Dict[str, Any]:
+    """
+    Publica profundidade e idade das filas do broker e as réplicas de
+    worker desejadas por fila (sinal para o orquestrador escalar)
+    """
+    medicoes = medir_filas()
+    for fila, medicao in medicoes.items():
+        labels = {"fila": fila}
+        metrics_collector.track_gauge("fila_broker_profundidade", medicao["profundidade"], labels)
+        metrics_collector.track_gauge("fila_broker_idade", medicao["idade_mais_antiga_segundos"], labels)
+        metrics_collector.track_gauge("replicas_desejadas", medicao["replicas_desejadas"], labels)
+    
+    with get_db_session() as db:
+        from sqlalchemy import func
+        aguardando = db.query(func.count(FilaProcessamento.id)).filter(
+            FilaProcessamento.status == "aguardando"
+        ).scalar() or 0
+        em_analise = db.query(func.count(Sinistro.id)).filter(
+            Sinistro.status.in_(ORDEM_STATUS_ANALISE[1:])
+        ).scalar() or 0
+    
+    metrics_collector.track_gauge("fila_tamanho", aguardando)
+    metrics_collector.track_gauge("sinistros_em_analise", em_analise)
+    return medicoes
@@ -8,12 +8,14 @@ mkdir -p logs uploads
 # Inicializar banco de dados
 echo "Inicializando banco de dados..."
 python -m src.database.connection init_db
+echo "Aplicando migrações..."
+alembic upgrade head
 
 # Detectar qual serviço iniciar baseado na variável RAILWAY_SERVICE_NAME
 case "$RAILWAY_SERVICE_NAME" in
   "worker")
     echo "Iniciando Celery Worker..."
-    exec celery -A src.workers.celery_app worker --loglevel=info -Q default,analise,webhooks
+    exec celery -A src.workers.celery_app worker --loglevel=info -Q ${CELERY_QUEUES:-analise,agentes,default,webhooks,relatorios,manutencao} -P ${CELERY_POOL:-prefork} ${CELERY_CONCURRENCY:+-c $CELERY_CONCURRENCY}
     ;;
   "beat")
     echo "Iniciando Celery Beat..."
@@ -0,0 +1,7 @@
+"""Configuração comum dos testes"""
+
+import os
+
+# Settings exige a chave da OpenAI; os testes nunca chamam a API
+os.environ.setdefault("OPENAI_API_KEY", "sk-teste")
+os.environ.setdefault("ENVIRONMENT", "test")
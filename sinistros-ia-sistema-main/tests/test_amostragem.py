@@ -0,0 +1,123 @@
+"""Testes da política de amostragem do Sentry"""
+
+import os
+import threading
+
+import pytest
+
+from src.monitoring import amostragem
+from src.utils.preguicoso import Recurso
+
+
+class _RedisFalso:
+    def __init__(self):
+        self.dados = {}
+        self.leituras = 0
+
+    def get(self, chave):
+        self.leituras += 1
+        return self.dados.get(chave)
+
+    def set(self, chave, valor):
+        self.dados[chave] = valor
+
+
+@pytest.fixture(autouse=True)
+def taxas_isoladas(monkeypatch):
+    monkeypatch.setattr(amostragem, "taxas", {
+        "traces": 0.05,
+        "profiles": 0.1,
+        "limiar_lento_ms": 2000,
+        "janela_reforco_segundos": 300,
+        "rotas": {"/health": 0.0, "/api/v1/sinistros/{numero_sinistro}/analisar": 0.5},
+    })
+    monkeypatch.setattr(amostragem, "_reforcadas", {})
+    redis = _RedisFalso()
+    monkeypatch.setattr(amostragem, "_redis", Recurso("redis_teste", lambda: redis))
+    # Sincronização já "iniciada": nenhuma thread sobe durante os testes
+    monkeypatch.setattr(amostragem, "_pid_sincronizacao", os.getpid())
+    return redis
+
+
+def _requisicao(caminho):
+    return {"asgi_scope": {"type": "http", "path": caminho}, "transaction_context": {"name": caminho}}
+
+
+def test_taxa_base_e_por_rota():
+    """Rotas configuradas (por template) usam a própria taxa; o resto, a base"""
+    assert amostragem.traces_sampler(_requisicao("/api/v1/sinistros")) == 0.05
+    assert amostragem.traces_sampler(_requisicao("/health")) == 0.0
+    assert amostragem.traces_sampler(_requisicao("/api/v1/sinistros/SIN-2024-000000001/analisar")) == 0.5
+
+
+def test_decisao_do_pai_prevalece():
+    """Trace distribuído segue a decisão de quem o iniciou"""
+    contexto = {**_requisicao("/health"), "parent_sampled": True}
+    assert amostragem.traces_sampler(contexto) == 1.0
+    contexto = {"celery_job": {"task": "processar_sinistro_async"}, "parent_sampled": False}
+    assert amostragem.traces_sampler(contexto) == 0.0
+
+
+def test_lentidao_e_erro_reforcam_a_rota():
+    """Rota lenta ou com erro passa a 100% durante a janela; rápida não muda"""
+    amostragem.registrar_execucao("/api/v1/sinistros", 0.1)
+    assert amostragem.traces_sampler(_requisicao("/api/v1/sinistros")) == 0.05
+
+    amostragem.registrar_execucao("/api/v1/sinistros/{numero_sinistro}", 3.5)
+    assert amostragem.traces_sampler(_requisicao("/api/v1/sinistros/SIN-1")) == 1.0
+
+    amostragem.registrar_execucao("processar_sinistro_async", 0.2, erro=True)
+    assert amostragem.traces_sampler({"celery_job": {"task": "processar_sinistro_async"}}) == 1.0
+
+    amostragem.taxas["janela_reforco_segundos"] = 0
+    amostragem.registrar_execucao("/api/v1/busca/sinistros", 9.0)
+    assert amostragem.traces_sampler(_requisicao("/api/v1/busca/sinistros")) == 0.05
+    assert "/api/v1/busca/sinistros" not in amostragem.estado_amostragem()["reforcadas"]
+
+
+def test_atualizar_taxas_em_execucao():
+    """Taxas trocadas em execução valem para as próximas transações; inválidas são recusadas"""
+    estado = amostragem.atualizar_taxas(traces=0.2, rotas={"/api/v1/sinistros": 1.0})
+    assert estado["traces"] == 0.2
+    assert amostragem.traces_sampler(_requisicao("/api/v1/sinistros")) == 1.0
+    assert amostragem.traces_sampler(_requisicao("/api/v1/outro")) == 0.2
+
+    with pytest.raises(ValueError):
+        amostragem.atualizar_taxas(profiles=1.5)
+    assert amostragem.profiles_sampler({}) == 0.1
+
+
+def test_alteracao_vale_para_todos_os_processos(taxas_isoladas, monkeypatch):
+    """Outro processo (taxas ainda das settings) passa a usar as taxas gravadas no Redis"""
+    amostragem.atualizar_taxas(traces=0.3)
+
+    monkeypatch.setattr(amostragem, "taxas", amostragem._taxas_das_settings())
+    assert amostragem.sincronizar_taxas()
+    assert amostragem.traces_sampler(_requisicao("/api/v1/outro")) == 0.3
+    assert amostragem.taxas["profiles"] == amostragem.settings.SENTRY_TAXA_PROFILES
+
+    amostragem.restaurar_taxas()
+    assert amostragem.sincronizar_taxas()
+    assert amostragem.taxas["traces"] == amostragem.settings.SENTRY_TAXA_TRACES
+
+
+def test_sem_redis_alteracao_recusada(monkeypatch):
+    """Sem Redis a alteração não é aplicada só neste processo: é recusada"""
+    monkeypatch.setattr(amostragem, "_redis", Recurso("redis_teste", lambda: None))
+    with pytest.raises(RuntimeError):
+        amostragem.atualizar_taxas(traces=0.3)
+    assert amostragem.taxas["traces"] == 0.05
+
+
+def test_sampler_nao_consulta_o_redis(taxas_isoladas, monkeypatch):
+    """A releitura roda numa thread do processo; o sampler só lê a memória"""
+    iniciada = threading.Event()
+    monkeypatch.setattr(amostragem, "_sincronizar_periodicamente", iniciada.set)
+    monkeypatch.setattr(amostragem, "_pid_sincronizacao", None)
+
+    for _ in range(3):
+        amostragem.traces_sampler(_requisicao("/api/v1/sinistros"))
+
+    assert iniciada.wait(1)
+    assert amostragem._pid_sincronizacao == os.getpid()
+    assert taxas_isoladas.leituras == 0
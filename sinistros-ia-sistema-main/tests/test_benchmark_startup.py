@@ -0,0 +1,29 @@
+"""Testes do benchmark de inicialização"""
+
+from benchmarks.startup import comparar, parse_importtime
+
+
+def test_parse_importtime():
+    """Lê tempo próprio e acumulado de cada módulo da saída de -X importtime"""
+    saida = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+    )
+    assert parse_importtime(saida) == {
+        "json.decoder": {"proprio_us": 120, "acumulado_us": 120},
+        "json": {"proprio_us": 300, "acumulado_us": 420},
+    }
+
+
+def test_comparar_aponta_regressoes_acima_do_limite():
+    """Tempo ou memória acima do limite viram regressão; dentro do limite, não"""
+    baseline = {"tempo_ms": 500, "rss_kb": 60000, "modulos": [{"modulo": "fastapi"}]}
+    dentro = {"tempo_ms": 580, "rss_kb": 62000, "modulos": [{"modulo": "fastapi"}]}
+    fora = {"tempo_ms": 900, "rss_kb": 62000, "modulos": [{"modulo": "pandas"}]}
+
+    assert comparar(dentro, baseline, 0.2, 0.15) == []
+    regressoes = comparar(fora, baseline, 0.2, 0.15)
+    assert regressoes[0].startswith("tempo")
+    assert "pandas" in regressoes[-1]
+    assert comparar(fora, None, 0.2, 0.15) == []
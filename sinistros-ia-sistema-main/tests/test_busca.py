@@ -0,0 +1,80 @@
+"""Testes da busca textual (SQLite FTS5)"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.busca import buscar_sinistros, configurar_busca
+from src.database.models import Base, Sinistro, StatusSinistro
+
+
+def _sessao():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conexao:
+        configurar_busca(conexao)
+    return sessionmaker(bind=engine)()
+
+
+def _sinistro(numero, descricao, status=StatusSinistro.RECEBIDO):
+    return Sinistro(
+        numero_sinistro=numero,
+        status=status,
+        data_ocorrencia=datetime(2024, 5, 1),
+        segurado_nome="Maria",
+        segurado_documento="123.456.789-00",
+        apolice_numero="APL-1",
+        descricao=descricao,
+    )
+
+
+def test_busca_por_descricao_e_analise():
+    """Encontra termos na descrição e no texto das análises, mantido a cada UPDATE"""
+    db = _sessao()
+    db.add_all([
+        _sinistro("SIN-1", "Colisão traseira no cruzamento"),
+        _sinistro("SIN-2", "Alagamento na garagem", StatusSinistro.APROVADO),
+        _sinistro("SIN-3", "Furto de celular"),
+    ])
+    db.commit()
+
+    assert [r["numero_sinistro"] for r in buscar_sinistros(db, "colisao")["resultados"]] == ["SIN-1"]
+    assert buscar_sinistros(db, "fraude")["resultados"] == []
+
+    sinistro = db.query(Sinistro).filter_by(numero_sinistro="SIN-3").one()
+    sinistro.texto_analises = "Indícios de fraude: nota fiscal divergente"
+    db.commit()
+    assert [r["numero_sinistro"] for r in buscar_sinistros(db, "fraude")["resultados"]] == ["SIN-3"]
+
+    filtrado = buscar_sinistros(db, "alagamento", status=StatusSinistro.RECEBIDO)
+    assert filtrado["resultados"] == []
+
+
+def test_paginacao_por_cursor():
+    """Páginas por cursor cobrem todos os resultados sem repetição"""
+    db = _sessao()
+    db.add_all([_sinistro(f"SIN-{i}", f"Granizo danificou o veículo {'granizo ' * (i % 3)}") for i in range(7)])
+    db.commit()
+
+    vistos, cursor = [], None
+    while True:
+        pagina = buscar_sinistros(db, "granizo", limite=3, cursor=cursor)
+        vistos += [r["numero_sinistro"] for r in pagina["resultados"]]
+        relevancias = [r["relevancia"] for r in pagina["resultados"]]
+        assert relevancias == sorted(relevancias, reverse=True)
+        cursor = pagina["proximo_cursor"]
+        if not cursor:
+            break
+
+    assert sorted(vistos) == sorted(f"SIN-{i}" for i in range(7))
+
+
+def test_termos_sem_palavras_retornam_pagina_vazia():
+    """Só pontuação/operadores: página vazia em vez de erro de sintaxe do MATCH"""
+    db = _sessao()
+    db.add(_sinistro("SIN-1", "Colisão traseira no cruzamento"))
+    db.commit()
+
+    for termos in ("!!", "-", '""', "* OR -"):
+        assert buscar_sinistros(db, termos) == {"resultados": [], "proximo_cursor": None}
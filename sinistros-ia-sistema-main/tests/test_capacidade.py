@@ -0,0 +1,22 @@
+"""Testes do sinal de capacidade dos workers"""
+
+from src.workers.capacidade import replicas_desejadas, sub_filas
+from src.workers.filas import NIVEIS_PRIORIDADE
+
+
+def test_sub_filas_seguem_nomes_do_kombu():
+    """Nível 0 usa o nome da fila; os demais recebem o sufixo de prioridade"""
+    nomes = list(sub_filas("analise"))
+    assert nomes[0] == "analise"
+    assert nomes[1] == "analise:1"
+    assert len(nomes) == len(NIVEIS_PRIORIDADE)
+
+
+def test_replicas_desejadas():
+    """Réplicas crescem com a fila e o tempo de serviço, dentro dos limites"""
+    assert replicas_desejadas(0, 30.0, 4, 120) == 1
+    # 400 tarefas de 30s, 4 por slot no prazo de 120s -> 100 slots -> 25 réplicas de 4
+    assert replicas_desejadas(400, 30.0, 4, 120, maximo=50) == 25
+    assert replicas_desejadas(400, 30.0, 4, 120, maximo=20) == 20
+    # Sem histórico, uma tarefa por slot
+    assert replicas_desejadas(10, None, 4, 120) == 3
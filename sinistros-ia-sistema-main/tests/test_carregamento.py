@@ -0,0 +1,64 @@
+"""Testes dos perfis de carregamento e do limite de consultas"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.carregamento import com_perfil, sinistro_com_ultima_analise
+from src.database.consultas import ConsultasExcedidas, limitar_consultas
+from src.database.models import Analise, Base, Documento, Sinistro
+
+
+def _sessao_com_dados():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    for i in range(5):
+        sinistro = Sinistro(
+            numero_sinistro=f"SIN-{i}",
+            data_ocorrencia=datetime(2024, 5, 1),
+            segurado_nome="Maria",
+            segurado_documento="123.456.789-00",
+            apolice_numero="APL-1",
+            descricao="Colisão",
+        )
+        sinistro.documentos = [Documento(nome=f"doc-{i}-{j}.pdf") for j in range(3)]
+        sinistro.analises = [
+            Analise(agente="gerente", tipo_analise="completa", resultado={"versao": v},
+                    data_inicio=datetime(2024, 5, 1 + v), decisao=f"decisao-{v}")
+            for v in range(3)
+        ] + [Analise(agente="triagem", tipo_analise="triagem", resultado={}, data_inicio=datetime(2024, 6, 1))]
+        db.add(sinistro)
+    db.commit()
+    db.expunge_all()
+    return db
+
+
+def test_perfil_carrega_documentos_em_consultas_fixas():
+    """Documentos de todos os sinistros vêm em uma consulta extra, não uma por sinistro"""
+    db = _sessao_com_dados()
+
+    with limitar_consultas(2):
+        sinistros = com_perfil(db.query(Sinistro), "analise_agentes").all()
+        nomes = [doc.nome for sinistro in sinistros for doc in sinistro.documentos]
+    assert len(nomes) == 15
+
+    db.expunge_all()
+    with pytest.raises(ConsultasExcedidas):
+        with limitar_consultas(2):
+            for sinistro in db.query(Sinistro).all():
+                list(sinistro.documentos)
+
+
+def test_ultima_analise_em_uma_consulta():
+    """Sinistro e sua análise consolidada mais recente vêm numa única consulta"""
+    db = _sessao_com_dados()
+
+    with limitar_consultas(1):
+        sinistro, analise = sinistro_com_ultima_analise(db, "SIN-3")
+    assert sinistro.numero_sinistro == "SIN-3"
+    assert analise.decisao == "decisao-2"
+
+    assert sinistro_com_ultima_analise(db, "SIN-404") == (None, None)
@@ -0,0 +1,55 @@
+"""Testes dos signals de ciclo de vida do worker"""
+
+import sys
+from types import ModuleType, SimpleNamespace
+
+from src.workers import celery_app as modulo_celery
+
+
+def _psycogreen_falso(monkeypatch):
+    """psycogreen.gevent que só registra as chamadas a patch_psycopg"""
+    chamadas = []
+    psycogreen = ModuleType("psycogreen")
+    psycogreen_gevent = ModuleType("psycogreen.gevent")
+    psycogreen_gevent.patch_psycopg = lambda: chamadas.append(1)
+    psycogreen.gevent = psycogreen_gevent
+    monkeypatch.setitem(sys.modules, "psycogreen", psycogreen)
+    monkeypatch.setitem(sys.modules, "psycogreen.gevent", psycogreen_gevent)
+    return chamadas
+
+
+def _gevent_falso(monkeypatch, socket_patcheado):
+    gevent = ModuleType("gevent")
+    gevent.monkey = SimpleNamespace(is_module_patched=lambda modulo: socket_patcheado)
+    monkeypatch.setitem(sys.modules, "gevent", gevent)
+    monkeypatch.setitem(sys.modules, "gevent.monkey", gevent.monkey)
+
+
+def test_sem_gevent_instalado_nao_faz_nada(monkeypatch):
+    """Pool prefork/solo sem gevent instalado: o driver do banco não é alterado"""
+    chamadas = _psycogreen_falso(monkeypatch)
+    monkeypatch.setitem(sys.modules, "gevent", None)
+
+    modulo_celery.worker_init_handler()
+
+    assert chamadas == []
+
+
+def test_gevent_instalado_sem_pool_gevent_nao_faz_nada(monkeypatch):
+    """gevent instalado, mas o worker não roda com -P gevent (socket não patcheado)"""
+    chamadas = _psycogreen_falso(monkeypatch)
+    _gevent_falso(monkeypatch, socket_patcheado=False)
+
+    modulo_celery.worker_init_handler()
+
+    assert chamadas == []
+
+
+def test_pool_gevent_torna_psycopg_cooperativo(monkeypatch):
+    """Com -P gevent o psycogreen é aplicado"""
+    chamadas = _psycogreen_falso(monkeypatch)
+    _gevent_falso(monkeypatch, socket_patcheado=True)
+
+    modulo_celery.worker_init_handler()
+
+    assert chamadas == [1]
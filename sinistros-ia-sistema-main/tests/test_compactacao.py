@@ -0,0 +1,76 @@
+"""Testes da compactação de contexto dos prompts"""
+
+from src.utils.compactacao import (
+    compactar_texto,
+    contar_tokens,
+    limitar_tokens,
+    normalizar_espacos,
+    remover_boilerplate,
+    resumir_saida_agente,
+    MARCADOR_CORTE,
+)
+
+
+def test_normalizar_espacos():
+    """Espaços e linhas em branco repetidos são colapsados"""
+    texto = "  Colisão   no\t cruzamento \n\n\n\n  Airbags acionados  "
+    assert normalizar_espacos(texto) == "Colisão no cruzamento\n\nAirbags acionados"
+
+
+def test_remover_boilerplate_email():
+    """Citações, assinatura e aviso legal são descartados"""
+    corpo = (
+        "Bom dia, meu carro foi atingido ontem.\n"
+        "Apólice: APL-2024-001\n"
+        "\n"
+        "Esta mensagem é confidencial e destinada apenas ao destinatário.\n"
+        "\n"
+        "Atenciosamente,\n"
+        "João Silva\n"
+        "> mensagem anterior citada\n"
+    )
+    resultado = remover_boilerplate(corpo)
+    assert "atingido ontem" in resultado
+    assert "APL-2024-001" in resultado
+    assert "confidencial" not in resultado
+    assert "João Silva" not in resultado
+    assert "citada" not in resultado
+
+
+def test_remover_resposta_citada():
+    """Tudo após o cabeçalho da resposta citada é removido"""
+    corpo = "Segue o orçamento.\n\nEm 10/01/2024 10:00, Seguradora escreveu:\nTexto antigo"
+    assert compactar_texto(corpo) == "Segue o orçamento."
+
+
+def test_limitar_tokens():
+    """Textos longos são cortados dentro do limite e marcados"""
+    texto = "palavra " * 1000
+    limitado = limitar_tokens(texto, 50)
+    assert contar_tokens(limitado) <= 50
+    assert limitado.endswith(MARCADOR_CORTE)
+    assert limitar_tokens("curto", 50) == "curto"
+
+
+def test_resumir_saida_com_json():
+    """Da saída com JSON ficam apenas os campos estruturados"""
+    saida = (
+        "Segue minha análise detalhada do caso...\n"
+        "```json\n"
+        '{"tipo_identificado": "automovel", "prioridade": 2, "alerta_fraude": false,'
+        ' "documentos_necessarios": ["BO", "CNH"], "detalhes": {"texto": "longo"}}\n'
+        "```"
+    )
+    resumo = resumir_saida_agente(saida, 200)
+    assert '"tipo_identificado":"automovel"' in resumo
+    assert '"documentos_necessarios":["BO","CNH"]' in resumo
+    assert "detalhes" not in resumo
+    assert "análise detalhada" not in resumo
+
+
+def test_resumir_saida_sem_json():
+    """Sem JSON a saída é compactada e limitada"""
+    saida = "Documentação   completa.\n\n\n\nRecomendo aprovação. " + "Observação. " * 500
+    resumo = resumir_saida_agente(saida, 30)
+    assert resumo.startswith("Documentação completa.")
+    assert contar_tokens(resumo) <= 30
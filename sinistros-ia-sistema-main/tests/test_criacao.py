@@ -0,0 +1,62 @@
+"""Testes da criação de sinistros em uma transação"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.connection import commit_sem_expirar
+from src.database.consultas import limitar_consultas
+from src.database.criacao import AlocadorNumeros, registrar_sinistro
+from src.database.models import Base, HistoricoSinistro, PayloadSinistro, Sinistro
+from src.database.payloads import carregar_payload
+
+DADOS = {
+    "data_ocorrencia": datetime(2024, 5, 1),
+    "segurado_nome": "Maria",
+    "segurado_documento": "123.456.789-00",
+    "apolice_numero": "APL-1",
+    "descricao": "Colisão",
+    "canal_origem": "web",
+    "metadata": {"source": "web"},
+}
+
+
+def test_sinistro_historico_e_payload_num_flush():
+    """Criação grava sinistro, histórico e payload sem consultas extras nem recarga"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    with limitar_consultas(3) as consultas:
+        sinistro = registrar_sinistro(db, DADOS, usuario="api", descricao_historico="Criado",
+                                      payloads={"raw_data": {"campo": "valor"}})
+        commit_sem_expirar(db)
+        resposta = (sinistro.id, sinistro.numero_sinistro, sinistro.data_criacao, sinistro.valor_estimado)
+    assert all(sql.lstrip().upper().startswith("INSERT") for sql in consultas)
+    assert resposta[2] is not None and resposta[3] == 0.0
+
+    assert db.query(HistoricoSinistro).filter_by(sinistro_id=sinistro.id, acao="sinistro_criado").count() == 1
+    assert db.query(PayloadSinistro).count() == 1
+    assert carregar_payload(db, sinistro.id, "raw_data") == {"campo": "valor"}
+    assert db.query(Sinistro).one().metadados == {"source": "web"}
+
+
+def test_alocador_reserva_blocos():
+    """Um nextval por bloco; números consecutivos dentro do bloco"""
+    chamadas = []
+
+    def execute(_):
+        chamadas.append(1)
+        return SimpleNamespace(scalar=lambda: 1 + 3 * (len(chamadas) - 1))
+
+    db = SimpleNamespace(bind=SimpleNamespace(dialect=SimpleNamespace(supports_sequences=True)), execute=execute)
+    alocador = AlocadorNumeros(tamanho_bloco=3)
+
+    numeros = [alocador.proximo(db) for _ in range(7)]
+    sufixos = [int(numero.rsplit("-", 1)[1]) for numero in numeros]
+
+    assert sufixos == [1, 2, 3, 4, 5, 6, 7]
+    assert len(chamadas) == 3
+    assert len(numeros[0].rsplit("-", 1)[1]) == 9
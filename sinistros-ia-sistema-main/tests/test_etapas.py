@@ -0,0 +1,278 @@
+"""Testes do pipeline de etapas dos agentes"""
+
+import importlib
+import importlib.util
+import json
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from types import ModuleType, SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Base, Sinistro, StatusSinistro
+from src.utils.compactacao import contar_tokens
+
+
+class _AgenteFalso:
+    def __init__(self, name, **opcoes):
+        self.name = name
+        self.__dict__.update(opcoes)
+
+
+def _importar_agentes():
+    """
+    Importa o sistema de agentes; sem o swarm instalado, um módulo falso
+    fornece Agent e Swarm só durante o import (a chamada ao LLM é
+    substituída em cada teste) e o módulo assim importado não fica em
+    sys.modules para os demais testes
+    """
+    if importlib.util.find_spec("swarm") is not None:
+        return importlib.import_module("src.agents.claims_agent_system")
+
+    swarm = ModuleType("swarm")
+    swarm.Agent = _AgenteFalso
+    swarm.Swarm = lambda client=None: SimpleNamespace(client=client)
+    sys.modules["swarm"] = swarm
+    try:
+        return importlib.import_module("src.agents.claims_agent_system")
+    finally:
+        del sys.modules["swarm"]
+        sys.modules.pop("src.agents.claims_agent_system", None)
+        vars(sys.modules["src.agents"]).pop("claims_agent_system", None)
+
+
+agentes = _importar_agentes()
+
+
+def _sinistro(**campos):
+    sinistro = {
+        "numero_sinistro": "SIN-2024-00000001",
+        "tipo": "automovel",
+        "data_ocorrencia": "2024-05-01",
+        "data_aviso": "2024-05-02",
+        "segurado": {"nome": "Maria", "documento": "123.456.789-00"},
+        "apolice": {"numero": "APL-1", "produto": "auto"},
+        "descricao": "Colisão traseira",
+        "documentos": ["bo.pdf", "fotos.zip"],
+        "valor_estimado": 15000.0,
+    }
+    sinistro.update(campos)
+    return sinistro
+
+
+def _executar_falso(monkeypatch):
+    """Substitui a chamada ao agente; devolve a lista de etapas executadas"""
+    executadas = []
+
+    def executar(etapa, mensagem, sinistro_numero, on_evento, hash_entrada=None):
+        executadas.append(etapa["nome"])
+        return {
+            "etapa": etapa["nome"], "agente": etapa["agente"].name, "saida": f"nova {etapa['nome']}",
+            "agent_usado": etapa["agente"].name, "duracao_ms": 1,
+            "tokens": agentes._tokens_zerados(), "hash_entrada": hash_entrada,
+        }
+
+    monkeypatch.setattr(agentes, "_executar_etapa", executar)
+    return executadas
+
+
+def test_entrada_inalterada_reaproveita_etapa(monkeypatch):
+    """Mesmo hash de entrada: a saída anterior volta sem chamar o agente"""
+    executadas = _executar_falso(monkeypatch)
+    sinistro = _sinistro()
+    anterior = {"hash_entrada": agentes.hash_entrada_etapa("calculo", sinistro), "saida": "cálculo anterior"}
+    eventos = []
+
+    resultado = agentes.executar_etapa("calculo", sinistro, eventos.append, anterior)
+
+    assert executadas == []
+    assert resultado["reaproveitada"] is True
+    assert resultado["saida"] == "cálculo anterior"
+    assert [evento["tipo"] for evento in eventos] == ["etapa.reaproveitada"]
+
+
+def test_campo_fora_da_etapa_nao_invalida():
+    """Mudar um campo que a etapa não lê (nem a ordem dos documentos) mantém o cache"""
+    sinistro = _sinistro()
+    hash_calculo = agentes.hash_entrada_etapa("calculo", sinistro)
+    hash_compliance = agentes.hash_entrada_etapa("compliance", sinistro)
+
+    alterado = _sinistro(descricao="Outra descrição", documentos=["fotos.zip", "bo.pdf"])
+
+    assert "descricao" not in agentes.CAMPOS_POR_ETAPA["calculo"]
+    assert agentes.hash_entrada_etapa("calculo", alterado) == hash_calculo
+    assert agentes.hash_entrada_etapa("compliance", alterado) == hash_compliance
+
+
+@pytest.mark.parametrize("etapa", sorted(agentes.CAMPOS_POR_ETAPA))
+def test_campo_listado_invalida_etapa(monkeypatch, etapa):
+    """Mudar qualquer campo listado em CAMPOS_POR_ETAPA reexecuta a etapa"""
+    sinistro = _sinistro()
+    anterior = {"hash_entrada": agentes.hash_entrada_etapa(etapa, sinistro), "saida": "anterior"}
+
+    for campo in agentes.CAMPOS_POR_ETAPA[etapa]:
+        executadas = _executar_falso(monkeypatch)
+        alterado = _sinistro()
+        if "." in campo:
+            raiz, chave = campo.split(".")
+            alterado[raiz] = {**alterado[raiz], chave: "alterado"}
+        else:
+            alterado[campo] = "alterado"
+
+        resultado = agentes.executar_etapa(etapa, alterado, None, anterior)
+
+        assert executadas == [etapa], campo
+        assert resultado["saida"] == f"nova {etapa}"
+        assert resultado["hash_entrada"] != anterior["hash_entrada"]
+
+
+class _CompletionsFalsas:
+    """chat.completions que responde com prompt estimado e até 400 tokens de resposta"""
+
+    def __init__(self):
+        self.chamadas = []
+
+    def create(self, **kwargs):
+        self.chamadas.append(kwargs)
+        prompt = contar_tokens(json.dumps([kwargs["messages"], []], ensure_ascii=False))
+        completion = min(400, kwargs.get("max_tokens") or 400)
+        return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion))
+
+
+def _cliente_falso():
+    completions = _CompletionsFalsas()
+    cliente = agentes.ClienteOpenAIComUso(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return cliente, completions
+
+
+def test_resposta_limitada_ao_orcamento_restante():
+    """max_tokens reserva só o que sobra; sem espaço para resposta a chamada nem é feita"""
+    cliente, completions = _cliente_falso()
+    mensagens = [{"role": "user", "content": "Classifique o sinistro"}]
+    orcamento = {"limite": 600, "consumido": 0}
+    token = agentes._orcamento_tokens.set(orcamento)
+    try:
+        cliente.chat.completions.create(model="gpt-4o", messages=mensagens)
+        assert completions.chamadas[0]["max_tokens"] < 600
+        cliente.chat.completions.create(model="gpt-4o", messages=mensagens, max_tokens=1000)
+        assert completions.chamadas[1]["max_tokens"] < 200
+        assert orcamento["consumido"] <= orcamento["limite"]
+
+        with pytest.raises(agentes.OrcamentoTokensExcedido):
+            cliente.chat.completions.create(model="gpt-4o", messages=mensagens)
+        assert len(completions.chamadas) == 2
+    finally:
+        agentes._orcamento_tokens.reset(token)
+
+
+def test_orcamento_esgotado_gera_decisao_parcial(monkeypatch):
+    """O sinistro para com decisão pendente sem consumir mais que o orçamento"""
+    cliente, completions = _cliente_falso()
+
+    def run(agent, messages, max_turns):
+        cliente.chat.completions.create(model=agent.model, messages=messages)
+        return SimpleNamespace(messages=[{"content": f"saída {agent.name}"}], agent=agent)
+
+    monkeypatch.setattr(agentes, "get_swarm_client", lambda: SimpleNamespace(run=run))
+
+    resultado = agentes.processar_sinistro(_sinistro(), orcamento_tokens=1200)
+
+    assert resultado["parcial"] is True
+    assert resultado["decisao"] == "pendente"
+    assert len(completions.chamadas) < len(agentes.ETAPAS) + 1
+    assert resultado["tokens"]["prompt_tokens"] + resultado["tokens"]["completion_tokens"] <= 1200
+
+
+def test_gerente_consolida_as_etapas_do_chord(monkeypatch):
+    """Saídas das etapas paralelas chegam ao gerente; tokens de todas são somados"""
+    executadas = _executar_falso(monkeypatch)
+    sinistro = _sinistro()
+    etapas = [agentes.executar_etapa(etapa["nome"], sinistro) for etapa in agentes.ETAPAS]
+    for etapa in etapas:
+        etapa["tokens"] = {**agentes._tokens_zerados(), "prompt_tokens": 10, "chamadas": 1}
+
+    resultado = agentes.consolidar_decisao(sinistro, etapas)
+
+    assert executadas == [etapa["nome"] for etapa in agentes.ETAPAS] + ["decisao"]
+    assert resultado["mensagem"] == "nova decisao"
+    assert [etapa["etapa"] for etapa in resultado["etapas"]] == executadas
+    assert all("saida" not in etapa for etapa in resultado["etapas"])
+    assert resultado["tokens"]["prompt_tokens"] == 10 * len(agentes.ETAPAS)
+    assert "parcial" not in resultado
+
+
+def test_descricao_de_outros_canais_chega_inteira_a_triagem():
+    """Regras de boilerplate de email não cortam descrições do app, legado ou lote"""
+    descricao = (
+        "Batida no cruzamento.\n"
+        "--\n"
+        "De: oficina@exemplo.com informou o orçamento\n"
+        "> 3 veículos envolvidos\n"
+        "Obrigado\n"
+        "Terceiro fugiu do local."
+    )
+
+    mensagem = agentes._mensagem_triagem(_sinistro(descricao=descricao))
+
+    for linha in descricao.splitlines():
+        assert linha in mensagem
+
+
+def test_descricao_longa_limitada_na_triagem():
+    sinistro = _sinistro(descricao="palavra " * (agentes.LIMITE_TOKENS_DESCRICAO * 2))
+
+    mensagem = agentes._mensagem_triagem(sinistro)
+
+    assert "[...]" in mensagem
+    assert contar_tokens(mensagem) < agentes.LIMITE_TOKENS_DESCRICAO + 100
+
+
+def test_retry_reaproveita_a_etapa_gravada(monkeypatch):
+    """Retry da análise: a Analise gravada na 1ª tentativa é lida (só hash e saída) e o agente não roda de novo"""
+    from src.workers import tasks
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Sessao = sessionmaker(bind=engine)
+
+    @contextmanager
+    def sessao():
+        with Sessao() as db:
+            yield db
+            db.commit()
+
+    monkeypatch.setattr(tasks, "get_db_session", sessao)
+    monkeypatch.setattr(tasks, "agentes", agentes)
+    monkeypatch.setattr(tasks, "publicar_evento", lambda *args: None)
+    monkeypatch.setattr(tasks, "publicar_mudanca_status", lambda *args: None)
+    with Sessao() as db:
+        db.add(Sinistro(numero_sinistro="SIN-2024-00000001", data_ocorrencia=datetime(2024, 5, 1),
+                        segurado_nome="Maria", segurado_documento="123.456.789-00",
+                        apolice_numero="APL-1", descricao="Colisão traseira", valor_estimado=15000.0,
+                        status=StatusSinistro.EM_ANALISE))
+        db.commit()
+    executadas = []
+
+    def executar(etapa, mensagem, sinistro_numero, on_evento, hash_entrada=None):
+        executadas.append(etapa["nome"])
+        on_evento({
+            "tipo": "etapa.concluida", "sinistro_numero": sinistro_numero, "etapa": etapa["nome"],
+            "agente": etapa["agente"].name, "sucesso": True, "erro": None, "saida": "cálculo: R$ 12.000",
+            "duracao_ms": 10, "fim": datetime.now().isoformat(), "hash_entrada": hash_entrada,
+            "tokens": agentes._tokens_zerados(),
+        })
+        return {"etapa": etapa["nome"], "saida": "cálculo: R$ 12.000", "hash_entrada": hash_entrada,
+                "tokens": agentes._tokens_zerados()}
+
+    monkeypatch.setattr(agentes, "_executar_etapa", executar)
+
+    primeira = tasks.executar_etapa_agente.apply(args=["SIN-2024-00000001", "calculo"]).get()
+    retry = tasks.executar_etapa_agente.apply(args=["SIN-2024-00000001", "calculo"]).get()
+
+    assert executadas == ["calculo"]
+    assert retry["reaproveitada"] is True
+    assert retry["saida"] == primeira["saida"]
+    assert retry["hash_entrada"] == primeira["hash_entrada"]
@@ -0,0 +1,179 @@
+"""Testes dos canais de push (SSE e WebSocket)"""
+
+import json
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from src.api import eventos
+from src.events import bus
+
+NUMERO = "SIN-2024-00000001"
+NUMERO_CONCLUIDO = "SIN-2024-00000002"
+
+EVENTOS = [
+    {"tipo": "etapa.iniciada", "numero_sinistro": NUMERO, "dados": {"etapa": "triagem"}},
+    None,  # heartbeat
+    {"tipo": "status.alterado", "numero_sinistro": NUMERO, "dados": {"status_novo": "aprovado"}},
+    {"tipo": "etapa.iniciada", "numero_sinistro": NUMERO, "dados": {"etapa": "depois do fim"}},
+]
+
+
+class _AssinaturaFalsa:
+    """Pub/sub em memória: entrega EVENTOS e registra o fechamento"""
+
+    instancias = []
+    ordem = []
+
+    def __init__(self, numero_sinistro=None):
+        self.numero_sinistro = numero_sinistro
+        self.fechada = False
+        _AssinaturaFalsa.instancias.append(self)
+
+    async def abrir(self):
+        _AssinaturaFalsa.ordem.append("assinatura")
+        return self
+
+    async def __aiter__(self):
+        for evento in EVENTOS:
+            yield evento
+
+    async def fechar(self):
+        self.fechada = True
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    """App com o router de eventos; o snapshot registra a thread em que rodou"""
+    threads = []
+
+    def snapshot(numero_sinistro):
+        threads.append(threading.current_thread())
+        _AssinaturaFalsa.ordem.append("snapshot")
+        status = {NUMERO: "em_analise", NUMERO_CONCLUIDO: "aprovado"}.get(numero_sinistro)
+        if not status:
+            return None
+        return {"tipo": "status.atual", "numero_sinistro": numero_sinistro, "dados": {"status_novo": status}}
+
+    _AssinaturaFalsa.instancias = []
+    _AssinaturaFalsa.ordem = []
+    monkeypatch.setattr(eventos, "_snapshot_status", snapshot)
+    monkeypatch.setattr(eventos, "AssinaturaEventos", _AssinaturaFalsa)
+
+    app = FastAPI()
+    app.include_router(eventos.router, prefix="/api/v1")
+    loop_threads = []
+
+    @app.get("/thread")
+    async def thread_do_loop():
+        loop_threads.append(threading.current_thread())
+        return {}
+
+    with TestClient(app) as cliente:
+        cliente.get("/thread")
+        cliente.threads = threads
+        cliente.thread_do_loop = loop_threads[0]
+        yield cliente
+
+
+def _eventos_sse(corpo):
+    return [bloco for bloco in corpo.split("\n\n") if bloco]
+
+
+def test_sse_entrega_ate_o_status_final(cliente):
+    """Snapshot, eventos e keep-alive; o stream termina no status final e fecha a assinatura"""
+    resposta = cliente.get(f"/api/v1/sinistros/{NUMERO}/eventos")
+
+    assert resposta.status_code == 200
+    blocos = _eventos_sse(resposta.text)
+    assert blocos[0].startswith("event: status.atual")
+    assert blocos[1].startswith("event: etapa.iniciada")
+    assert blocos[2] == ": keep-alive"
+    assert json.loads(blocos[3].split("data: ", 1)[1])["dados"]["status_novo"] == "aprovado"
+    assert len(blocos) == 4
+    assert _AssinaturaFalsa.instancias[0].numero_sinistro == NUMERO
+    assert _AssinaturaFalsa.instancias[0].fechada
+
+
+def test_consulta_ao_banco_fora_do_event_loop(cliente):
+    """O snapshot (SQLAlchemy síncrono) roda no threadpool, não na thread do event loop"""
+    cliente.get(f"/api/v1/sinistros/{NUMERO}/eventos")
+    with cliente.websocket_connect(f"/api/v1/ws/sinistros/{NUMERO}") as websocket:
+        websocket.receive_json()
+
+    assert len(cliente.threads) == 2
+    assert cliente.thread_do_loop not in cliente.threads
+
+
+def test_sse_sinistro_inexistente(cliente):
+    assert cliente.get("/api/v1/sinistros/SIN-INEXISTENTE/eventos").status_code == 404
+    assert _AssinaturaFalsa.instancias[0].fechada
+
+
+def test_assina_antes_do_snapshot(cliente):
+    """Uma transição publicada durante a leitura do snapshot não se perde"""
+    cliente.get(f"/api/v1/sinistros/{NUMERO}/eventos")
+    with cliente.websocket_connect(f"/api/v1/ws/sinistros/{NUMERO}") as websocket:
+        websocket.receive_json()
+
+    assert _AssinaturaFalsa.ordem == ["assinatura", "snapshot", "assinatura", "snapshot"]
+
+
+def test_status_final_no_snapshot_encerra(cliente):
+    """Sinistro já concluído: só o snapshot é entregue e a assinatura é fechada"""
+    resposta = cliente.get(f"/api/v1/sinistros/{NUMERO_CONCLUIDO}/eventos")
+    blocos = _eventos_sse(resposta.text)
+    assert len(blocos) == 1 and blocos[0].startswith("event: status.atual")
+
+    with cliente.websocket_connect(f"/api/v1/ws/sinistros/{NUMERO_CONCLUIDO}") as websocket:
+        assert websocket.receive_json()["dados"]["status_novo"] == "aprovado"
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+    assert len(_AssinaturaFalsa.instancias) == 2
+    assert all(assinatura.fechada for assinatura in _AssinaturaFalsa.instancias)
+
+
+def test_sem_redis_responde_503_antes_do_stream(cliente, monkeypatch):
+    """Sem Redis o cliente recebe 503, e não um 200 com o stream quebrado"""
+    monkeypatch.setattr(eventos, "AssinaturaEventos", bus.AssinaturaEventos)
+    monkeypatch.setattr(bus, "REDIS_AVAILABLE", False)
+
+    assert cliente.get(f"/api/v1/sinistros/{NUMERO}/eventos").status_code == 503
+    assert cliente.get("/api/v1/eventos").status_code == 503
+
+
+def test_redis_fora_do_ar_responde_503(cliente, monkeypatch):
+    """Redis configurado mas inacessível também falha antes da resposta"""
+    monkeypatch.setattr(eventos, "AssinaturaEventos", bus.AssinaturaEventos)
+    monkeypatch.setattr(bus, "_redis_url", lambda: "redis://127.0.0.1:1/0")
+
+    assert cliente.get("/api/v1/eventos").status_code == 503
+
+
+def test_websocket_entrega_eventos(cliente):
+    """WebSocket: snapshot, eventos, keep-alive e fechamento no status final"""
+    with cliente.websocket_connect(f"/api/v1/ws/sinistros/{NUMERO}") as websocket:
+        recebidos = [websocket.receive_json() for _ in range(4)]
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+    assert [evento["tipo"] for evento in recebidos] == [
+        "status.atual", "etapa.iniciada", "keep-alive", "status.alterado"
+    ]
+    assert _AssinaturaFalsa.instancias[0].fechada
+
+
+def test_websocket_sem_redis_fecha_com_1013(cliente, monkeypatch):
+    """Sem canal de eventos o WebSocket entrega o snapshot e fecha pedindo nova tentativa"""
+    monkeypatch.setattr(eventos, "AssinaturaEventos", bus.AssinaturaEventos)
+    monkeypatch.setattr(bus, "REDIS_AVAILABLE", False)
+
+    with cliente.websocket_connect(f"/api/v1/ws/sinistros/{NUMERO}") as websocket:
+        assert websocket.receive_json()["tipo"] == "status.atual"
+        with pytest.raises(WebSocketDisconnect) as fechamento:
+            websocket.receive_json()
+    assert fechamento.value.code == 1013
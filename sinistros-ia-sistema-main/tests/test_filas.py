@@ -0,0 +1,42 @@
+"""Testes do registro de filas e prioridades do Celery"""
+
+from src.workers.filas import (
+    Tarefa, Fila, ROTAS, NIVEIS_PRIORIDADE,
+    prioridade_broker, prioridade_canal, task_routes, task_queues, beat_schedule, atraso_retry,
+)
+
+
+def test_prioridade_broker_usa_niveis_existentes():
+    """Prioridades da API (1-10) caem em níveis declarados no broker"""
+    assert prioridade_broker(1) == 0
+    assert prioridade_broker(10) == 9
+    assert prioridade_broker(None) == prioridade_broker(5)
+    for prioridade in range(-5, 20):
+        assert prioridade_broker(prioridade) in NIVEIS_PRIORIDADE
+
+
+def test_batch_tem_menor_prioridade():
+    """Importações em massa não passam na frente dos demais canais"""
+    assert prioridade_broker(prioridade_canal("batch")) > prioridade_broker(prioridade_canal("mobile"))
+    assert prioridade_canal("desconhecido") == prioridade_canal(None)
+
+
+def test_rotas_e_agendamentos_usam_nomes_registrados():
+    """Roteamento e beat usam os mesmos nomes com que as tarefas são registradas"""
+    rotas = task_routes()
+    assert rotas[Tarefa.PROCESSAR_SINISTRO.value]["queue"] == Fila.ANALISE.value
+    assert set(rotas) == {tarefa.value for tarefa in ROTAS}
+
+    nomes = {tarefa.value for tarefa in Tarefa}
+    assert all(agendamento["task"] in nomes for agendamento in beat_schedule().values())
+
+    filas_declaradas = {fila.name for fila in task_queues()}
+    assert {rota["queue"] for rota in rotas.values()} <= filas_declaradas
+
+
+def test_atraso_retry_exponencial_com_jitter():
+    """Atraso dobra a cada tentativa, varia entre metade e o total e respeita o teto"""
+    for tentativas, esperado in [(1, 60), (2, 120), (3, 240), (10, 3600)]:
+        for _ in range(50):
+            atraso = atraso_retry(tentativas, 60, 3600)
+            assert esperado / 2 <= atraso <= esperado
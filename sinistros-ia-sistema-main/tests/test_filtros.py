@@ -0,0 +1,47 @@
+"""Testes dos filtros sobre metadata e alertas"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from src.database.filtros import filtro_alerta, filtro_metadados
+from src.database.models import Analise, Base, Sinistro
+
+
+def _sinistro(numero, metadados):
+    return Sinistro(
+        numero_sinistro=numero,
+        data_ocorrencia=datetime(2024, 5, 1),
+        segurado_nome="Maria",
+        segurado_documento="123.456.789-00",
+        apolice_numero="APL-1",
+        descricao="Colisão",
+        metadados=metadados,
+    )
+
+
+def test_filtro_metadados_usa_expressao_indexada():
+    """No PostgreSQL o filtro compila para metadata ->> 'chave' (índice de expressão)"""
+    sql = str(filtro_metadados("batch_file", "lote.csv").compile(dialect=postgresql.dialect()))
+    assert "metadata ->> " in sql
+
+
+def test_filtros_sqlite():
+    """Filtros por chave de metadata e por alerta funcionam sem índice"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    lote = _sinistro("SIN-1", {"batch_file": "lote.csv", "source": "batch"})
+    web = _sinistro("SIN-2", {"source": "web"})
+    db.add_all([lote, web])
+    db.flush()
+    db.add(Analise(sinistro_id=web.id, agente="AgenteAnalise", tipo_analise="analise",
+                   resultado={}, alertas=["suspeita_fraude"]))
+    db.commit()
+
+    assert [s.numero_sinistro for s in db.query(Sinistro).filter(filtro_metadados("batch_file", "lote.csv"))] == ["SIN-1"]
+    assert [s.numero_sinistro for s in db.query(Sinistro).filter(filtro_metadados("source", "web"))] == ["SIN-2"]
+    assert [s.numero_sinistro for s in db.query(Sinistro).filter(filtro_alerta("sqlite", "suspeita_fraude"))] == ["SIN-2"]
@@ -0,0 +1,235 @@
+"""Testes do registro declarativo de métricas"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+
+from src.monitoring import metrics
+from src.monitoring.metrics import (
+    METRICAS, ROTA_NAO_ENCONTRADA, VALOR_EXCEDENTE, MetricsCollector, MetricsMiddleware,
+    _criar_metricas_prometheus, cronometro_atual, track_time
+)
+from src.utils.preguicoso import Recurso
+from src.workers.celery_app import _pool_prefork
+
+
+def _coletor():
+    registro = CollectorRegistry()
+    recurso = Recurso("prometheus_teste", lambda: _criar_metricas_prometheus(registro))
+    return MetricsCollector(recurso, registro), registro
+
+
+def test_metricas_declaradas_registram_valores():
+    """Contador, histograma e gauge declarados recebem os valores com os labels declarados"""
+    coletor, registro = _coletor()
+
+    coletor.track_counter("sinistros_criados", 2, {"canal": "api", "tipo": "auto"})
+    coletor.track_histogram("tempo_espera_fila", 0.3, {"fila": "analise"})
+    coletor.track_gauge("fila_tamanho", 7)
+
+    assert registro.get_sample_value("sinistros_criados_total", {"canal": "api", "tipo": "auto"}) == 2
+    assert registro.get_sample_value("tempo_espera_fila_segundos_count", {"fila": "analise"}) == 1
+    assert registro.get_sample_value("fila_processamento_tamanho") == 7
+
+
+def test_metrica_desconhecida_registrada_automaticamente():
+    """Nomes não declarados viram métricas em vez de serem descartados"""
+    coletor, registro = _coletor()
+    try:
+        coletor.track_counter("integracao_teste_automatica", 1, {"origem": "legado"})
+        coletor.track_counter("integracao_teste_automatica", 1, {"origem": "legado"})
+
+        assert METRICAS["integracao_teste_automatica"]["labels"] == ("origem",)
+        assert registro.get_sample_value("integracao_teste_automatica_total", {"origem": "legado"}) == 2
+    finally:
+        METRICAS.pop("integracao_teste_automatica", None)
+
+
+def test_labels_fora_da_declaracao_sao_descartados():
+    """Label extra (ex.: duração) não cria série nova; label ausente fica vazio"""
+    coletor, registro = _coletor()
+
+    coletor.track_counter("sinistros_processados", 1, {"status": "aprovado", "agente": "a", "duracao": 1.5})
+    coletor.track_counter("sinistros_processados", 1, {"status": "aprovado", "agente": "a", "duracao": 2.5})
+    coletor.track_counter("sinistros_processados", 1, {"status": "negado"})
+
+    assert registro.get_sample_value("sinistros_processados_total", {"status": "aprovado", "agente": "a"}) == 2
+    assert registro.get_sample_value("sinistros_processados_total", {"status": "negado", "agente": ""}) == 1
+
+
+def test_tipo_divergente_ignorado():
+    """Registrar um histograma com nome de contador não quebra nem cria série"""
+    coletor, registro = _coletor()
+    coletor.track_histogram("sinistros_criados", 1.0, {"canal": "api", "tipo": "auto"})
+    assert registro.get_sample_value("sinistros_criados_total", {"canal": "api", "tipo": "auto"}) is None
+
+
+def test_log_amostrado(monkeypatch, caplog):
+    """Sem amostragem nada é logado; com taxa 1 todos os eventos são"""
+    coletor, _ = _coletor()
+    coletor.taxa_log = 0.0
+    with caplog.at_level("INFO", logger=metrics.__name__):
+        coletor.track_counter("sinistros_criados", 1, {"canal": "api", "tipo": "auto"})
+    assert not caplog.records
+
+    coletor.taxa_log = 1.0
+    with caplog.at_level("INFO", logger=metrics.__name__):
+        coletor.track_counter("sinistros_criados", 1, {"canal": "api", "tipo": "auto"})
+    assert len(caplog.records) == 1
+
+
+def test_custo_por_evento_em_microssegundos():
+    """O caminho quente (série já resolvida) custa poucos microssegundos"""
+    coletor, _ = _coletor()
+    labels = {"endpoint": "/api/v1/sinistros", "metodo": "GET"}
+    coletor.track_histogram("tempo_resposta_api", 0.01, labels)
+
+    eventos = 20000
+    inicio = time.perf_counter()
+    for _ in range(eventos):
+        coletor.track_histogram("tempo_resposta_api", 0.01, labels)
+    por_evento_us = (time.perf_counter() - inicio) / eventos * 1e6
+
+    assert por_evento_us < 50
+
+
+def test_cardinalidade_limitada_em_other():
+    """Valores acima do limite caem na série 'other' e não crescem o cache"""
+    coletor, registro = _coletor()
+    METRICAS["tempo_espera_fila"]["max_valores"] = 3
+    try:
+        for i in range(50):
+            coletor.track_histogram("tempo_espera_fila", 1.0, {"fila": f"fila-{i}"})
+
+        assert registro.get_sample_value("tempo_espera_fila_segundos_count", {"fila": "fila-2"}) == 1
+        assert registro.get_sample_value("tempo_espera_fila_segundos_count", {"fila": "fila-3"}) is None
+        assert registro.get_sample_value("tempo_espera_fila_segundos_count", {"fila": VALOR_EXCEDENTE}) == 47
+        assert len(coletor._series) == 3
+    finally:
+        METRICAS["tempo_espera_fila"].pop("max_valores")
+
+
+def test_middleware_usa_template_da_rota():
+    """Latência e status são rotulados pelo template, não pelo número do sinistro"""
+    coletor, registro = _coletor()
+    app = FastAPI()
+
+    @app.get("/api/v1/sinistros/{numero_sinistro}")
+    async def obter(numero_sinistro: str):
+        return {"numero": numero_sinistro}
+
+    app.add_middleware(MetricsMiddleware, coletor=coletor)
+    cliente = TestClient(app)
+    for i in range(5):
+        assert cliente.get(f"/api/v1/sinistros/SIN-2024-{i:09d}").status_code == 200
+    assert cliente.get("/nao/existe/123").status_code == 404
+
+    rota = {"endpoint": "/api/v1/sinistros/{numero_sinistro}", "metodo": "GET"}
+    assert registro.get_sample_value("tempo_resposta_api_segundos_count", rota) == 5
+    assert registro.get_sample_value("requisicoes_api_total", {**rota, "status": "200"}) == 5
+    assert registro.get_sample_value(
+        "requisicoes_api_total", {"endpoint": ROTA_NAO_ENCONTRADA, "metodo": "GET", "status": "404"}
+    ) == 1
+    assert registro.get_sample_value("requisicoes_api_em_andamento", {"metodo": "GET"}) == 0
+
+
+def test_cronometro_sync_async_e_decorador(monkeypatch):
+    """O mesmo primitivo mede blocos, blocos async e funções decoradas"""
+    registrados = []
+    monkeypatch.setattr(metrics.metrics_collector, "track_histogram",
+                        lambda nome, valor, labels=None: registrados.append((nome, valor, labels)))
+
+    with track_time("bloco", {"a": "1"}) as cronometro:
+        time.sleep(0.01)
+    assert cronometro.duracao_ns >= 10_000_000
+
+    async def rodar():
+        async with track_time("bloco_async"):
+            await asyncio.sleep(0.01)
+        return await funcao_async()
+
+    @track_time("funcao_async")
+    async def funcao_async():
+        return 42
+
+    @track_time("funcao")
+    def funcao(x):
+        return x * 2
+
+    assert asyncio.run(rodar()) == 42
+    assert funcao(3) == 6
+    assert [nome for nome, _, _ in registrados] == ["bloco", "bloco_async", "funcao_async", "funcao"]
+    assert registrados[0][1] >= 0.01 and registrados[0][2] == {"a": "1"}
+
+
+def test_cronometros_aninhados_e_isolados_por_thread():
+    """Aninhados formam caminho pai/filho; threads concorrentes não se misturam"""
+    caminhos = {}
+
+    def trabalho(i):
+        with track_time(None, nome=f"tarefa_{i}"):
+            time.sleep(0.005)
+            with track_time(None, nome="etapa") as interno:
+                caminhos[i] = interno.caminho
+        assert cronometro_atual() is None
+
+    threads = [threading.Thread(target=trabalho, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert caminhos == {i: f"tarefa_{i}/etapa" for i in range(16)}
+
+
+# Roda em processo próprio: o modo multiprocesso precisa valer antes do import do prometheus_client
+_WORKER_PREFORK = """
+import os, socket, sys, urllib.request
+with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    porta = s.getsockname()[1]
+from src.monitoring import metrics
+from src.utils.preguicoso import inicializar_recursos
+assert metrics.iniciar_servidor_metricas(porta, multiprocesso=True)
+inicializar_recursos("prometheus")
+pid = os.fork()
+if pid == 0:
+    metrics.metrics_collector.track_gauge("fila_broker_profundidade", 7, {"fila": "analise"})
+    metrics.metrics_collector.track_counter("tokens_consumidos", 100, {"agente": "a", "canal": "api", "tipo": "prompt"})
+    os._exit(0)
+os.waitpid(pid, 0)
+metrics.metrics_collector.track_counter("tokens_consumidos", 50, {"agente": "a", "canal": "api", "tipo": "prompt"})
+print(urllib.request.urlopen(f"http://127.0.0.1:{porta}/metrics").read().decode())
+"""
+
+
+def test_worker_prefork_exporta_metricas_dos_filhos(tmp_path):
+    """Gauges e contadores gravados nos processos filhos aparecem no servidor do worker"""
+    raiz = Path(__file__).resolve().parent.parent
+    ambiente = {**os.environ, "PYTHONPATH": str(raiz), "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    (tmp_path / "counter_99999.db").write_bytes(b"execucao anterior")
+
+    saida = subprocess.run(
+        [sys.executable, "-c", _WORKER_PREFORK], cwd=raiz, env=ambiente,
+        capture_output=True, text=True, timeout=60, check=True
+    ).stdout
+
+    assert 'fila_broker_profundidade{fila="analise"} 7.0' in saida
+    assert 'tokens_consumidos_total{agente="a",canal="api",tipo="prompt"} 150.0' in saida
+
+
+def test_pool_prefork_detectado():
+    """Só o pool prefork (padrão) usa o modo multiprocesso"""
+    assert _pool_prefork(SimpleNamespace(pool_cls="prefork"))
+    assert _pool_prefork(None)
+    assert not _pool_prefork(SimpleNamespace(pool_cls="solo"))
+    assert not _pool_prefork(SimpleNamespace(pool_cls="threads"))
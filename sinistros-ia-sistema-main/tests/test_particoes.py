@@ -0,0 +1,30 @@
+"""Testes do particionamento mensal"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from src.database.particoes import criar_particoes, ddl_particao, limites_mes, nome_particao, somar_meses
+
+
+def test_limites_mes_viram_o_ano():
+    """Dezembro termina no primeiro dia de janeiro do ano seguinte"""
+    assert limites_mes(datetime(2024, 12, 15, 10, 30)) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+    assert somar_meses(datetime(2024, 1, 1), 14) == datetime(2025, 3, 1)
+
+
+def test_ddl_particao():
+    """Partição mensal com nome e faixa [início, fim)"""
+    data = datetime(2024, 3, 10)
+    assert nome_particao("webhook_logs", data) == "webhook_logs_p2024_03"
+    assert ddl_particao("webhook_logs", data) == (
+        'CREATE TABLE IF NOT EXISTS "webhook_logs_p2024_03" PARTITION OF "webhook_logs" '
+        "FOR VALUES FROM ('2024-03-01 00:00:00') TO ('2024-04-01 00:00:00')"
+    )
+
+
+def test_sqlite_nao_particiona():
+    """Fora do PostgreSQL a manutenção de partições não faz nada"""
+    engine = create_engine("sqlite://")
+    with engine.connect() as conexao:
+        assert criar_particoes(conexao) == []
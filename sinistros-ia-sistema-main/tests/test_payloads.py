@@ -0,0 +1,54 @@
+"""Testes do armazenamento comprimido de payloads"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Base, Sinistro, PayloadSinistro
+from src.database.payloads import carregar_payload, comprimir, descomprimir, listar_payloads, salvar_payload
+
+
+def _sessao():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_compressao_ida_e_volta():
+    """Dados comprimidos voltam idênticos com o algoritmo registrado"""
+    bruto = b'{"descricao":"' + b"colisao traseira " * 200 + b'"}'
+    dados, algoritmo = comprimir(bruto)
+    assert len(dados) < len(bruto)
+    assert descomprimir(dados, algoritmo) == bruto
+
+
+def test_payload_fora_do_sinistro():
+    """Payload é gravado à parte, deduplicado por hash e carregado sob demanda"""
+    db = _sessao()
+    sinistro = Sinistro(
+        numero_sinistro="SIN-2024-00000001",
+        data_ocorrencia=datetime(2024, 5, 1),
+        segurado_nome="Maria",
+        segurado_documento="123.456.789-00",
+        apolice_numero="APL-1",
+        descricao="Colisão",
+        metadados={"source": "web"},
+    )
+    db.add(sinistro)
+    db.flush()
+
+    raw = {"formulario": {"campos": list(range(500))}, "origem": "web"}
+    payload = salvar_payload(db, sinistro.id, "raw_data", raw)
+    db.commit()
+    hash_original = payload.hash_conteudo
+
+    assert carregar_payload(db, sinistro.id, "raw_data") == raw
+    assert carregar_payload(db, sinistro.id, "apolice_dados") is None
+    assert "raw_data" not in (sinistro.metadados or {})
+
+    # Mesmo conteúdo não gera nova linha nem novo hash
+    salvar_payload(db, sinistro.id, "raw_data", dict(raw))
+    db.commit()
+    assert db.query(PayloadSinistro).count() == 1
+    assert listar_payloads(db, sinistro.id)["raw_data"]["hash_conteudo"] == hash_original
@@ -0,0 +1,63 @@
+"""Testes da inicialização preguiçosa"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from src.utils.preguicoso import Recurso, importar_preguicoso
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Bibliotecas que a API não deve carregar no cold start
+PESADAS = ("celery", "openai", "swarm", "prometheus_client", "redis", "pandas", "psycopg2")
+
+
+def test_recurso_criado_uma_vez():
+    """Fábrica roda uma única vez mesmo com chamadas concorrentes"""
+    chamadas = []
+    recurso = Recurso("teste", lambda: chamadas.append(1) or object())
+
+    assert not recurso.inicializado
+    valores = []
+    threads = [threading.Thread(target=lambda: valores.append(recurso.obter())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(chamadas) == 1
+    assert all(valor is valores[0] for valor in valores)
+
+    recurso.resetar()
+    assert recurso.obter() is not valores[0]
+
+
+def test_modulo_preguicoso_importa_no_primeiro_acesso():
+    """O módulo só entra em sys.modules quando um atributo é lido"""
+    sys.modules.pop("colorsys", None)
+    modulo = importar_preguicoso("colorsys")
+    assert "colorsys" not in sys.modules
+    assert modulo.rgb_to_hsv(1, 0, 0)[0] == 0
+    assert "colorsys" in sys.modules
+
+
+def test_api_nao_carrega_subsistemas_pesados_no_import():
+    """
+    Importar a entrada serverless não carrega Celery, agentes nem Prometheus;
+    o Sentry já sobe ativo, sem as integrações que importariam os demais
+    """
+    codigo = (
+        "import json, sys; import api.index; import sentry_sdk; "
+        "assert sentry_sdk.get_client().is_active(); "
+        f"print(json.dumps([m for m in {PESADAS!r} if m in sys.modules]))"
+    )
+    ambiente = {**os.environ, "SENTRY_DSN": "https://chave@exemplo.invalid/1"}
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, env=ambiente,
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+
+    assert json.loads(saida) == []
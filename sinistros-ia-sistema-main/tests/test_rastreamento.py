@@ -0,0 +1,114 @@
+"""Testes do rastreamento distribuído (exportador em arquivo)"""
+
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from src.monitoring import rastreamento
+from src.workers import celery_app as modulo_celery
+
+
+def _ativar(monkeypatch, tmp_path):
+    arquivo = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(rastreamento.settings, "RASTREAMENTO_ATIVO", True)
+    monkeypatch.setattr(rastreamento.settings, "RASTREAMENTO_EXPORTADOR", "arquivo")
+    monkeypatch.setattr(rastreamento.settings, "RASTREAMENTO_ARQUIVO", str(arquivo))
+    return arquivo
+
+
+def _spans_exportados(arquivo):
+    rastreamento.exportador.forcar_envio()
+    spans = []
+    for linha in arquivo.read_text().splitlines():
+        for recurso in json.loads(linha)["resourceSpans"]:
+            for escopo in recurso["scopeSpans"]:
+                spans.extend(escopo["spans"])
+    return {span["name"]: span for span in spans}
+
+
+def test_desligado_nao_gera_spans(monkeypatch):
+    """Sem RASTREAMENTO_ATIVO o span é nulo e nada é propagado"""
+    monkeypatch.setattr(rastreamento.settings, "RASTREAMENTO_ATIVO", False)
+    with rastreamento.iniciar_span("qualquer") as span:
+        headers = {}
+        rastreamento.injetar(headers)
+    assert span is rastreamento.SPAN_NULO
+    assert headers == {}
+
+
+def test_traceparent_ida_e_volta():
+    """extrair aceita o formato W3C e rejeita cabeçalhos inválidos"""
+    contexto = rastreamento.extrair("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    assert (contexto.trace_id, contexto.span_id) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331")
+    assert rastreamento.extrair("lixo") is None
+    assert rastreamento.extrair(f"00-{'0' * 32}-b7ad6b7169203331-01") is None
+
+
+def test_trace_da_api_ate_a_tarefa(monkeypatch, tmp_path):
+    """Requisição → SQL → publicação Celery → tarefa no worker formam um único trace"""
+    arquivo = _ativar(monkeypatch, tmp_path)
+    monkeypatch.setattr(modulo_celery, "get_broker_redis", lambda: None)
+    engine = create_engine("sqlite://")
+    headers_mensagem = {}
+
+    app = FastAPI()
+
+    @app.post("/api/v1/sinistros/{numero_sinistro}/analisar")
+    def analisar(numero_sinistro: str):
+        with engine.connect() as conexao:
+            conexao.execute(text("SELECT 1"))
+        modulo_celery.before_task_publish_handler(sender="processar_sinistro_async", headers=headers_mensagem)
+        return {"ok": True}
+
+    app.add_middleware(rastreamento.RastreamentoMiddleware)
+    trace_cliente = "4bf92f3577b34da6a3ce929d0e0e4736"
+    resposta = TestClient(app).post(
+        "/api/v1/sinistros/SIN-1/analisar",
+        headers={"traceparent": f"00-{trace_cliente}-00f067aa0ba902b7-01"}
+    )
+    assert resposta.status_code == 200
+    assert rastreamento.CABECALHO_TRACEPARENT in headers_mensagem
+
+    # Worker: a mensagem chega com os headers publicados
+    tarefa = SimpleNamespace(name="processar_sinistro_async", request=SimpleNamespace(
+        delivery_info={"routing_key": "analise"}, retries=0, **headers_mensagem
+    ))
+    modulo_celery.task_prerun_handler(task_id="t-1", task=tarefa)
+    with rastreamento.iniciar_span("swarm.run"):
+        pass
+    modulo_celery.task_postrun_handler(task_id="t-1", task=tarefa)
+
+    spans = _spans_exportados(arquivo)
+    servidor = spans["POST /api/v1/sinistros/{numero_sinistro}/analisar"]
+    sql = spans["db.SELECT"]
+    publicacao = spans["publicar processar_sinistro_async"]
+    tarefa_span = spans["processar_sinistro_async"]
+
+    assert {s["traceId"] for s in spans.values()} == {trace_cliente}
+    assert servidor["parentSpanId"] == "00f067aa0ba902b7"
+    assert sql["parentSpanId"] == servidor["spanId"]
+    assert publicacao["parentSpanId"] == servidor["spanId"]
+    assert tarefa_span["parentSpanId"] == publicacao["spanId"]
+    assert spans["swarm.run"]["parentSpanId"] == tarefa_span["spanId"]
+    assert tarefa_span["kind"] == rastreamento.TIPO_CONSUMIDOR
+
+
+def test_erro_marca_status(monkeypatch, tmp_path):
+    """Exceção dentro do span vira status de erro no OTLP"""
+    arquivo = _ativar(monkeypatch, tmp_path)
+
+    @rastreamento.rastrear("ferramenta.falha")
+    def falha():
+        raise ValueError("apólice inexistente")
+
+    try:
+        falha()
+    except ValueError:
+        pass
+
+    span = _spans_exportados(arquivo)["ferramenta.falha"]
+    assert span["status"] == {"code": 2, "message": "ValueError: apólice inexistente"}
+    assert "parentSpanId" not in span
@@ -0,0 +1,75 @@
+"""Testes do roteamento de leituras para réplicas"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+
+from src.api.consistencia import COOKIE_ESCRITA, LeituraAposEscritaMiddleware
+from src.database import connection
+from src.database.models import Sinistro
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    engines = [create_engine("sqlite://"), create_engine("sqlite://")]
+    monkeypatch.setattr(connection.engines_replicas, "obter", lambda: engines)
+    return engines
+
+
+def test_leitura_em_rodizio_e_primario_quando_exigido(replicas):
+    """Leituras alternam entre réplicas; intenção de primário as desvia"""
+    usadas = {id(connection.engine_leitura()) for _ in range(4)}
+    assert usadas == {id(e) for e in replicas}
+
+    token = connection.usar_primario()
+    try:
+        assert connection.engine_leitura() is connection.engine
+    finally:
+        connection.restaurar_intencao(token)
+    assert connection.engine_leitura() is not connection.engine
+
+
+def test_sessao_de_leitura_recusa_escrita():
+    """Flush numa sessão de leitura falha em vez de escrever na réplica"""
+    with connection.get_db_leitura_session() as db:
+        db.add(Sinistro(numero_sinistro="SIN-X"))
+        with pytest.raises(RuntimeError):
+            db.flush()
+
+
+def _chamar(middleware, metodo, cookie=None):
+    scope = {"type": "http", "method": metodo, "headers": []}
+    if cookie:
+        scope["headers"].append((b"cookie", cookie.encode()))
+    enviados = []
+
+    async def send(message):
+        enviados.append(message)
+
+    asyncio.run(middleware(scope, None, send))
+    return enviados[0]
+
+
+def test_leitura_apos_escrita(replicas):
+    """Escrita grava cookie; leitura com o cookie vai ao primário, sem ele à réplica"""
+    engines_vistos = []
+
+    async def app(scope, receive, send):
+        engines_vistos.append(connection.engine_leitura())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    middleware = LeituraAposEscritaMiddleware(app, janela_segundos=5)
+
+    resposta = _chamar(middleware, "POST")
+    cookie = dict(resposta["headers"])[b"set-cookie"].decode().split(";")[0]
+    assert cookie.startswith(COOKIE_ESCRITA)
+
+    _chamar(middleware, "GET", cookie)
+    _chamar(middleware, "GET")
+    _chamar(middleware, "GET", f"{COOKIE_ESCRITA}=1.0")
+
+    assert engines_vistos[0] is connection.engine
+    assert engines_vistos[1] is connection.engine
+    assert engines_vistos[2] in replicas
+    assert engines_vistos[3] in replicas
@@ -0,0 +1,153 @@
+"""Testes da retenção e arquivamento das tabelas de alto volume"""
+
+import gzip
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from src.database import retencao
+from src.database.models import Base, FilaProcessamento, WebhookLog
+
+AGORA = datetime(2024, 6, 1)
+
+
+@pytest.fixture
+def banco(monkeypatch, tmp_path):
+    """SQLite com as tabelas; registra, em ordem, as gravações do arquivo e os DELETEs"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'retencao.db'}")
+    Base.metadata.create_all(engine)
+    Sessao = sessionmaker(bind=engine)
+    operacoes = []
+
+    @contextmanager
+    def sessao():
+        db = Sessao()
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def registrar(conexao, cursor, sql, parametros, contexto, executemany):
+        if sql.lstrip().upper().startswith("DELETE"):
+            operacoes.append("delete")
+
+    escrever = retencao.ArquivoRetencao.escrever
+
+    def escrever_registrando(self, registros):
+        escrever(self, registros)
+        operacoes.append(("arquivo", len(registros)))
+
+    monkeypatch.setattr(retencao, "get_db_session", sessao)
+    monkeypatch.setattr(retencao.ArquivoRetencao, "escrever", escrever_registrando)
+    monkeypatch.setattr(retencao.settings, "RETENCAO_LOTE", 2)
+    monkeypatch.setattr(retencao.settings, "RETENCAO_MAX_LOTES", 100)
+    monkeypatch.setattr(retencao.settings, "RETENCAO_PAUSA_LOTE_SEGUNDOS", 0)
+    monkeypatch.setattr(retencao.settings, "RETENCAO_DIR_ARQUIVO", str(tmp_path / "arquivo"))
+    return Sessao, operacoes, tmp_path / "arquivo"
+
+
+def _webhooks(Sessao, vencidos, recentes=0):
+    dias = retencao.POLITICAS["webhook_logs"]["dias"]
+    with Sessao() as db:
+        for i in range(vencidos):
+            db.add(WebhookLog(sinistro_id=1, url="https://cliente", evento="sinistro.criado",
+                              data_envio=AGORA - timedelta(days=dias + 1 + i)))
+        for _ in range(recentes):
+            db.add(WebhookLog(sinistro_id=1, url="https://cliente", evento="sinistro.criado", data_envio=AGORA))
+        db.commit()
+
+
+def _restantes(Sessao, modelo):
+    with Sessao() as db:
+        return db.query(modelo).count()
+
+
+def _linhas_arquivadas(diretorio):
+    return [json.loads(linha) for caminho in diretorio.rglob("*.jsonl.gz")
+            for linha in gzip.open(caminho, "rt", encoding="utf-8")]
+
+
+def test_remove_em_lotes_e_arquiva_antes(banco):
+    """Cada lote é gravado no arquivo antes do seu DELETE; registros recentes ficam"""
+    Sessao, operacoes, diretorio = banco
+    _webhooks(Sessao, vencidos=5, recentes=1)
+
+    resultado = retencao.aplicar_politica("webhook_logs", AGORA)
+
+    assert resultado == {"registros": 5, "particoes": 0}
+    assert operacoes == [("arquivo", 2), "delete", ("arquivo", 2), "delete", ("arquivo", 1), "delete"]
+    assert _restantes(Sessao, WebhookLog) == 1
+    assert len(_linhas_arquivadas(diretorio)) == 5
+
+
+def test_falha_no_arquivo_nao_apaga(banco, monkeypatch):
+    """Se o lote não pôde ser arquivado, nada daquele lote é apagado"""
+    Sessao, operacoes, _ = banco
+    _webhooks(Sessao, vencidos=3)
+
+    def falhar(self, registros):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(retencao.ArquivoRetencao, "escrever", falhar)
+    with pytest.raises(OSError):
+        retencao.aplicar_politica("webhook_logs", AGORA)
+
+    assert "delete" not in operacoes
+    assert _restantes(Sessao, WebhookLog) == 3
+
+
+def test_max_lotes_limita_execucao(banco, monkeypatch):
+    """Com RETENCAO_MAX_LOTES atingido o resto fica para a próxima execução"""
+    Sessao, operacoes, _ = banco
+    monkeypatch.setattr(retencao.settings, "RETENCAO_MAX_LOTES", 2)
+    _webhooks(Sessao, vencidos=7)
+
+    assert retencao.aplicar_politica("webhook_logs", AGORA)["registros"] == 4
+    assert operacoes.count("delete") == 2
+    assert _restantes(Sessao, WebhookLog) == 3
+
+
+def test_fila_sem_data_fim_tambem_vence(banco):
+    """Sem data de fim, a fila vence pela data de início ou de entrada"""
+    Sessao, _, _ = banco
+    antigo = AGORA - timedelta(days=retencao.POLITICAS["fila_processamento"]["dias"] + 1)
+    with Sessao() as db:
+        db.add_all([
+            FilaProcessamento(sinistro_numero="A", status="erro", data_entrada=antigo, task_id="a"),
+            FilaProcessamento(sinistro_numero="B", status="erro", data_entrada=antigo,
+                              data_inicio_processamento=antigo, task_id="b"),
+            FilaProcessamento(sinistro_numero="C", status="concluido", data_entrada=antigo,
+                              data_fim_processamento=antigo, task_id="c"),
+            FilaProcessamento(sinistro_numero="D", status="erro", data_entrada=AGORA, task_id="d"),
+            FilaProcessamento(sinistro_numero="E", status="processando", data_entrada=antigo, task_id="e"),
+        ])
+        db.commit()
+
+    assert retencao.aplicar_politica("fila_processamento", AGORA)["registros"] == 3
+    with Sessao() as db:
+        assert sorted(f.sinistro_numero for f in db.query(FilaProcessamento)) == ["D", "E"]
+
+
+def test_particao_com_registros_nao_arquivados_e_mantida(banco, monkeypatch):
+    """Limite de lotes atingido: a partição vencida não é descartada com registros não arquivados"""
+    Sessao, operacoes, diretorio = banco
+    monkeypatch.setattr(retencao.settings, "RETENCAO_MAX_LOTES", 1)
+    _webhooks(Sessao, vencidos=5)
+    # Partição simulada: no PostgreSQL ela contém os registros vencidos que sobraram
+    with Sessao() as db:
+        db.execute(text('CREATE TABLE "webhook_logs_2024_01" (id INTEGER)'))
+        db.execute(text('INSERT INTO "webhook_logs_2024_01" VALUES (1)'))
+        db.commit()
+    monkeypatch.setattr(retencao, "particoes_expiradas", lambda db, tabela, limite: ["webhook_logs_2024_01"])
+
+    assert retencao.aplicar_politica("webhook_logs", AGORA) == {"registros": 2, "particoes": 0}
+    assert _restantes(Sessao, WebhookLog) == 3
+    assert len(_linhas_arquivadas(diretorio)) == 2
+    with Sessao() as db:
+        assert db.execute(text('SELECT COUNT(*) FROM "webhook_logs_2024_01"')).scalar() == 1
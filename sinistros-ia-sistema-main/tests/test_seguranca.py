@@ -0,0 +1,34 @@
+"""Testes da autorização das operações administrativas"""
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import seguranca
+
+
+def _cliente():
+    app = FastAPI()
+
+    @app.put("/api/v1/admin/amostragem", dependencies=[Depends(seguranca.exigir_admin)])
+    def alterar():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_sem_token_configurado_operacao_desabilitada(monkeypatch):
+    """ADMIN_API_TOKEN vazio recusa qualquer chamada"""
+    monkeypatch.setattr(seguranca.settings, "ADMIN_API_TOKEN", "")
+    resposta = _cliente().put("/api/v1/admin/amostragem", headers={"Authorization": "Bearer "})
+    assert resposta.status_code == 403
+
+
+def test_exige_bearer_correto(monkeypatch):
+    """Só o Bearer igual ao ADMIN_API_TOKEN passa"""
+    monkeypatch.setattr(seguranca.settings, "ADMIN_API_TOKEN", "segredo")
+    cliente = _cliente()
+
+    assert cliente.put("/api/v1/admin/amostragem").status_code == 401
+    assert cliente.put("/api/v1/admin/amostragem", headers={"Authorization": "Bearer outro"}).status_code == 401
+    assert cliente.put("/api/v1/admin/amostragem", headers={"Authorization": "Basic segredo"}).status_code == 401
+    assert cliente.put("/api/v1/admin/amostragem", headers={"Authorization": "Bearer segredo"}).json() == {"ok": True}
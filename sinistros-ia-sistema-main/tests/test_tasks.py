@@ -0,0 +1,245 @@
+"""Testes das tarefas de análise (pipeline por etapas)"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.database.models import Analise, Base, FilaProcessamento, Sinistro, StatusSinistro
+from src.workers import tasks
+
+
+def _agentes_falsos(monkeypatch, etapas=("triagem", "analise", "calculo", "compliance")):
+    """Evita importar os agentes (OpenAI/Swarm): só ETAPAS é usado aqui"""
+    monkeypatch.setattr(tasks, "agentes", SimpleNamespace(ETAPAS=[{"nome": nome} for nome in etapas]))
+
+
+def test_orcamento_desligado_por_padrao(monkeypatch):
+    """MAX_TOKENS_POR_SINISTRO=0 (padrão) não limita as etapas"""
+    _agentes_falsos(monkeypatch)
+    monkeypatch.setattr(tasks.settings, "MAX_TOKENS_POR_SINISTRO", 0)
+    assert tasks._orcamento_etapa() is None
+
+
+def test_orcamento_dividido_entre_etapas_e_gerente(monkeypatch):
+    """Cada agente recebe uma fatia igual; as fatias somadas não passam do limite"""
+    _agentes_falsos(monkeypatch)
+    monkeypatch.setattr(tasks.settings, "MAX_TOKENS_POR_SINISTRO", 60001)
+
+    fatia = tasks._orcamento_etapa()
+
+    assert fatia == 12000
+    assert fatia * (len(tasks.agentes.ETAPAS) + 1) <= 60001
+
+
+def _sessao(monkeypatch):
+    """SQLite em memória; as tasks abrem suas sessões curtas no mesmo banco"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Sessao = sessionmaker(bind=engine)
+
+    @contextmanager
+    def sessao():
+        with Sessao() as db:
+            yield db
+            db.commit()
+
+    monkeypatch.setattr(tasks, "get_db_session", sessao)
+    return Sessao(), engine
+
+
+def _sinistro(db, status=StatusSinistro.TRIAGEM):
+    sinistro = Sinistro(
+        numero_sinistro="SIN-2024-00000001",
+        data_ocorrencia=datetime(2024, 5, 1),
+        segurado_nome="Maria",
+        segurado_documento="123.456.789-00",
+        apolice_numero="APL-1",
+        descricao="Colisão",
+        status=status,
+        canal_origem="api",
+    )
+    db.add(sinistro)
+    db.commit()
+    return sinistro
+
+
+def _sem_publicacao(monkeypatch):
+    publicados = []
+    monkeypatch.setattr(tasks, "publicar_evento", lambda numero, tipo, dados: publicados.append(tipo))
+    monkeypatch.setattr(tasks, "publicar_mudanca_status",
+                        lambda numero, anterior, novo, *dados: publicados.append(f"{anterior}->{novo}"))
+    return publicados
+
+
+def _concluida(etapa, saida="ok", sucesso=True, fim="2024-05-02T10:00:00"):
+    return {
+        "tipo": "etapa.concluida", "sinistro_numero": "SIN-2024-00000001", "etapa": etapa,
+        "agente": f"Agente{etapa}", "sucesso": sucesso, "erro": None if sucesso else "falhou",
+        "saida": saida, "duracao_ms": 1500, "fim": fim, "hash_entrada": f"hash-{etapa}",
+        "tokens": {"prompt_tokens": 100, "completion_tokens": 50, "chamadas": 1},
+    }
+
+
+def test_status_so_avanca(monkeypatch):
+    """Etapas paralelas fora de ordem não fazem o status voltar"""
+    publicados = _sem_publicacao(monkeypatch)
+    db, _ = _sessao(monkeypatch)
+    sinistro = _sinistro(db)
+    acompanhamento = tasks.AcompanhamentoEtapas(sinistro)
+
+    acompanhamento({"tipo": "etapa.iniciada", "etapa": "calculo", "status": "em_calculo"})
+    acompanhamento({"tipo": "etapa.iniciada", "etapa": "triagem", "status": "em_analise"})
+    acompanhamento({"tipo": "etapa.iniciada", "etapa": "compliance", "status": "em_compliance"})
+    acompanhamento({"tipo": "etapa.iniciada", "etapa": "analise", "status": "em_analise"})
+
+    db.expire_all()
+    assert db.get(Sinistro, sinistro.id).status == StatusSinistro.EM_COMPLIANCE
+    assert [p for p in publicados if "->" in p] == ["triagem->em_calculo", "em_calculo->em_compliance"]
+
+
+def test_uma_analise_por_etapa(monkeypatch):
+    """Cada etapa concluída grava sua Analise com hash, tokens e custo; o uso é somado"""
+    _sem_publicacao(monkeypatch)
+    db, _ = _sessao(monkeypatch)
+    sinistro = _sinistro(db, StatusSinistro.EM_ANALISE)
+    acompanhamento = tasks.AcompanhamentoEtapas(sinistro)
+
+    for etapa in ("triagem", "analise", "calculo", "compliance"):
+        acompanhamento(_concluida(etapa))
+
+    analises = db.query(Analise).order_by(Analise.id).all()
+    assert [a.tipo_analise for a in analises] == ["triagem", "analise", "calculo", "compliance"]
+    assert {a.hash_entrada for a in analises} == {f"hash-{e}" for e in ("triagem", "analise", "calculo", "compliance")}
+    assert all(a.tokens_prompt == 100 and a.tokens_completion == 50 and a.custo_estimado > 0 for a in analises)
+    assert all(a.duracao_segundos == 1 and a.resultado["saida"] == "ok" for a in analises)
+    assert acompanhamento.uso_total == {"prompt_tokens": 400, "completion_tokens": 200, "chamadas": 4}
+
+
+def test_resultado_anterior_le_so_a_ultima_saida_da_etapa(monkeypatch):
+    """Última saída bem-sucedida da etapa, sem carregar o JSON inteiro das análises"""
+    _sem_publicacao(monkeypatch)
+    db, engine = _sessao(monkeypatch)
+    sinistro = _sinistro(db, StatusSinistro.EM_ANALISE)
+    acompanhamento = tasks.AcompanhamentoEtapas(sinistro)
+    acompanhamento(_concluida("calculo", saida="antiga", fim="2024-05-02T10:00:00"))
+    acompanhamento(_concluida("calculo", saida="nova", fim="2024-05-02T11:00:00"))
+    acompanhamento(_concluida("calculo", saida=None, sucesso=False, fim="2024-05-02T12:00:00"))
+    db.add(Analise(sinistro_id=sinistro.id, agente="GerenteSinistros", tipo_analise="completa",
+                   resultado={"mensagem": "x" * 10000}, sucesso=True))
+    db.commit()
+
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda *args: consultas.append(args[2]))
+
+    assert tasks._resultado_anterior(db, sinistro, "calculo") == {"hash_entrada": "hash-calculo", "saida": "nova"}
+    assert tasks._resultado_anterior(db, sinistro, "triagem") is None
+    consultas = [sql for sql in consultas if "FROM analises" in sql]
+    assert len(consultas) == 2
+    assert all("analises.resultado AS" not in sql and "LIMIT" in sql for sql in consultas)
+
+
+def test_analise_e_um_chord_das_etapas_com_errback(monkeypatch):
+    """Quatro etapas em paralelo → gerente; a falha cai em registrar_falha_analise"""
+    _agentes_falsos(monkeypatch)
+    _sem_publicacao(monkeypatch)
+    monkeypatch.setattr(tasks, "_preparar_analise", lambda numero, task_id: None)
+    canvas = []
+
+    def chord_capturado(cabecalho, corpo):
+        canvas.append((cabecalho, corpo))
+        return SimpleNamespace(apply_async=lambda: SimpleNamespace(id="chord-1"))
+
+    monkeypatch.setattr(tasks, "chord", chord_capturado)
+
+    resultado = tasks.processar_sinistro_async.apply(args=["SIN-2024-00000001"], task_id="task-1").get()
+
+    assert resultado == {"sinistro_numero": "SIN-2024-00000001", "analise_id": "chord-1"}
+    cabecalho, corpo = canvas[0]
+    assert [(etapa.task, tuple(etapa.args)) for etapa in cabecalho.tasks] == [
+        (tasks.executar_etapa_agente.name, ("SIN-2024-00000001", nome, False))
+        for nome in ("triagem", "analise", "calculo", "compliance")
+    ]
+    assert corpo.task == tasks.consolidar_analise.name
+    assert tuple(corpo.args) == ("SIN-2024-00000001", "task-1")
+    errback, = corpo.options["link_error"]
+    assert errback.task == tasks.registrar_falha_analise.name
+    assert tuple(errback.args) == ("SIN-2024-00000001", "task-1")
+
+
+def test_falha_de_etapa_chega_ao_errback(monkeypatch):
+    """Falha no chord: o backend chama o errback, que agenda o retry na fila"""
+    _sem_publicacao(monkeypatch)
+    db, _ = _sessao(monkeypatch)
+    db.add(FilaProcessamento(sinistro_numero="SIN-2024-00000001", status="processando", task_id="task-1"))
+    db.commit()
+    backend = tasks.celery_app.backend
+    falhas = []
+    monkeypatch.setattr(backend, "fail_from_current_stack", lambda task_id, exc=None: falhas.append(exc))
+    corpo = tasks.consolidar_analise.s("SIN-2024-00000001", "task-1").on_error(
+        tasks.registrar_falha_analise.s("SIN-2024-00000001", "task-1")
+    )
+
+    # Mesmo caminho do backend quando uma parte do chord falha
+    backend.chord_error_from_stack(corpo, RuntimeError("etapa calculo falhou"))
+
+    assert [str(exc) for exc in falhas] == ["etapa calculo falhou"]
+    fila = db.query(FilaProcessamento).one()
+    assert (fila.status, fila.tentativas, fila.erro_mensagem) == ("aguardando", 1, "etapa calculo falhou")
+    assert fila.proxima_tentativa is not None
+
+
+def _contar_sessoes(monkeypatch):
+    """Envolve get_db_session registrando quantas sessões estão abertas"""
+    abertas = []
+    original = tasks.get_db_session
+
+    @contextmanager
+    def sessao():
+        abertas.append(1)
+        try:
+            with original() as db:
+                yield db
+        finally:
+            abertas.pop()
+
+    monkeypatch.setattr(tasks, "get_db_session", sessao)
+    return abertas
+
+
+def test_sessao_liberada_antes_do_llm(monkeypatch):
+    """Etapas e gerente chamam o LLM sem conexão presa; os eventos gravam em sessões curtas"""
+    _sem_publicacao(monkeypatch)
+    db, _ = _sessao(monkeypatch)
+    _sinistro(db, StatusSinistro.EM_ANALISE)
+    abertas = _contar_sessoes(monkeypatch)
+    monkeypatch.setattr(tasks, "enviar_webhook", SimpleNamespace(delay=lambda **kwargs: None))
+    sessoes_durante_llm = []
+
+    def executar_etapa(nome_etapa, dados, on_evento, resultado_anterior, orcamento_tokens):
+        sessoes_durante_llm.append(len(abertas))
+        on_evento({"tipo": "etapa.iniciada", "etapa": nome_etapa, "status": "em_calculo"})
+        on_evento(_concluida(nome_etapa))
+        return {"etapa": nome_etapa, "saida": "> Franquia: R$ 1.000\nObrigado", "tokens": {"prompt_tokens": 100, "completion_tokens": 50}}
+
+    def consolidar_decisao(dados, resultados_etapas, on_evento, orcamento_tokens):
+        sessoes_durante_llm.append(len(abertas))
+        return {"mensagem": "Sinistro aprovado", "agent_usado": "GerenteSinistros", "etapas": resultados_etapas,
+                "tokens": {"prompt_tokens": 10, "completion_tokens": 5, "chamadas": 1}}
+
+    monkeypatch.setattr(tasks, "agentes", SimpleNamespace(
+        ETAPAS=[{"nome": "calculo"}], executar_etapa=executar_etapa, consolidar_decisao=consolidar_decisao
+    ))
+
+    etapa = tasks.executar_etapa_agente.apply(args=["SIN-2024-00000001", "calculo"]).get()
+    tasks.consolidar_analise.apply(args=[[etapa], "SIN-2024-00000001", "task-1"]).get()
+
+    assert sessoes_durante_llm == [0, 0]
+    assert abertas == []
+    db.expire_all()
+    assert db.query(Sinistro).one().status == StatusSinistro.APROVADO
+    # Saídas indexadas inteiras, sem as regras de boilerplate de email
+    assert db.query(Sinistro).one().texto_analises == "Sinistro aprovado\n\n> Franquia: R$ 1.000\nObrigado"
+    assert [a.tipo_analise for a in db.query(Analise).order_by(Analise.id)] == ["calculo", "completa"]